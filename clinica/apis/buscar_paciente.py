@@ -3,35 +3,21 @@ from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
 
-from clinica.models import Ficha, MovimientoFicha
-from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
+from clinica.models import Ficha
+from clinica.services import fichas_en_transito, fichas_en_transito_monologo, movimientos_en_espera_por_ficha, \
+    movimientos_traspasables_por_ficha, movimientos_monologo_en_transito_por_ficha
+from core.utils.search_utils import get_paciente_rut_q_filter, RUT_SEARCH_EXACT
 
 
-@login_required
-def buscar_paciente_ficha_api(request):
+def _filtros_ficha(query):
     """
-    API para buscar un paciente por RUT o número de ficha en el establecimiento del usuario.
-    Específicamente para el módulo de Salida de Fichas.
+    Filtro de fichas por RUT exacto del paciente (columna indexada ``rut_normalizado``)
+    o por número de ficha del sistema (acepta también el formato PAC-0000123).
     """
-    query = request.GET.get('q', '').strip()
-    if not query:
-        return JsonResponse({'results': []})
-
-    # Normalizar búsqueda para comparar con RUT o número de ficha
-    # El usuario indica que se guarda con puntos y guion (20.930.055-9)
     query_upper = query.upper()
-
-    # También generamos una versión sin puntos ni guion para el caso de búsqueda por número de ficha
     query_clean = query.replace('.', '').replace('-', '').strip()
 
-    establecimiento = getattr(request.user, 'establecimiento', None)
-    if not establecimiento:
-        return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
-
-    # Buscar fichas que coincidan con el RUT del paciente (tal cual viene o formateado)
-    # o el número de ficha del sistema
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
+    filtros = get_paciente_rut_q_filter(query, prefix='paciente__', mode=RUT_SEARCH_EXACT)
 
     if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
         try:
@@ -44,23 +30,39 @@ def buscar_paciente_ficha_api(request):
         except:
             pass
 
+    return filtros
+
+
+@login_required
+def buscar_paciente_ficha_api(request):
+    """
+    API para buscar un paciente por RUT o número de ficha en el establecimiento del usuario.
+    Específicamente para el módulo de Salida de Fichas.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'results': []})
+
+    establecimiento = getattr(request.user, 'establecimiento', None)
+    if not establecimiento:
+        return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
+
+    # Buscar fichas que coincidan con el RUT del paciente o el número de ficha del sistema
+    filtros = _filtros_ficha(query)
+
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Fichas con movimientos en tránsito (EN ESPERA de recepción), en una sola consulta
+    fichas = list(fichas)
+    en_transito_ids = fichas_en_transito(fichas, establecimiento)
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Validar si tiene movimientos en tránsito (EN ESPERA de recepción)
-        en_transito_old = MovimientoFicha.objects.filter(
-            ficha=ficha,
-            estado_recepcion='EN ESPERA',
-            establecimiento=establecimiento
-        ).exists()
-
-        en_transito = en_transito_old
+        en_transito = ficha.id in en_transito_ids
 
         results.append({
             'paciente_id': paciente.id,
@@ -84,51 +86,26 @@ def buscar_paciente_ficha_api_monologo(request):
     if not query:
         return JsonResponse({'results': []})
 
-    # Normalizar búsqueda para comparar con RUT o número de ficha
-    # El usuario indica que se guarda con puntos y guion (20.930.055-9)
-    query_upper = query.upper()
-
-    # También generamos una versión sin puntos ni guion para el caso de búsqueda por número de ficha
-    query_clean = query.replace('.', '').replace('-', '').strip()
-
     establecimiento = getattr(request.user, 'establecimiento', None)
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    # Buscar fichas que coincidan con el RUT del paciente (tal cual viene o formateado)
-    # o el número de ficha del sistema
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
-
-    if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
-        try:
-            val = query_upper
-            if val.startswith('PAC-'):
-                val = int(val[4:])
-            else:
-                val = int(query_clean)
-            filtros |= Q(numero_ficha_sistema=val)
-        except:
-            pass
+    # Buscar fichas que coincidan con el RUT del paciente o el número de ficha del sistema
+    filtros = _filtros_ficha(query)
 
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Fichas con movimientos en tránsito (estado E), en una sola consulta
+    fichas = list(fichas)
+    en_transito_ids = fichas_en_transito_monologo(fichas)
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Validar si tiene movimientos en tránsito (EN ESPERA de recepción)
-
-        en_transito_new = MovimientoMonologoControlado.objects.filter(
-            ficha=ficha,
-            estado='E',
-            status=True
-        ).exists()
-
-        en_transito = en_transito_new
+        en_transito = ficha.id in en_transito_ids
 
         results.append({
             'paciente_id': paciente.id,
@@ -152,43 +129,25 @@ def buscar_paciente_recepcion_api(request):
     if not query:
         return JsonResponse({'results': []})
 
-    query_upper = query.upper()
-    query_clean = query.replace('.', '').replace('-', '').strip()
-
     establecimiento = getattr(request.user, 'establecimiento', None)
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
-
-    if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
-        try:
-            val = query_upper
-            if val.startswith('PAC-'):
-                val = int(val[4:])
-            else:
-                val = int(query_clean)
-            filtros |= Q(numero_ficha_sistema=val)
-        except:
-            pass
+    filtros = _filtros_ficha(query)
 
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Último movimiento 'ENVIADO' y en espera de recepción de cada ficha
+    fichas = list(fichas)
+    movimientos = movimientos_en_espera_por_ficha(fichas, establecimiento)
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Buscar el último movimiento que esté en estado 'ENVIADO' y en espera de recepción
-        ultimo_movimiento = MovimientoFicha.objects.filter(
-            ficha=ficha,
-            estado_envio='ENVIADO',
-            estado_recepcion='EN ESPERA',
-            establecimiento=establecimiento
-        ).order_by('-fecha_envio').first()
+        ultimo_movimiento = movimientos.get(ficha.id)
 
         results.append({
             'paciente_id': paciente.id,
@@ -217,44 +176,26 @@ def buscar_paciente_recepcion_api_monologo(request):
     if not query:
         return JsonResponse({'results': []})
 
-    query_upper = query.upper()
-    query_clean = query.replace('.', '').replace('-', '').strip()
-
     establecimiento = getattr(request.user, 'establecimiento', None)
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
-
-    if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
-        try:
-            val = query_upper
-            if val.startswith('PAC-'):
-                val = int(val[4:])
-            else:
-                val = int(query_clean)
-            filtros |= Q(numero_ficha_sistema=val)
-        except:
-            pass
+    filtros = _filtros_ficha(query)
 
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Movimiento enviado (estado E) de cada ficha
+    # We prioritize the NEW system (MovimientoMonologoControlado)
+    fichas = list(fichas)
+    movimientos = movimientos_monologo_en_transito_por_ficha(fichas, establecimiento)
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Buscar el último movimiento que esté en estado 'ENVIADO' y en espera de recepción
-        # We prioritize the NEW system (MovimientoMonologoControlado)
-        movimiento = MovimientoMonologoControlado.objects.filter(
-            ficha=ficha,
-            estado='E',
-            establecimiento=establecimiento,
-            status=True
-        ).select_related('servicio_clinico_destino', 'profesional').first()
+        movimiento = movimientos.get(ficha.id)
 
         if movimiento:
             results.append({
@@ -291,44 +232,25 @@ def buscar_paciente_traspaso_api(request):
     if not query:
         return JsonResponse({'results': []})
 
-    query_upper = query.upper()
-    query_clean = query.replace('.', '').replace('-', '').strip()
-
     establecimiento = getattr(request.user, 'establecimiento', None)
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
-
-    if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
-        try:
-            val = query_upper
-            if val.startswith('PAC-'):
-                val = int(val[4:])
-            else:
-                val = int(query_clean)
-            filtros |= Q(numero_ficha_sistema=val)
-        except:
-            pass
+    filtros = _filtros_ficha(query)
 
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Último movimiento ENVIADO o RECIBIDO de cada ficha que no haya sido traspasado aún
+    fichas = list(fichas)
+    movimientos = movimientos_traspasables_por_ficha(fichas, establecimiento)
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Buscar el último movimiento que esté en estado ENVIADO o RECIBIDO y no haya sido traspasado aún
-        ultimo_movimiento = MovimientoFicha.objects.filter(
-            ficha=ficha,
-            estado_recepcion__in=['EN ESPERA', 'RECIBIDO'],
-            establecimiento=establecimiento
-        ).exclude(
-            estado_traspaso='TRASPASADO'
-        ).order_by('-created_at').first()
+        ultimo_movimiento = movimientos.get(ficha.id)
 
         results.append({
             'paciente_id': paciente.id,
@@ -358,43 +280,25 @@ def buscar_paciente_ficha_api_monologo_traspaso(request):
     if not query:
         return JsonResponse({'results': []})
 
-    query_upper = query.upper()
-    query_clean = query.replace('.', '').replace('-', '').strip()
-
     establecimiento = getattr(request.user, 'establecimiento', None)
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    filtros = Q(paciente__rut=query_upper) | Q(paciente__rut=query_clean) | Q(paciente__rut=query_upper.lower()) | Q(
-        paciente__rut=query_clean.lower())
-
-    if query_clean.isdigit() or (query_upper.startswith('PAC-') and query_upper[4:].isdigit()):
-        try:
-            val = query_upper
-            if val.startswith('PAC-'):
-                val = int(val[4:])
-            else:
-                val = int(query_clean)
-            filtros |= Q(numero_ficha_sistema=val)
-        except:
-            pass
+    filtros = _filtros_ficha(query)
 
     fichas = Ficha.objects.filter(
         filtros,
         establecimiento=establecimiento
     ).select_related('paciente').distinct()
 
+    # Movimiento monólogo más reciente de cada ficha en este establecimiento
+    fichas = list(fichas)
+    movimientos = movimientos_monologo_en_transito_por_ficha(fichas, establecimiento, '-fecha_salida', '-id')
+
     results = []
     for ficha in fichas:
         paciente = ficha.paciente
-
-        # Buscar el movimiento monólogo más reciente para esta ficha y este establecimiento
-        ultimo_movimiento = MovimientoMonologoControlado.objects.filter(
-            ficha=ficha,
-            establecimiento=establecimiento,
-            estado='E',
-            status=True
-        ).order_by('-fecha_salida').first()
+        ultimo_movimiento = movimientos.get(ficha.id)
 
         data = {
             'paciente_id': paciente.id,
@@ -437,7 +341,8 @@ def buscar_paciente_general_api(request):
     if not establecimiento:
         return JsonResponse({'error': 'Usuario no tiene establecimiento asociado'}, status=403)
 
-    filtros = Q(paciente__rut__icontains=query_clean) | Q(paciente__nombre__icontains=query_upper) | \
+    filtros = get_paciente_rut_q_filter(query, prefix='paciente__') | \
+              Q(paciente__nombre__icontains=query_upper) | \
               Q(paciente__apellido_paterno__icontains=query_upper) | Q(
         paciente__apellido_materno__icontains=query_upper)
 
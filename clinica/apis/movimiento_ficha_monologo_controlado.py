@@ -6,6 +6,7 @@ from rest_framework.views import APIView
 
 from clinica.models.ficha import Ficha
 from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
+from clinica.services import ficha_en_transito_monologo
 from establecimientos.models.servicio_clinico import ServicioClinico
 from personas.models.pacientes import Paciente
 from personas.models.profesionales import Profesional
@@ -44,7 +45,7 @@ class RegistrarSalidaAPI(APIView):
                                     status=status.HTTP_404_NOT_FOUND)
 
                 # 2. Validar que no exista movimiento en estado 'E'
-                if MovimientoMonologoControlado.objects.filter(ficha=ficha, estado='E', status=True).exists():
+                if ficha_en_transito_monologo(ficha):
                     return Response({'error': 'Ya existe un movimiento en tránsito para esta ficha.'},
                                     status=status.HTTP_400_BAD_REQUEST)
 
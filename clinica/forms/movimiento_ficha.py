@@ -4,6 +4,7 @@ from django.utils import timezone
 
 from clinica.models import MovimientoFicha, Ficha
 from core.choices import ESTADO_RESPUESTA
+from core.utils.catalogos import CatalogoChoiceField
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.servicio_clinico import ServicioClinico
 from personas.models.profesionales import Profesional
@@ -77,10 +78,11 @@ class FormEntradaFicha(forms.ModelForm):
         required=True
     )
 
-    profesional_recepcion = forms.ModelChoiceField(
+    profesional_recepcion = CatalogoChoiceField(
+        Profesional,
         label='Profesional que recibe',
         empty_label="Seleccione un Profesional",
-        queryset=Profesional.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(
             attrs={
                 'id': 'profesional_movimiento',
@@ -101,7 +103,7 @@ class FormEntradaFicha(forms.ModelForm):
         # Filtrar opciones por establecimiento del usuario
         est = getattr(self.user, 'establecimiento', None)
         if est:
-            self.fields['profesional_recepcion'].queryset = Profesional.objects.filter(establecimiento=est, status=True)
+            self.fields['profesional_recepcion'].limitar(establecimiento_id=est.pk, status=True)
 
     def get_initial(self):
         initial = super().get_initial()
@@ -160,11 +162,9 @@ class FormSalidaFicha(forms.ModelForm):
         # Filtrar opciones por establecimiento del usuario
         est = getattr(self.user, 'establecimiento', None)
         if est:
-            self.fields['servicio_clinico_envio'].queryset = ServicioClinico.objects.filter(establecimiento=est,
-                                                                                            status=True)
-            self.fields['servicio_clinico_recepcion'].queryset = ServicioClinico.objects.filter(establecimiento=est,
-                                                                                                status=True)
-            self.fields['profesional_envio'].queryset = Profesional.objects.filter(establecimiento=est, status=True)
+            self.fields['servicio_clinico_envio'].limitar(establecimiento_id=est.pk, status=True)
+            self.fields['servicio_clinico_recepcion'].limitar(establecimiento_id=est.pk, status=True)
+            self.fields['profesional_envio'].limitar(establecimiento_id=est.pk, status=True)
 
         # Si el usuario tiene un servicio asignado, usarlo como inicial para envío
         if self.user and hasattr(self.user, 'servicio_clinico') and self.user.servicio_clinico:
@@ -207,10 +207,11 @@ class FormSalidaFicha(forms.ModelForm):
             }
         )
     )
-    servicio_clinico_envio = forms.ModelChoiceField(
+    servicio_clinico_envio = CatalogoChoiceField(
+        ServicioClinico,
         label='Servicio Clínico de Envío',
         empty_label="Selecciona un Servicio Clínico",
-        queryset=ServicioClinico.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(
             attrs={
                 'id': 'servicio_clinico_ficha',
@@ -220,10 +221,11 @@ class FormSalidaFicha(forms.ModelForm):
         required=True
     )
 
-    servicio_clinico_recepcion = forms.ModelChoiceField(
+    servicio_clinico_recepcion = CatalogoChoiceField(
+        ServicioClinico,
         label='Servicio Clínico de Recepción',
         empty_label="Selecciona un Servicio Clínico",
-        queryset=ServicioClinico.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(
             attrs={
                 'id': 'servicio_clinico_recepcion',
@@ -243,10 +245,11 @@ class FormSalidaFicha(forms.ModelForm):
         }),
         required=False
     )
-    profesional_envio = forms.ModelChoiceField(
+    profesional_envio = CatalogoChoiceField(
+        Profesional,
         label='Profesional que envía',
         empty_label="Seleccione un Profesional",
-        queryset=Profesional.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(
             attrs={
                 'id': 'profesional_movimiento',
@@ -324,9 +327,8 @@ class FormTraspasoFicha(forms.ModelForm):
         # Filtrar opciones por establecimiento del usuario
         est = getattr(self.user, 'establecimiento', None)
         if est:
-            self.fields['servicio_clinico_traspaso'].queryset = ServicioClinico.objects.filter(establecimiento=est,
-                                                                                               status=True)
-            self.fields['profesional_traspaso'].queryset = Profesional.objects.filter(establecimiento=est, status=True)
+            self.fields['servicio_clinico_traspaso'].limitar(establecimiento_id=est.pk, status=True)
+            self.fields['profesional_traspaso'].limitar(establecimiento_id=est.pk, status=True)
 
         # Si el usuario tiene un servicio asignado, usarlo como inicial para traspaso
         if self.user and hasattr(self.user, 'servicio_clinico') and self.user.servicio_clinico:
@@ -375,10 +377,11 @@ class FormTraspasoFicha(forms.ModelForm):
         })
     )
 
-    servicio_clinico_traspaso = forms.ModelChoiceField(
+    servicio_clinico_traspaso = CatalogoChoiceField(
+        ServicioClinico,
         label='Servicio Clínico de Traspaso',
         empty_label='Seleccione un Servicio Clínico',
-        queryset=ServicioClinico.objects.filter(status=True).all(),
+        filtros={'status': True},
         required=True,
         widget=forms.Select(attrs={
             'id': 'servicio_clinico_ficha',
@@ -410,10 +413,11 @@ class FormTraspasoFicha(forms.ModelForm):
     )
 
     # Profesional traspaso
-    profesional_traspaso = forms.ModelChoiceField(
+    profesional_traspaso = CatalogoChoiceField(
+        Profesional,
         label='Profesional que traslada',
         empty_label="Seleccione un Profesional",
-        queryset=Profesional.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(
             attrs={
                 'id': 'profesional_movimiento',
@@ -472,7 +476,7 @@ class FiltroSalidaFichaForm(forms.Form):
         est = getattr(self.user, 'establecimiento', None)
         if est:
             if 'profesional' in self.fields:
-                self.fields['profesional'].queryset = Profesional.objects.filter(establecimiento=est, status=True)
+                self.fields['profesional'].limitar(establecimiento_id=est.pk, status=True)
 
     hora_inicio = forms.DateTimeField(
         label="Hora inicio",
@@ -490,16 +494,17 @@ class FiltroSalidaFichaForm(forms.Form):
         }),
         required=False
     )
-    servicio_clinico = forms.ModelChoiceField(
+    servicio_clinico = CatalogoChoiceField(
+        ServicioClinico,
         label="Servicio Clínico",
-        queryset=ServicioClinico.objects.filter(status=True).all(),
+        filtros={'status': True},
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional = forms.ModelChoiceField(
+    profesional = CatalogoChoiceField(
+        Profesional,
         label="Profesional asignado",
-        queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
@@ -515,10 +520,10 @@ class MovimientoFichaForm(forms.ModelForm):
         if est is not None:
             for fname in ['servicio_clinico_envio', 'servicio_clinico_recepcion', 'servicio_clinico_traspaso']:
                 if fname in self.fields:
-                    self.fields[fname].queryset = ServicioClinico.objects.filter(establecimiento=est, status=True)
+                    self.fields[fname].limitar(establecimiento_id=est.pk, status=True)
             for fname in ['profesional_envio', 'profesional_recepcion', 'profesional_traspaso']:
                 if fname in self.fields:
-                    self.fields[fname].queryset = Profesional.objects.filter(establecimiento=est, status=True)
+                    self.fields[fname].limitar(establecimiento_id=est.pk, status=True)
 
         # Ficha: por defecto vacío; si estamos editando, asegurar que la ficha actual esté disponible
         instance = kwargs.get('instance') or getattr(self, 'instance', None)
@@ -630,44 +635,44 @@ class MovimientoFichaForm(forms.ModelForm):
     )
 
     # ---------------- SERVICIOS ----------------
-    servicio_clinico_envio = forms.ModelChoiceField(
+    servicio_clinico_envio = CatalogoChoiceField(
+        ServicioClinico,
         label="Servicio clínico de envío",
-        queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    servicio_clinico_recepcion = forms.ModelChoiceField(
+    servicio_clinico_recepcion = CatalogoChoiceField(
+        ServicioClinico,
         label="Servicio clínico de recepción",
-        queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    servicio_clinico_traspaso = forms.ModelChoiceField(
+    servicio_clinico_traspaso = CatalogoChoiceField(
+        ServicioClinico,
         label="Servicio clínico de traspaso",
-        queryset=ServicioClinico.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
     # ---------------- PROFESIONALES ----------------
-    profesional_envio = forms.ModelChoiceField(
+    profesional_envio = CatalogoChoiceField(
+        Profesional,
         label="Profesional envío",
-        queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional_recepcion = forms.ModelChoiceField(
+    profesional_recepcion = CatalogoChoiceField(
+        Profesional,
         label="Profesional recepción",
-        queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
 
-    profesional_traspaso = forms.ModelChoiceField(
+    profesional_traspaso = CatalogoChoiceField(
+        Profesional,
         label="Profesional traspaso",
-        queryset=Profesional.objects.all(),
         widget=forms.Select(attrs={'class': 'form-control select2'}),
         required=False
     )
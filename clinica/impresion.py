@@ -0,0 +1,537 @@
+import functools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+from reportlab.graphics import renderPDF
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm, mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle, Paragraph
+
+from clinica.models import Ficha
+from core.utils.catalogos import resolver
+from core.utils.codigos_barras import ancho_barcode, barcode_drawing, dibujar_barcode
+
+# =========================================================
+# IMPRESIÓN DE CARÁTULAS Y STICKERS
+# =========================================================
+# Cada formato dibuja las páginas de una ficha sobre un canvas de reportlab. Las vistas de una ficha y
+# la impresión por lote (vista pdf_impresion_lote y comando imprimir_fichas) usan las mismas funciones:
+# el lote trae todas las fichas con una sola consulta y escribe un único PDF de varias páginas.
+
+# Bytes del PDF que se mantienen en memoria antes de pasar a un archivo temporal
+MAX_PDF_EN_MEMORIA = 10 * 1024 * 1024
+
+
+def obtener_numero_rut(rut_str: str) -> str:
+    if not rut_str:
+        return ''
+    # Normalizar: quitar separadores y conservar todos los caracteres del RUT incluyendo DV
+    s = str(rut_str).strip()
+    # Eliminar separadores comunes (puntos, guiones y espacios), conservar alfanuméricos
+    cleaned = ''.join(ch for ch in s if ch.isalnum())
+    # En Chile el DV puede ser 'K' o 'k'; normalizamos a mayúscula
+    cleaned = cleaned.upper()
+    return cleaned
+
+
+def codigo_barras_de(paciente, ficha):
+    """Valor del código de barras: RUT sin separadores o, si no hay, código del paciente o número de ficha."""
+    numero_rut = obtener_numero_rut(getattr(paciente, 'rut', '') or '')
+    if not numero_rut:
+        numero_rut = (getattr(paciente, 'codigo', '') or str(getattr(ficha, 'numero_ficha_sistema', '') or '')).strip()
+    return numero_rut
+
+
+# ==================== CARÁTULA ====================
+# Estilos, tablas y geometría de la carátula se arman una sola vez por proceso (plantilla_caratula). Lo
+# que no cambia entre pacientes —grilla, bordes, etiquetas y el recuadro "Fecha Creación"— se dibuja una
+# vez por PDF como form de reportlab y cada página lo reutiliza con doForm; encima solo se escriben los
+# valores de la ficha en posiciones fijas. Si algún valor no cabe en una línea de su celda, esa página se
+# dibuja con la tabla completa (filas de alto variable), igual que antes.
+
+MARGEN_CARATULA = 1 * cm
+
+# Celdas de la tabla principal bajo el encabezado: (fila, columna inicial, columna final, etiqueta, valor)
+CELDAS_CARATULA = (
+    (1, 0, 1, 'Apellido Paterno, Apellido Materno, Nombres', 'nombre_completo'),
+    (1, 2, 2, 'Sexo', 'sexo'),
+    (1, 3, 3, 'Estado Civil', 'estado_civil'),
+    (2, 0, 1, 'Fecha de Nacimiento', 'fecha_nacimiento'),
+    (2, 2, 3, 'Fecha de Fallecimiento', 'fecha_fallecimiento'),
+    (3, 0, 1, 'Dirección', 'direccion'),
+    (3, 2, 2, 'N° Teléfono 1', 'telefono1'),
+    (3, 3, 3, 'N° Teléfono 2', 'telefono2'),
+    (4, 0, 1, 'Nombre Social', 'nombre_social'),
+    (4, 2, 2, 'Nombre Madre', 'nombre_madre'),
+    (4, 3, 3, 'Nombre Padre', 'nombre_padre'),
+    (5, 0, 1, 'Nombre del Cónyuge', 'conyuge'),
+    (5, 2, 3, 'Previsión', 'prevision'),
+    (6, 0, 1, 'Representante Legal', 'representante_legal'),
+    (6, 2, 3, 'Ocupación', 'ocupacion'),
+)
+
+
+def _fecha(valor):
+    return valor.strftime("%d/%m/%Y") if valor else "-"
+
+
+def valores_caratula(ficha, paciente, mostrar_rut=True):
+    """Textos de la carátula de una ficha; ``mostrar_rut=False`` es la variante de recién nacido."""
+    resolver([paciente], 'comuna', 'prevision')
+    numero = ficha.numero_ficha_sistema or 0
+    num_ficha_str = f"{numero:,}".replace(",", ".")
+    sexo = paciente.get_sexo_display() if hasattr(paciente, 'get_sexo_display') else paciente.sexo
+    estado_civil = (paciente.get_estado_civil_display() if hasattr(paciente, 'get_estado_civil_display')
+                    else paciente.estado_civil)
+
+    valores = {
+        'numero_ficha': num_ficha_str,
+        'fecha_creacion': _fecha(ficha.fecha_creacion_anterior or ficha.created_at),
+        'codigo_barras': codigo_barras_de(paciente, ficha),
+        'establecimiento': getattr(ficha.establecimiento, 'nombre', '-'),
+        'rut': f"R.U.T: {paciente.rut or '-'}" if mostrar_rut else "R.U.T: ",
+        'ficha': f"Ficha: {num_ficha_str}",
+        'pasaporte': f"Pasaporte: {paciente.pasaporte or '-'}",
+        'fallecido': bool(paciente.fecha_fallecimiento),
+    }
+    celdas = {
+        'nombre_completo': f"{paciente.apellido_paterno or ''} {paciente.apellido_materno or ''} {paciente.nombre or ''}",
+        'sexo': sexo,
+        'estado_civil': estado_civil,
+        'fecha_nacimiento': _fecha(paciente.fecha_nacimiento),
+        'fecha_fallecimiento': _fecha(paciente.fecha_fallecimiento),
+        'direccion': f"{paciente.direccion or ''}, {paciente.comuna.nombre if paciente.comuna else ''}",
+        'telefono1': paciente.numero_telefono1,
+        'telefono2': paciente.numero_telefono2,
+        'nombre_social': paciente.nombre_social,
+        'nombre_madre': paciente.nombres_madre,
+        'nombre_padre': paciente.nombres_padre,
+        'conyuge': paciente.nombre_pareja,
+        'prevision': paciente.prevision.nombre if paciente.prevision else "-",
+        'representante_legal': paciente.representante_legal,
+        'ocupacion': paciente.ocupacion,
+    }
+    valores.update({clave: str(valor or "-") for clave, valor in celdas.items()})
+    return valores
+
+
+class PlantillaCaratula:
+    """
+    Estilos, tablas y posiciones de la carátula. Usar la instancia del proceso (``plantilla_caratula()``):
+    construir una nueva equivale a lo que antes se hacía en cada impresión.
+    """
+
+    NOMBRE_FORM = 'plantilla_caratula'
+
+    def __init__(self):
+        width, height = letter
+        self.tope = height - MARGEN_CARATULA
+        ancho_util = width - 2 * MARGEN_CARATULA
+        self.anchos_columnas = [ancho_util * 0.4, ancho_util * 0.1, ancho_util * 0.25, ancho_util * 0.25]
+
+        normal = getSampleStyleSheet()['Normal']
+        self.estilo_fecha_etiqueta = ParagraphStyle('FechaLabel', parent=normal, fontSize=11, alignment=1,
+                                                    fontName='Helvetica-Bold')
+        self.estilo_fecha_valor = ParagraphStyle('FechaValue', parent=normal, fontSize=12, alignment=1)
+        self.estilo_etiqueta = ParagraphStyle('CustomLabel', parent=normal, fontSize=11, leading=12,
+                                              fontName='Helvetica-Bold')
+        self.estilo_valor = ParagraphStyle('CustomValue', parent=normal, fontSize=12, leading=14,
+                                           fontName='Helvetica')
+        self.estilo_valor_negrita = ParagraphStyle('CustomValueBold', parent=self.estilo_valor,
+                                                   fontName='Helvetica-Bold')
+        self.estilo_valor_rojo = ParagraphStyle('CustomValueRed', parent=self.estilo_valor_negrita,
+                                                textColor=colors.red)
+        self.estilo_h1 = ParagraphStyle('HeaderH1', parent=normal, fontSize=20, leading=22,
+                                        fontName='Helvetica-Bold')
+        self.estilo_h2 = ParagraphStyle('HeaderH2', parent=normal, fontSize=18, leading=20,
+                                        fontName='Helvetica-Bold')
+
+        self.estilo_tabla_fecha = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('LINEBELOW', (0, 0), (0, 0), 1, colors.black),
+            ('ROUNDEDCORNERS', [8, 8, 8, 8]),
+        ])
+        spans = [('SPAN', (0, 0), (1, 0)), ('SPAN', (2, 0), (3, 0))] + [
+            ('SPAN', (inicio, fila), (fin, fila)) for fila, inicio, fin, _, _ in CELDAS_CARATULA if fin != inicio
+        ]
+        self.estilo_tabla_datos = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            *spans,
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('ROUNDEDCORNERS', [8, 8, 8, 8]),
+        ])
+
+        self.campos = None
+
+    # ==================== TABLAS ====================
+
+    def _estilo_celda(self, clave, valores):
+        if clave == 'nombre_completo':
+            return self.estilo_valor_negrita
+        if clave == 'fecha_fallecimiento' and valores.get('fallecido'):
+            return self.estilo_valor_rojo
+        return self.estilo_valor
+
+    def tabla_fecha(self, fecha_str):
+        tabla = Table([
+            [Paragraph("Fecha Creación", self.estilo_fecha_etiqueta)],
+            [Paragraph(fecha_str, self.estilo_fecha_valor) if fecha_str else ''],
+        ], colWidths=[3.8 * cm], rowHeights=[0.6 * cm, 0.7 * cm])
+        tabla.setStyle(self.estilo_tabla_fecha)
+        return tabla
+
+    def tabla_datos(self, valores=None, alto_filas=None):
+        """Tabla principal; sin ``valores`` solo lleva las etiquetas (la parte estática del form)."""
+        data = [['', '', '', ''] for _ in range(7)]
+        if valores:
+            data[0][0] = [Paragraph(valores['establecimiento'], self.estilo_h2),
+                          Paragraph(valores['rut'], self.estilo_h1)]
+            data[0][2] = [Paragraph(valores['ficha'], self.estilo_h2),
+                          Paragraph(f"<b>{valores['pasaporte']}</b>", self.estilo_valor_negrita)]
+
+        for fila, columna, _, etiqueta, clave in CELDAS_CARATULA:
+            celda = [Paragraph(etiqueta, self.estilo_etiqueta)]
+            if valores:
+                celda.append(Paragraph(valores[clave], self._estilo_celda(clave, valores)))
+            data[fila][columna] = celda
+
+        tabla = Table(data, colWidths=self.anchos_columnas, rowHeights=alto_filas)
+        tabla.setStyle(self.estilo_tabla_datos)
+        return tabla
+
+    def dibujar_tabla(self, p, valores):
+        """Carátula completa con tablas de reportlab (las filas crecen si un valor ocupa varias líneas)."""
+        self._dibujar_encabezado(p, valores)
+
+        table_fecha = self.tabla_fecha(valores['fecha_creacion'])
+        tw, th = table_fecha.wrap(0, 0)
+        table_fecha.drawOn(p, letter[0] - MARGEN_CARATULA - tw, self.tope - th)
+
+        main_table = self.tabla_datos(valores)
+        tw, th = main_table.wrap(0, 0)
+        # 50px de margen superior aprox 1.76cm. El header ocupa espacio.
+        main_table.drawOn(p, MARGEN_CARATULA, self.tope - 2 * cm - th)
+
+    def _dibujar_encabezado(self, p, valores):
+        # Número de ficha (el HTML tiene un line-height de 0.8 y margin-top 0)
+        p.setFillColor(colors.black)
+        p.setFont("Helvetica-Bold", 40)
+        p.drawString(MARGEN_CARATULA, self.tope - 1.4 * cm, valores['numero_ficha'])
+
+        # Código de barras vectorial, centrado (en HTML max-height: 90px ~2.4cm)
+        alto, ancho_barra = 1.5 * cm, 1.2
+        ancho = ancho_barcode(valores['codigo_barras'], ancho_barra)
+        dibujar_barcode(p, valores['codigo_barras'], (letter[0] - ancho) / 2, self.tope - 1.8 * cm, alto,
+                        ancho_barra)
+
+    # ==================== PLANTILLA COMPILADA ====================
+
+    def compilar(self):
+        """Mide la carátula con valores de una línea y fija el form estático y la posición de cada valor."""
+        valores = dict.fromkeys(['establecimiento', 'rut', 'ficha', 'pasaporte'], '-')
+        valores.update({clave: '-' for *_, clave in CELDAS_CARATULA})
+        tabla = self.tabla_datos(valores)
+        _, alto_tabla = tabla.wrap(0, 0)
+        self.alto_filas = list(tabla._rowHeights)
+
+        x0, y0 = MARGEN_CARATULA, self.tope - 2 * cm - alto_tabla
+        bordes_x = [x0 + sum(self.anchos_columnas[:i]) for i in range(5)]
+        topes_y = [y0 + alto_tabla - sum(self.alto_filas[:i]) for i in range(7)]
+        self.origen_tabla = (x0, y0)
+
+        def campo(clave, columna, fin, y, fuente, tamano):
+            # Misma caja que el Paragraph dentro de la celda (padding de 6 a cada lado)
+            return clave, bordes_x[columna] + 6, y, bordes_x[fin + 1] - bordes_x[columna] - 12, fuente, tamano
+
+        # Línea base = tope de la celda - padding - (altos de línea previos) - tamaño de la fuente
+        tope = topes_y[0] - 6
+        self.campos = [
+            campo('establecimiento', 0, 1, tope - 18, 'Helvetica-Bold', 18),
+            campo('rut', 0, 1, tope - 20 - 20, 'Helvetica-Bold', 20),
+            campo('ficha', 2, 3, tope - 18, 'Helvetica-Bold', 18),
+            campo('pasaporte', 2, 3, tope - 20 - 12, 'Helvetica-Bold', 12),
+        ]
+        for fila, columna, fin, _, clave in CELDAS_CARATULA:
+            fuente = 'Helvetica-Bold' if clave == 'nombre_completo' else 'Helvetica'
+            self.campos.append(campo(clave, columna, fin, topes_y[fila] - 6 - 12 - 12, fuente, 12))
+
+        # Recuadro de la fecha: valor centrado en la segunda fila (VALIGN MIDDLE, una línea de 12)
+        tabla_fecha = self.tabla_fecha('')
+        ancho_fecha, alto_fecha = tabla_fecha.wrap(0, 0)
+        self.origen_fecha = (letter[0] - MARGEN_CARATULA - ancho_fecha, self.tope - alto_fecha)
+        self.posicion_fecha = (self.origen_fecha[0] + ancho_fecha / 2,
+                               self.origen_fecha[1] + (0.7 * cm + 12) / 2 - 12)
+        return self
+
+    def _definir_form(self, p):
+        p.beginForm(self.NOMBRE_FORM)
+        for tabla, origen in ((self.tabla_fecha(''), self.origen_fecha),
+                              (self.tabla_datos(alto_filas=self.alto_filas), self.origen_tabla)):
+            tabla.wrap(0, 0)
+            tabla.drawOn(p, *origen)
+        p.endForm()
+
+    @staticmethod
+    def _texto(valor):
+        # Igual que un Paragraph: espacios repetidos o en los extremos no se dibujan
+        return ' '.join(valor.split())
+
+    def cabe(self, valores):
+        """True si cada valor entra en una sola línea de su celda (geometría de la plantilla)."""
+        return all(
+            stringWidth(self._texto(valores[clave]), fuente, tamano) <= ancho
+            for clave, _, _, ancho, fuente, tamano in self.campos
+        )
+
+    def dibujar(self, p, ficha, paciente, mostrar_rut=True):
+        """Carátula de la ficha en la página actual del canvas (sin showPage)."""
+        valores = valores_caratula(ficha, paciente, mostrar_rut)
+        if not self.cabe(valores):
+            self.dibujar_tabla(p, valores)
+            return
+
+        if not p.hasForm(self.NOMBRE_FORM):
+            self._definir_form(p)
+        p.doForm(self.NOMBRE_FORM)
+
+        self._dibujar_encabezado(p, valores)
+        p.setFont('Helvetica', 12)
+        p.drawCentredString(*self.posicion_fecha, valores['fecha_creacion'])
+
+        for clave, x, y, _, fuente, tamano in self.campos:
+            rojo = clave == 'fecha_fallecimiento' and valores['fallecido']
+            if rojo:
+                p.setFillColor(colors.red)
+                fuente = 'Helvetica-Bold'
+            p.setFont(fuente, tamano)
+            p.drawString(x, y, self._texto(valores[clave]))
+            if rojo:
+                p.setFillColor(colors.black)
+
+
+@functools.lru_cache(maxsize=None)
+def plantilla_caratula():
+    """Plantilla de la carátula del proceso (se compila en la primera impresión)."""
+    return PlantillaCaratula().compilar()
+
+
+def dibujar_caratula(p, ficha, paciente, mostrar_rut=True):
+    """Carátula de la ficha en la página actual del canvas (sin showPage)."""
+    plantilla_caratula().dibujar(p, ficha, paciente, mostrar_rut)
+
+
+# ==================== STICKERS ====================
+
+def dibujar_stickers_66_25(c, ficha, paciente):
+    """Hoja de 30 stickers de 66x25 mm de la ficha en la página actual del canvas (sin showPage)."""
+    # Preparar datos
+    nombre = (getattr(paciente, 'nombre', '') or '').strip()
+    partes = nombre.split()
+    primer_nombre = partes[0] if partes else ''
+    apellido_paterno = getattr(paciente, 'apellido_paterno', '') or ''
+    apellido_materno = getattr(paciente, 'apellido_materno', '') or ''
+    nombre_corto = f"{primer_nombre} {apellido_paterno} {apellido_materno}".strip().upper()
+
+    fecha_nac = paciente.fecha_nacimiento.strftime("%d/%m/%Y") if paciente.fecha_nacimiento else ""
+    resolver([paciente], 'comuna')
+    comuna = paciente.comuna.nombre if paciente.comuna else ""
+    info_nac = f"Nac: {fecha_nac}"
+    if comuna:
+        info_nac += f" - {comuna}"
+
+    num_ficha = ""
+    if ficha:
+        n = getattr(ficha, 'numero_ficha', getattr(ficha, 'numero_ficha_sistema', 0))
+        try:
+            num_ficha = f"FICHA {int(n):04d}"
+        except (ValueError, TypeError):
+            num_ficha = f"FICHA {n}"
+
+    rut_str = paciente.rut or "SIN RUT"
+
+    # Generar código de barras basado en el RUT o código
+    numero_rut = codigo_barras_de(paciente, ficha)
+
+    width_page, height_page = letter  # 215.9mm x 279.4mm
+
+    # Medidas según HTML:
+    # padding: 14mm 5mm 0 5mm;
+    # grid-template-columns: repeat(3, 66mm);
+    # grid-template-rows: repeat(10, 25mm);
+    # gap: 0mm 2mm;
+
+    col_width = 67 * mm
+    row_height = 26 * mm
+    gap_x = 5 * mm  # El usuario no menciona gap ahora, pero el ancho total 66.7*3 = 200.1mm cabe en 215.9mm
+    margin_top = 10 * mm  # 1 centimetro
+    margin_left = 5 * mm  # 0.5 centimetros
+    
+    # --- Variables de ajuste para el usuario ---
+    # Si necesita mover all el bloque hacia arriba o abajo, puede ajustar margin_top.
+    # El usuario pidió indicarle variables para ajustar milímetros/centímetros.
+    # margin_top = 1.0 * cm  # Ejemplo en cm
+
+    # En ReportLab el origen (0,0) es abajo a la izquierda.
+    # Necesitamos calcular las posiciones Y desde arriba.
+    
+    # Código de barras vectorial (caché por RUT): se dibuja una vez como form y se reutiliza en cada sticker
+    bc_height = 4 * mm
+    try:
+        bc = barcode_drawing(numero_rut, bc_height, ancho_barra=1)
+    except Exception:
+        bc = None
+    # En un lote el form se define una sola vez por código (mismo paciente en varias fichas)
+    nombre_form = f'codigo_barras_{numero_rut}'
+    if bc is not None and not c.hasForm(nombre_form):
+        c.beginForm(nombre_form)
+        renderPDF.draw(bc, c, 0, 0)
+        c.endForm()
+
+    for row in range(10):
+        for col in range(3):
+            # Coordenadas de la celda
+            x = margin_left + col * (col_width + gap_x) # quitar los parentesis y el gap en caso de no requerir separacion
+            y = height_page - margin_top - (row + 1) * row_height
+            
+            # --- Dibujar bordes del sticker (Solicitado por el usuario para ver separaciones) ---
+            c.setDash(1, 2)  # Línea discontinua opcional, o c.setDash() para sólida
+            c.setLineWidth(0.1)
+            c.rect(x, y, col_width, row_height, stroke=0, fill=0) # el stroke son las lineas que se muestran en el fondo del sticker
+            c.setDash()  # Restaurar a sólida para el resto del contenido
+            
+            # --- Dibujar contenido del sticker ---
+            # El sticker mide 25.4mm de alto.
+            # El último elemento (código de barras) debe tener un padding de 4mm para quedar justo al límite.
+            # Si el código de barras tiene que quedar "al final bajo, justo en los 25mm",
+            # y el alto es 25.4mm, calculamos desde el fondo de la celda.
+            
+            inner_x_center = x + col_width / 2.0
+            
+            # Calculamos las posiciones Y desde abajo hacia arriba
+            # El usuario dice: "el último elemento el codigo de barra debe tener un padding de 4mm"
+            # "el codigo de barra tiene que quedar al final bajo, justo en los 25mm" (asumo que se refiere a la base del sticker)
+            
+            bottom_padding = 1 * mm
+            bc_draw_y = y + bottom_padding
+            
+            # Espaciado entre elementos (ajustable para que quepan)
+            inter_spacing = 1.0 * mm
+            
+            rut_y = bc_draw_y + bc_height + 0.5 * mm
+            ficha_y = rut_y + 8 + inter_spacing
+            info_y = ficha_y + 8 + inter_spacing
+            nombre_y = info_y + 6.5 + inter_spacing
+
+            # 5. Código de barras (Abajo con padding de 4mm): el mismo form en los 30 stickers
+            if bc is not None:
+                c.saveState()
+                c.translate(inner_x_center - bc.width / 2.0, bc_draw_y)
+                c.doForm(nombre_form)
+                c.restoreState()
+
+            # 4. RUT (8pt)
+            c.setFont("Helvetica", 8)
+            c.drawCentredString(inner_x_center, rut_y, rut_str)
+
+            # 3. Ficha (8pt Bold)
+            c.setFont("Helvetica-Bold", 8)
+            c.drawCentredString(inner_x_center, ficha_y, num_ficha)
+
+            # 2. Info Nacimiento (6.5pt)
+            c.setFont("Helvetica", 6.5)
+            c.drawCentredString(inner_x_center, info_y, info_nac)
+
+            # 1. Nombre (8pt Bold)
+            c.setFont("Helvetica-Bold", 8)
+            c.drawCentredString(inner_x_center, nombre_y, nombre_corto)
+
+
+FORMATOS = {
+    'caratula': dibujar_caratula,
+    'stickers': dibujar_stickers_66_25,
+}
+
+
+# ==================== LOTES ====================
+
+def fichas_a_imprimir(ids=None, desde=None, hasta=None, sector_id=None, establecimiento_id=None):
+    """
+    Fichas con paciente a imprimir, filtradas por IDs, rango de fecha de creación y/o sector. Trae en la
+    misma consulta (select_related) todo lo que dibujan los formatos; comuna y previsión salen del
+    catálogo en memoria (core.utils.catalogos).
+    """
+    fichas = Ficha.objects.select_related('paciente', 'establecimiento').filter(paciente__isnull=False)
+
+    if establecimiento_id:
+        fichas = fichas.filter(establecimiento_id=establecimiento_id)
+    if ids:
+        fichas = fichas.filter(id__in=ids)
+    if desde:
+        fichas = fichas.filter(created_at__date__gte=desde)
+    if hasta:
+        fichas = fichas.filter(created_at__date__lte=hasta)
+    if sector_id:
+        fichas = fichas.filter(sector_id=sector_id)
+    return fichas.order_by('numero_ficha_sistema', 'id')
+
+
+def generar_pdf(fichas, formato, destino):
+    """Escribe en ``destino`` (ruta o archivo) un PDF con las páginas de cada ficha. Devuelve cuántas se dibujaron."""
+    dibujar = FORMATOS[formato]
+    c = canvas.Canvas(destino, pagesize=letter)
+
+    total = 0
+    for ficha in fichas.iterator(chunk_size=500):
+        dibujar(c, ficha, ficha.paciente)
+        c.showPage()
+        total += 1
+
+    c.save()
+    return total
+
+
+def pdf_en_archivo_temporal(fichas, formato):
+    """PDF del lote en un archivo temporal (en memoria hasta MAX_PDF_EN_MEMORIA), posicionado al inicio."""
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_PDF_EN_MEMORIA)
+    total = generar_pdf(fichas, formato, archivo)
+    archivo.seek(0)
+    return archivo, total
+
+
+def _iniciar_proceso():
+    import django
+
+    django.setup()
+
+
+def _generar_parte(formato, ids, ruta):
+    return ruta, generar_pdf(fichas_a_imprimir(ids=ids), formato, ruta)
+
+
+def generar_pdf_por_partes(ids, formato, directorio, prefijo, por_archivo, procesos=1):
+    """
+    Divide un lote grande en PDFs de hasta ``por_archivo`` fichas (``prefijo_001.pdf``, ...) y, con más de
+    un proceso, los genera en paralelo. Devuelve [(ruta, fichas dibujadas)] en el orden de ``ids``.
+    """
+    partes = [ids[i:i + por_archivo] for i in range(0, len(ids), por_archivo)]
+    rutas = [os.path.join(directorio, f'{prefijo}_{n:03d}.pdf') for n in range(1, len(partes) + 1)]
+
+    if procesos <= 1 or len(partes) <= 1:
+        return [_generar_parte(formato, parte, ruta) for parte, ruta in zip(partes, rutas)]
+
+    # Cada proceso abre su propia conexión: no debe heredar la del proceso principal
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool:
+        return list(pool.map(_generar_parte, [formato] * len(partes), partes, rutas))
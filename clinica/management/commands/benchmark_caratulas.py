@@ -0,0 +1,108 @@
+# python manage.py benchmark_caratulas --fichas 200
+
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from clinica.impresion import PlantillaCaratula, plantilla_caratula, valores_caratula
+from clinica.models import Ficha
+from establecimientos.models.establecimiento import Establecimiento
+from geografia.models.comuna import Comuna
+from personas.models.pacientes import Paciente
+from personas.models.prevision import Prevision
+
+
+class Command(BaseCommand):
+    help = 'Mide carátulas por segundo (una por PDF y en lote) con la tabla completa y con la plantilla compilada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichas', type=int, default=200, help='Carátulas a dibujar por medición (por defecto: 200)')
+
+    # ================== FORMAS DE DIBUJAR ==================
+
+    def antes(self, c, ficha, paciente):
+        # Estilos y tablas armados en cada carátula, como antes de la plantilla del proceso
+        PlantillaCaratula().dibujar_tabla(c, valores_caratula(ficha, paciente))
+
+    def tabla_en_cache(self, c, ficha, paciente):
+        plantilla_caratula().dibujar_tabla(c, valores_caratula(ficha, paciente))
+
+    def compilada(self, c, ficha, paciente):
+        plantilla_caratula().dibujar(c, ficha, paciente)
+
+    # ================== MODOS ==================
+
+    def individual(self, dibujar, fichas):
+        """Un PDF por carátula (vistas pdf_caratula_*)."""
+        total_bytes = 0
+        for ficha in fichas:
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=letter)
+            dibujar(c, ficha, ficha.paciente)
+            c.showPage()
+            c.save()
+            total_bytes += len(buffer.getvalue())
+        return total_bytes / len(fichas)
+
+    def lote(self, dibujar, fichas):
+        """Un PDF con una página por carátula (impresión por lote)."""
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        for ficha in fichas:
+            dibujar(c, ficha, ficha.paciente)
+            c.showPage()
+        c.save()
+        return len(buffer.getvalue()) / len(fichas)
+
+    def medir(self, modo, dibujar, fichas):
+        inicio = time.perf_counter()
+        bytes_pagina = modo(dibujar, fichas)
+        total = time.perf_counter() - inicio
+        return len(fichas) / total, bytes_pagina
+
+    def handle(self, *args, **options):
+        cantidad = options['fichas']
+
+        # Instancias sin guardar, también las de catálogo que lee la carátula (comuna y previsión): se mide
+        # solo el dibujo del PDF y el comando no depende de los datos de la base (genero=None evita la búsqueda
+        # del valor por defecto)
+        establecimiento = Establecimiento(id=1, nombre='HOSPITAL DE PRUEBA')
+        comuna = Comuna(nombre='COMUNA DE PRUEBA')
+        prevision = Prevision(nombre='FONASA')
+        fichas = []
+        for i in range(1, cantidad + 1):
+            paciente = Paciente(
+                id=i, rut=f'{10_000_000 + i:,}'.replace(',', '.') + '-K', nombre=f'PACIENTE {i}',
+                apellido_paterno='GONZÁLEZ', apellido_materno='MUÑOZ', direccion=f'PASAJE LOS AROMOS {i}',
+                numero_telefono1='912345678', fecha_nacimiento=timezone.localdate(),
+                comuna=comuna, prevision=prevision, genero=None,
+            )
+            ficha = Ficha(id=i, numero_ficha_sistema=i, establecimiento=establecimiento,
+                          created_at=timezone.now())
+            ficha.paciente = paciente
+            fichas.append(ficha)
+
+        # La plantilla del proceso se compila antes de medir (primera impresión del proceso)
+        plantilla_caratula()
+
+        resultados = [
+            ('Antes (estilos y tablas por carátula)', self.antes),
+            ('Tablas con estilos del proceso', self.tabla_en_cache),
+            ('Plantilla compilada (form + valores)', self.compilada),
+        ]
+
+        self.stdout.write(self.style.SUCCESS(f'Carátulas por medición: {cantidad}'))
+        for titulo_modo, modo in (('Un PDF por carátula', self.individual), ('Lote en un PDF', self.lote)):
+            self.stdout.write(self.style.SUCCESS(f'--- {titulo_modo} ---'))
+            base = None
+            for nombre, dibujar in resultados:
+                por_segundo, bytes_pagina = self.medir(modo, dibujar, fichas)
+                base = base or por_segundo
+                self.stdout.write(
+                    f'{nombre:<40} {por_segundo:10.1f} carátulas/s  {bytes_pagina:>10,.0f} bytes/carátula  '
+                    f'x{por_segundo / base:.1f}'
+                )
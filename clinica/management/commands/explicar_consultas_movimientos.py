@@ -0,0 +1,204 @@
+# python manage.py explicar_consultas_movimientos --establecimiento 1 --seed 5000 --fail-on-scan
+
+import random
+import re
+import sys
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from tqdm import tqdm
+
+from clinica.models import Ficha, MovimientoFicha
+from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
+from clinica.services import reservar_numeros_ficha
+from clinica.views.movimiento_ficha import (
+    SalidaTablaFichaView, RecepcionTablaFichaView, TraspasoTablaFichaView, FichasEnTransito
+)
+from clinica.views.movimiento_ficha_monologo_controlado import (
+    SalidaFichaView, TraspasoFichaView, RecepcionFichaView, FichasEnTransitoView
+)
+from clinica.views.pdf import pdf_movimientos_fichas, pdf_movimientos_fichas_monologo_controlado
+from establecimientos.models.establecimiento import Establecimiento
+from establecimientos.models.servicio_clinico import ServicioClinico
+
+DATATABLE_PARAMS = {'datatable': '1', 'draw': '1', 'start': '0', 'length': '25', 'order[0][column]': '0',
+                    'order[0][dir]': 'desc'}
+
+# (nombre, vista, parámetros GET)
+VISTAS = [
+    ('Salida fichas', SalidaTablaFichaView.as_view(), DATATABLE_PARAMS),
+    ('Recepción fichas', RecepcionTablaFichaView.as_view(), DATATABLE_PARAMS),
+    ('Traspaso fichas', TraspasoTablaFichaView.as_view(), DATATABLE_PARAMS),
+    ('Fichas en tránsito', FichasEnTransito.as_view(), DATATABLE_PARAMS),
+    ('Monólogo salida', SalidaFichaView.as_view(), DATATABLE_PARAMS),
+    ('Monólogo traspaso', TraspasoFichaView.as_view(), DATATABLE_PARAMS),
+    ('Monólogo recepción', RecepcionFichaView.as_view(), DATATABLE_PARAMS),
+    ('Monólogo en tránsito', FichasEnTransitoView.as_view(), DATATABLE_PARAMS),
+    ('PDF movimientos salida', pdf_movimientos_fichas, {'tipo': 'salida'}),
+    ('PDF movimientos entrada', pdf_movimientos_fichas, {'tipo': 'entrada'}),
+    ('PDF movimientos traspaso', pdf_movimientos_fichas, {'tipo': 'traspaso'}),
+    ('PDF monólogo salida', pdf_movimientos_fichas_monologo_controlado, {'tipo': 'salida'}),
+    ('PDF monólogo tránsito', pdf_movimientos_fichas_monologo_controlado, {'tipo': 'transito'}),
+    ('PDF monólogo entrada', pdf_movimientos_fichas_monologo_controlado, {'tipo': 'entrada'}),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta las vistas principales de movimientos de fichas, captura sus consultas y muestra '
+            'el plan EXPLAIN de cada una, marcando los escaneos completos sobre las tablas de movimientos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--establecimiento', type=int, default=None,
+                            help='ID del establecimiento del usuario simulado (por defecto: el primero)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Movimientos de prueba a insertar por tabla; se revierten al terminar')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Terminar con código 1 si alguna consulta hace un escaneo completo')
+
+    # ================== DATOS DE PRUEBA ==================
+
+    def sembrar(self, establecimiento, cantidad):
+        servicios = list(ServicioClinico.objects.filter(establecimiento=establecimiento)[:5]) or [None]
+        numeros = reservar_numeros_ficha(establecimiento.id, max(1, cantidad // 10))
+
+        Ficha.objects.bulk_create([
+            Ficha(establecimiento=establecimiento, numero_ficha_sistema=numero) for numero in numeros
+        ])
+        # MySQL no devuelve los PKs de bulk_create: se releen las fichas recién insertadas
+        fichas = list(Ficha.objects.filter(establecimiento=establecimiento, numero_ficha_sistema__in=numeros))
+
+        ahora = timezone.now()
+        clasicos = []
+        monologos = []
+        for i in tqdm(range(cantidad), desc='Sembrando movimientos', unit='mov'):
+            ficha = random.choice(fichas)
+            servicio = random.choice(servicios)
+            fecha = ahora - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+            recibido = random.random() < 0.8
+            clasicos.append(MovimientoFicha(
+                ficha=ficha,
+                establecimiento=establecimiento,
+                servicio_clinico_envio=servicio,
+                servicio_clinico_recepcion=servicio,
+                fecha_envio=fecha,
+                fecha_recepcion=fecha + timedelta(hours=2) if recibido else None,
+                estado_envio='ENVIADO',
+                estado_recepcion='RECIBIDO' if recibido else 'EN ESPERA',
+                estado_traspaso='SIN TRASPASO',
+            ))
+            monologos.append(MovimientoMonologoControlado(
+                rut='SIN RUT',
+                numero_ficha=ficha.numero_ficha_sistema,
+                ficha=ficha,
+                establecimiento=establecimiento,
+                servicio_clinico_destino=servicio,
+                fecha_salida=fecha,
+                fecha_entrada=fecha + timedelta(hours=2) if recibido else None,
+                estado='R' if recibido else 'E',
+            ))
+
+        MovimientoFicha.objects.bulk_create(clasicos, batch_size=2000)
+        MovimientoMonologoControlado.objects.bulk_create(monologos, batch_size=2000)
+
+    # ================== EXPLAIN ==================
+
+    def explicar(self, sql):
+        """Devuelve (líneas del plan, tablas con escaneo completo)."""
+        vendor = connection.vendor
+        tablas = {MovimientoFicha._meta.db_table, MovimientoMonologoControlado._meta.db_table}
+
+        with connection.cursor() as cursor:
+            if vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                lineas = [row[-1] for row in cursor.fetchall()]
+                escaneos = {t for t in tablas for l in lineas if re.match(rf'SCAN {t}\b(?!.*USING)', l)}
+            elif vendor == 'mysql':
+                cursor.execute(f'EXPLAIN {sql}')
+                columnas = [c[0] for c in cursor.description]
+                filas = [dict(zip(columnas, row)) for row in cursor.fetchall()]
+                lineas = [f"{f['table']}: type={f['type']} key={f['key']} rows={f['rows']} {f.get('Extra') or ''}"
+                          for f in filas]
+                escaneos = {f['table'] for f in filas if f['table'] in tablas and f['type'] == 'ALL'}
+            else:
+                cursor.execute(f'EXPLAIN {sql}')
+                lineas = [row[0] for row in cursor.fetchall()]
+                escaneos = {t for t in tablas for l in lineas if f'Seq Scan on {t}' in l}
+
+        return lineas, escaneos
+
+    def ejecutar_vista(self, nombre, vista, params, user):
+        request = RequestFactory().get('/', params, headers={'X-Requested-With': 'XMLHttpRequest'})
+        request.user = user
+
+        with CaptureQueriesContext(connection) as ctx:
+            vista(request)
+
+        tablas = (MovimientoFicha._meta.db_table, MovimientoMonologoControlado._meta.db_table)
+        consultas = [q['sql'] for q in ctx.captured_queries
+                     if q['sql'].lstrip().upper().startswith('SELECT') and any(t in q['sql'] for t in tablas)]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{nombre} ({len(consultas)} consultas sobre movimientos)'))
+        escaneos_vista = 0
+        for sql in consultas:
+            lineas, escaneos = self.explicar(sql)
+            if escaneos:
+                escaneos_vista += 1
+                self.stdout.write(self.style.ERROR(f'  ✘ ESCANEO COMPLETO: {", ".join(sorted(escaneos))}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('  ✔ usa índices'))
+            if escaneos or self.verbosity > 1:
+                self.stdout.write(f'    {sql[:300]}')
+                for linea in lineas:
+                    self.stdout.write(f'      {linea}')
+        return escaneos_vista
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+
+        establecimiento = Establecimiento.objects.filter(pk=options['establecimiento']).first() \
+            if options['establecimiento'] else Establecimiento.objects.order_by('id').first()
+        if not establecimiento:
+            self.stdout.write(self.style.ERROR('No hay establecimientos para simular la consulta'))
+            sys.exit(1)
+
+        User = get_user_model()
+        user = User.objects.filter(establecimiento=establecimiento).first() or User(establecimiento=establecimiento)
+
+        total_escaneos = 0
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.sembrar(establecimiento, options['seed'])
+                    # En MySQL ANALYZE TABLE confirma la transacción de forma implícita (y los datos
+                    # sembrados quedarían guardados): solo se actualizan estadísticas en PostgreSQL
+                    if connection.vendor == 'postgresql':
+                        with connection.cursor() as cursor:
+                            for model in (MovimientoFicha, MovimientoMonologoControlado):
+                                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+                for nombre, vista, params in VISTAS:
+                    total_escaneos += self.ejecutar_vista(nombre, vista, params, user)
+
+                # Los datos sembrados nunca se confirman
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
+        if total_escaneos:
+            self.stdout.write(self.style.ERROR(f'Consultas con escaneo completo: {total_escaneos}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todas las consultas sobre movimientos usan índices'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+
+        if total_escaneos and options['fail_on_scan']:
+            sys.exit(1)
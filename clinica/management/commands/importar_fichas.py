@@ -1,4 +1,5 @@
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
@@ -6,6 +7,8 @@ from django.utils.dateparse import parse_datetime
 from tqdm import tqdm
 
 from clinica.models import Ficha
+from clinica.services import registrar_numeros_ficha
+from core.utils.importacion import ImportacionPorBloques, agregar_argumentos
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.sectores import Sector
 from personas.models.pacientes import Paciente
@@ -24,6 +27,7 @@ class Command(BaseCommand):
         parser.add_argument('excel_path', type=str, help='Ruta del archivo Excel (.xlsx, .xls)')
         parser.add_argument('--sheet', type=str, default=0, help='Nombre o índice de la hoja (por defecto: 0)')
         parser.add_argument('--skiprows', type=int, default=0, help='Filas a saltar al inicio')
+        agregar_argumentos(parser)
 
     # ================== LIMPIEZAS (Inspiradas en importar_pacientes.py) ==================
 
@@ -38,6 +42,13 @@ class Command(BaseCommand):
             return ''
         return str(value).strip()
 
+    def numeros_del_bloque(self, df, establecimientos):
+        """Pares (establecimiento_id, numero_ficha) válidos del bloque, para avanzar las secuencias."""
+        if 'numero_ficha_sistema' not in df.columns or 'establecimiento' not in df.columns:
+            return []
+        pares = zip(df['establecimiento'].map(self.limpiar_entero), df['numero_ficha_sistema'].map(self.limpiar_entero))
+        return [(est_id, numero) for est_id, numero in pares if est_id in establecimientos and numero]
+
     def limpiar_entero(self, valor):
         if pd.isna(valor) or valor in ('', None, 'None', 'nan', 'NAN', '0', 0):
             return None
@@ -98,20 +109,15 @@ class Command(BaseCommand):
         self.stdout.write(f'\n📖 Leyendo Excel: {ruta}')
 
         try:
-            df = pd.read_excel(
-                ruta,
-                sheet_name=sheet,
-                skiprows=skiprows,
-                dtype=str,
-                na_values=['', ' ', 'NaN', 'N/A', 'NULL', 'None'],
-                keep_default_na=True
+            importacion = ImportacionPorBloques(
+                'importar_fichas', ruta, tamano_bloque=options['bloque'], reiniciar=options['reiniciar'],
+                sheet=sheet, skiprows=skiprows,
             )
+            columnas = [str(c).strip().lower() for c in importacion.columnas()]
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'❌ Error leyendo Excel: {e}'))
             return
 
-        df.columns = df.columns.str.strip().str.lower()
-
         columnas_requeridas = {
             'establecimiento',
             'paciente',  # este es el RUT en el nuevo formato
@@ -119,14 +125,21 @@ class Command(BaseCommand):
             'fecha_mov'
         }
 
-        faltantes = columnas_requeridas - set(df.columns)
+        faltantes = columnas_requeridas - set(columnas)
         if faltantes:
             self.stderr.write(self.style.ERROR(
                 f'❌ Columnas faltantes en Excel: {faltantes}'
             ))
-            self.stdout.write(f"Columnas detectadas: {list(df.columns)}")
+            self.stdout.write(f"Columnas detectadas: {columnas}")
             return
 
+        if importacion.completada:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ El archivo ya se importó por completo; use --reiniciar para procesarlo de nuevo'))
+            return
+        if importacion.inicio:
+            self.stdout.write(self.style.WARNING(f'⏩ Reanudando desde la fila {importacion.inicio:,} del Excel'))
+
         # =========================
         # CACHÉS
         # =========================
@@ -191,159 +204,176 @@ class Command(BaseCommand):
 
         self.stdout.write('⏳ Iniciando proceso de importación...')
 
-        with tqdm(total=len(df), desc='⏳ Importando fichas', unit='fila') as pbar:
-            for idx, row in df.iterrows():
-                fila_excel = idx + 2 + skiprows  # Aproximación
-
-                rut_paciente_raw = row.get('paciente')
-                rut_paciente = self.normalize_rut(rut_paciente_raw)
-                numero_ficha_raw = row.get('numero_ficha_sistema')
-                numero_ficha = self.limpiar_entero(numero_ficha_raw)
-                est_raw = row.get('establecimiento')
-                est_id = self.limpiar_entero(est_raw)
-
-                # -------- VALIDACIÓN BÁSICA --------
-                if numero_ficha is None or est_id is None or not rut_paciente:
-                    omitidas += 1
-                    error_formato += 1
-                    log_lines.append(
-                        f'FILA {fila_excel} | ERROR FORMATO | RUT={rut_paciente_raw} | FICHA={numero_ficha_raw} | EST={est_raw}'
-                    )
-                    pbar.update(1)
-                    continue
-
-                paciente = pacientes.get(rut_paciente)
-                establecimiento = establecimientos.get(est_id)
-
-                if not establecimiento:
-                    omitidas += 1
-                    sin_establecimiento += 1
-                    log_lines.append(
-                        f'FILA {fila_excel} | ESTABLECIMIENTO NO EXISTE | ID={est_id}'
-                    )
-                    pbar.update(1)
-                    continue
-
-                if not paciente:
-                    # El usuario indica que si no existe el paciente, se crea igual pero sin paciente asignado
-                    # y guardando el rut en rut_anterior
-                    sin_paciente += 1
-                    # No incrementamos creadas_sin_paciente aquí, lo haremos cuando se guarde exitosamente
-                    log_lines.append(
-                        f'FILA {fila_excel} | PACIENTE NO EXISTE (Se intentará asignar a RUT Anterior) | RUT={rut_paciente_raw} | FICHA={numero_ficha}'
-                    )
-                    # No hacemos continue, permitimos que siga para crear la ficha sin paciente
-
-                clave = (numero_ficha, est_id)
-
-                # -------- DUPLICADOS --------
-                if clave in fichas_existentes or clave in fichas_csv:
-                    # omitidas += 1  <-- Ya no omitimos
-                    duplicados += 1
-                    duplicados_insertados += 1
-                    msg_duplicado = f'FILA {fila_excel} | DUPLICADA (Se ingresará) | RUT={rut_paciente} | FICHA={numero_ficha} | EST={est_id}'
-                    log_lines.append(msg_duplicado)
-                    # El usuario pidió un mensaje en consola para duplicados
-                    self.stdout.write(self.style.WARNING(
-                        f'Registro duplicado detectado (se ingresará): RUT {rut_paciente}, Ficha {numero_ficha}, Est. {est_id}'))
-                    # pbar.update(1)
-                    # continue  <-- Eliminamos el continue para permitir que se cree
-
-                fichas_csv.add(clave)
-
-                # -------- PROCESAR USUARIOS --------
-                usuario_raw = row.get('usuario')
-                rut_usuario = self.normalize_rut(usuario_raw)
-
-                u_sistema = usuarios_sistema.get(rut_usuario)
-                u_anterior = usuarios_anteriores.get(rut_usuario)
-
-                # -------- FECHAS --------
-                f_mov = self.parse_fecha(row.get('fecha_mov'))
-                f_creacion_ant = self.parse_fecha(row.get('fecha_creacion_anterior'))
-
-                # -------- SECTOR --------
-                sector = sectores_no_informado.get(est_id)
-
-                # -------- PREPARAR OBJETO --------
-                ficha = Ficha(
-                    numero_ficha_sistema=numero_ficha,
-                    numero_ficha_tarjeta=numero_ficha,  # Copiar numero_ficha_sistema a numero_ficha_tarjeta
-                    paciente=paciente,
-                    rut_anterior=rut_paciente_raw if not paciente else 'SIN RUT',
-                    establecimiento=establecimiento,
-                    sector=sector,
-                    usuario=u_sistema,
-                    usuario_anterior=u_anterior,
-                    observacion=self.safe_str(row.get('observacion')),
-                    fecha_mov=f_mov,
-                    fecha_creacion_anterior=f_creacion_ant,
-                )
-
-                # Si no tiene numero_ficha_sistema, Django intentará generarlo en el save()
-                # Pero bulk_create no llama al save(). Para evitar fallos de integridad por null
-                # y asegurar que se guardan, usaremos save() directo para los registros sin paciente
-                # o si falla el bulk.
-
-                if not paciente:
-                    try:
-                        with transaction.atomic():
-                            ficha.save()
-                        creadas_sin_paciente += 1
-                        creadas += 1
-                    except Exception as e:
-                        creadas -= 0  # No sumamos si falla
-                        errores_guardado += 1
-                        log_lines.append(
-                            f'ERROR AL GUARDAR (SIN PACIENTE) | RUT={rut_paciente_raw} | FICHA={numero_ficha} | ERROR={str(e)[:100]}')
-                    pbar.update(1)
-                    continue
-
-                buffer.append(ficha)
-                creadas += 1
-
-                # Guardar en lotes
-                if len(buffer) >= BATCH_SIZE:
-                    try:
-                        with transaction.atomic():
-                            Ficha.objects.bulk_create(buffer)
-                        buffer.clear()
-                    except Exception as e:
-                        self.stdout.write(self.style.WARNING(f'\nError en bulk_create: {str(e)[:100]}'))
-                        for f in buffer:
+        total = importacion.total_estimado()
+        if total is not None:
+            total = max(total - importacion.inicio, 0)
+
+        with tqdm(total=total, desc='⏳ Importando fichas', unit='fila') as pbar:
+            for df in importacion.bloques():
+                df.columns = df.columns.str.strip().str.lower()
+
+                # Secuencias avanzadas antes de abrir la transacción del bloque (cada UPDATE se confirma
+                # solo): la fila de SecuenciaFicha no queda bloqueada mientras se procesa el bloque y los
+                # Ficha.save() de la aplicación no esperan a la importación. Si el bloque se revierte,
+                # la secuencia queda adelantada (solo deja huecos).
+                registrar_numeros_ficha(self.numeros_del_bloque(df, establecimientos))
+
+                # Fichas del bloque y punto de control se confirman juntos
+                with importacion.transaccion():
+                    for idx, row in df.iterrows():
+                        fila_excel = idx + 2 + skiprows  # Aproximación
+
+                        rut_paciente_raw = row.get('paciente')
+                        rut_paciente = self.normalize_rut(rut_paciente_raw)
+                        numero_ficha_raw = row.get('numero_ficha_sistema')
+                        numero_ficha = self.limpiar_entero(numero_ficha_raw)
+                        est_raw = row.get('establecimiento')
+                        est_id = self.limpiar_entero(est_raw)
+
+                        # -------- VALIDACIÓN BÁSICA --------
+                        if numero_ficha is None or est_id is None or not rut_paciente:
+                            omitidas += 1
+                            error_formato += 1
+                            log_lines.append(
+                                f'FILA {fila_excel} | ERROR FORMATO | RUT={rut_paciente_raw} | FICHA={numero_ficha_raw} | EST={est_raw}'
+                            )
+                            pbar.update(1)
+                            continue
+
+                        paciente = pacientes.get(rut_paciente)
+                        establecimiento = establecimientos.get(est_id)
+
+                        if not establecimiento:
+                            omitidas += 1
+                            sin_establecimiento += 1
+                            log_lines.append(
+                                f'FILA {fila_excel} | ESTABLECIMIENTO NO EXISTE | ID={est_id}'
+                            )
+                            pbar.update(1)
+                            continue
+
+                        if not paciente:
+                            # El usuario indica que si no existe el paciente, se crea igual pero sin paciente asignado
+                            # y guardando el rut en rut_anterior
+                            sin_paciente += 1
+                            # No incrementamos creadas_sin_paciente aquí, lo haremos cuando se guarde exitosamente
+                            log_lines.append(
+                                f'FILA {fila_excel} | PACIENTE NO EXISTE (Se intentará asignar a RUT Anterior) | RUT={rut_paciente_raw} | FICHA={numero_ficha}'
+                            )
+                            # No hacemos continue, permitimos que siga para crear la ficha sin paciente
+
+                        clave = (numero_ficha, est_id)
+
+                        # -------- DUPLICADOS --------
+                        if clave in fichas_existentes or clave in fichas_csv:
+                            # omitidas += 1  <-- Ya no omitimos
+                            duplicados += 1
+                            duplicados_insertados += 1
+                            msg_duplicado = f'FILA {fila_excel} | DUPLICADA (Se ingresará) | RUT={rut_paciente} | FICHA={numero_ficha} | EST={est_id}'
+                            log_lines.append(msg_duplicado)
+                            # El usuario pidió un mensaje en consola para duplicados
+                            self.stdout.write(self.style.WARNING(
+                                f'Registro duplicado detectado (se ingresará): RUT {rut_paciente}, Ficha {numero_ficha}, Est. {est_id}'))
+                            # pbar.update(1)
+                            # continue  <-- Eliminamos el continue para permitir que se cree
+
+                        fichas_csv.add(clave)
+
+                        # -------- PROCESAR USUARIOS --------
+                        usuario_raw = row.get('usuario')
+                        rut_usuario = self.normalize_rut(usuario_raw)
+
+                        u_sistema = usuarios_sistema.get(rut_usuario)
+                        u_anterior = usuarios_anteriores.get(rut_usuario)
+
+                        # -------- FECHAS --------
+                        f_mov = self.parse_fecha(row.get('fecha_mov'))
+                        f_creacion_ant = self.parse_fecha(row.get('fecha_creacion_anterior'))
+
+                        # -------- SECTOR --------
+                        sector = sectores_no_informado.get(est_id)
+
+                        # -------- PREPARAR OBJETO --------
+                        ficha = Ficha(
+                            numero_ficha_sistema=numero_ficha,
+                            numero_ficha_tarjeta=numero_ficha,  # Copiar numero_ficha_sistema a numero_ficha_tarjeta
+                            paciente=paciente,
+                            rut_anterior=rut_paciente_raw if not paciente else 'SIN RUT',
+                            establecimiento=establecimiento,
+                            sector=sector,
+                            usuario=u_sistema,
+                            usuario_anterior=u_anterior,
+                            observacion=self.safe_str(row.get('observacion')),
+                            fecha_mov=f_mov,
+                            fecha_creacion_anterior=f_creacion_ant,
+                        )
+
+                        # Si no tiene numero_ficha_sistema, Django intentará generarlo en el save()
+                        # Pero bulk_create no llama al save(). Para evitar fallos de integridad por null
+                        # y asegurar que se guardan, usaremos save() directo para los registros sin paciente
+                        # o si falla el bulk.
+
+                        if not paciente:
                             try:
                                 with transaction.atomic():
-                                    f.save()
-                            except Exception as e2:
-                                creadas -= 1
-                                if not f.paciente:
-                                    creadas_sin_paciente -= 1
+                                    ficha.save()
+                                creadas_sin_paciente += 1
+                                creadas += 1
+                            except Exception as e:
+                                creadas -= 0  # No sumamos si falla
                                 errores_guardado += 1
                                 log_lines.append(
-                                    f'ERROR AL GUARDAR | RUT={f.rut_anterior if not f.paciente else f.paciente.rut} | FICHA={f.numero_ficha_sistema} | ERROR={str(e2)[:100]}')
-                        buffer.clear()
+                                    f'ERROR AL GUARDAR (SIN PACIENTE) | RUT={rut_paciente_raw} | FICHA={numero_ficha} | ERROR={str(e)[:100]}')
+                            pbar.update(1)
+                            continue
 
-                pbar.update(1)
+                        buffer.append(ficha)
+                        creadas += 1
 
-            # Guardar restantes
-            if buffer:
-                try:
-                    with transaction.atomic():
-                        Ficha.objects.bulk_create(buffer)
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f'\nError en último bulk_create: {str(e)[:100]}'))
-                    for f in buffer:
+                        # Guardar en lotes
+                        if len(buffer) >= BATCH_SIZE:
+                            try:
+                                with transaction.atomic():
+                                    Ficha.objects.bulk_create(buffer)
+                                buffer.clear()
+                            except Exception as e:
+                                self.stdout.write(self.style.WARNING(f'\nError en bulk_create: {str(e)[:100]}'))
+                                for f in buffer:
+                                    try:
+                                        with transaction.atomic():
+                                            f.save()
+                                    except Exception as e2:
+                                        creadas -= 1
+                                        if not f.paciente:
+                                            creadas_sin_paciente -= 1
+                                        errores_guardado += 1
+                                        log_lines.append(
+                                            f'ERROR AL GUARDAR | RUT={f.rut_anterior if not f.paciente else f.paciente.rut} | FICHA={f.numero_ficha_sistema} | ERROR={str(e2)[:100]}')
+                                buffer.clear()
+
+                        pbar.update(1)
+
+                    # Guardar restantes del bloque
+                    if buffer:
                         try:
                             with transaction.atomic():
-                                f.save()
-                        except Exception as e2:
-                            creadas -= 1
-                            if not f.paciente:
-                                creadas_sin_paciente -= 1
-                            errores_guardado += 1
-                            log_lines.append(
-                                f'ERROR AL GUARDAR | RUT={f.rut_anterior if not f.paciente else f.paciente.rut} | FICHA={f.numero_ficha_sistema} | ERROR={str(e2)[:100]}')
-                buffer.clear()
+                                Ficha.objects.bulk_create(buffer)
+                        except Exception as e:
+                            self.stdout.write(self.style.WARNING(f'\nError en bulk_create al cerrar el bloque: {str(e)[:100]}'))
+                            for f in buffer:
+                                try:
+                                    with transaction.atomic():
+                                        f.save()
+                                except Exception as e2:
+                                    creadas -= 1
+                                    if not f.paciente:
+                                        creadas_sin_paciente -= 1
+                                    errores_guardado += 1
+                                    log_lines.append(
+                                        f'ERROR AL GUARDAR | RUT={f.rut_anterior if not f.paciente else f.paciente.rut} | FICHA={f.numero_ficha_sistema} | ERROR={str(e2)[:100]}')
+                        buffer.clear()
+
+        importacion.finalizar()
 
         # =========================
         # LOG TXT
@@ -352,6 +382,9 @@ class Command(BaseCommand):
         with open('log_importacion_fichas_excel.txt', 'w', encoding='utf-8') as f:
             f.write('\n'.join(log_lines))
 
+        # bulk_create no emite señales: recalcular los contadores del dashboard
+        call_command('reconciliar_contadores')
+
         # =========================
         # RESUMEN
         # =========================
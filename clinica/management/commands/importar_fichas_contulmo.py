@@ -4,6 +4,7 @@ from django.db import transaction
 from tqdm import tqdm
 
 from clinica.models import Ficha
+from clinica.services import registrar_numeros_ficha
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.sectores import Sector
 from geografia.models.comuna import Comuna
@@ -303,6 +304,13 @@ class Command(BaseCommand):
         fichas_modificadas = 0
         error_formato = 0
 
+        # Avanzar la secuencia de fichas hasta el mayor número del archivo antes de la transacción
+        # de importación: así cada Ficha.objects.create no vuelve a escribir (ni bloquear) la fila de
+        # la secuencia mientras dura la importación.
+        numeros_archivo = pd.to_numeric(df['numero_ficha'], errors='coerce')
+        if numeros_archivo.notna().any():
+            registrar_numeros_ficha([(establecimiento.id, int(numeros_archivo.max()))])
+
         # =========================
         # IMPORTACIÓN
         # =========================
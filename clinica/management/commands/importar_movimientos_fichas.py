@@ -1,10 +1,12 @@
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils.timezone import make_aware
 from tqdm import tqdm
 
 from clinica.models import Ficha, MovimientoFicha
+from core.utils.importacion import ImportacionPorBloques, agregar_argumentos
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.servicio_clinico import ServicioClinico
 from personas.models.profesionales import Profesional
@@ -23,6 +25,13 @@ def normalize_rut(value):
     return s
 
 
+def normalize_rut_series(serie):
+    """normalize_rut sobre una columna completa."""
+    s = serie.fillna('').astype(str).str.strip().str.upper()
+    s = s.where(~s.isin(['', 'NAN', 'NULL', 'SIN RUT', '0', '0.0']), '')
+    return s.str.replace(r'[.\- ]', '', regex=True)
+
+
 def clean_text(value):
     if value is None:
         return ''
@@ -50,35 +59,16 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('csv_path', type=str)
         parser.add_argument('--batch-size', type=int, default=1000)
+        agregar_argumentos(parser)
 
-    def handle(self, *args, **options):
-        csv_path = options['csv_path']
-        batch_size = options['batch_size']
-
-        self.stdout.write(self.style.SUCCESS(f'📖 Leyendo CSV: {csv_path}'))
-
-        df = pd.read_csv(
-            csv_path,
-            sep=',',
-            dtype=str,
-            engine='python',
-            quotechar='"',
-            on_bad_lines='skip',
-            keep_default_na=False
-        )
-
+    def preparar_bloque(self, df, fechas_invalidas):
+        """Limpieza vectorizada de un bloque del CSV (columna a columna, sin recorrer filas)."""
         df.columns = df.columns.str.strip()
-        total_filas = len(df)
-
-        self.stdout.write(self.style.SUCCESS(f'📊 Total de filas en CSV: {total_filas:,}'))
-        self.stdout.write(self.style.SUCCESS(f'📋 Columnas encontradas: {", ".join(df.columns.tolist())}'))
-
-        # ================= PREPROCESAMIENTO =================
 
         # Normalizar RUTs
         for rut_col in ['rut_paciente', 'usuario_entrega', 'usuario_entrada', 'profesional']:
             if rut_col in df.columns:
-                df[rut_col] = df[rut_col].apply(normalize_rut)
+                df[rut_col] = normalize_rut_series(df[rut_col])
 
         # Convertir números (importante: servicio_clinico es código, no ID)
         numeric_columns = ['establecimiento', 'ficha']
@@ -91,25 +81,32 @@ class Command(BaseCommand):
             df['servicio_clinico'] = pd.to_numeric(df['servicio_clinico'], errors='coerce')
 
         # Convertir fechas
-        if 'fecha_salida' in df.columns:
-            df['fecha_salida'] = pd.to_datetime(
-                df['fecha_salida'],
-                errors='coerce',
-                format='mixed'
-            )
-            invalid_dates = df['fecha_salida'].isna().sum()
-            if invalid_dates > 0:
-                self.stdout.write(self.style.WARNING(f'⚠️ Fechas de salida inválidas: {invalid_dates}'))
-
-        if 'fecha_entrada' in df.columns:
-            df['fecha_entrada'] = pd.to_datetime(
-                df['fecha_entrada'],
-                errors='coerce',
-                format='mixed'
-            )
-            invalid_dates = df['fecha_entrada'].isna().sum()
-            if invalid_dates > 0:
-                self.stdout.write(self.style.WARNING(f'⚠️ Fechas de entrada inválidas: {invalid_dates}'))
+        for col in ['fecha_salida', 'fecha_entrada']:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+                fechas_invalidas[col] += int(df[col].isna().sum())
+
+        return df
+
+    def handle(self, *args, **options):
+        csv_path = options['csv_path']
+        batch_size = options['batch_size']
+
+        self.stdout.write(self.style.SUCCESS(f'📖 Leyendo CSV: {csv_path}'))
+
+        importacion = ImportacionPorBloques(
+            'importar_movimientos_fichas', csv_path, tamano_bloque=options['bloque'], reiniciar=options['reiniciar'],
+            keep_default_na=False,
+        )
+        columnas = [c.strip() for c in importacion.columnas()]
+
+        self.stdout.write(self.style.SUCCESS(f'📋 Columnas encontradas: {", ".join(columnas)}'))
+        if importacion.completada:
+            self.stdout.write(self.style.WARNING(
+                '⚠️ El archivo ya se importó por completo; use --reiniciar para procesarlo de nuevo'))
+            return
+        if importacion.inicio:
+            self.stdout.write(self.style.WARNING(f'⏩ Reanudando desde la fila {importacion.inicio:,} del CSV'))
 
         # ================= CACHÉS =================
 
@@ -216,233 +213,247 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS('🚀 Importando movimientos...'))
 
-        with tqdm(total=total_filas, unit='reg', desc='Procesando') as pbar:
-            for idx, row in df.iterrows():
-                try:
-                    # Obtener datos básicos
-                    ficha_num = row.get('ficha')
-                    est_id = row.get('establecimiento')
-
-                    # Verificar que tenemos los datos necesarios
-                    if pd.isna(ficha_num) or pd.isna(est_id):
-                        total_omitidos += 1
-                        errores.append({
-                            'fila_csv': idx + 2,
-                            'motivo': 'DATOS_INCOMPLETOS',
-                            'ficha': ficha_num,
-                            'establecimiento': est_id
-                        })
-                        pbar.update(1)
-                        continue
-
-                    # Convertir a enteros
-                    try:
-                        ficha_num_int = int(ficha_num)
-                        est_id_int = int(est_id)
-                    except (ValueError, TypeError):
-                        total_omitidos += 1
-                        errores.append({
-                            'fila_csv': idx + 2,
-                            'motivo': 'DATOS_NUMERICOS_INVALIDOS',
-                            'ficha': ficha_num,
-                            'establecimiento': est_id
-                        })
-                        pbar.update(1)
-                        continue
-
-                    # Buscar ficha
-                    ficha = fichas_dict.get((ficha_num_int, est_id_int))
-                    if not ficha:
-                        total_omitidos += 1
-                        errores.append({
-                            'fila_csv': idx + 2,
-                            'motivo': 'FICHA_NO_EXISTE',
-                            'ficha': ficha_num_int,
-                            'establecimiento': est_id_int
-                        })
-                        pbar.update(1)
-                        continue
-
-                    # Fecha de envío (con manejo seguro)
-                    fecha_envio = safe_make_aware(row.get('fecha_salida'))
-
-                    # Verificar duplicado
-                    clave = (ficha.id, fecha_envio)
-                    if clave in movimientos_existentes:
-                        total_omitidos += 1
-                        total_duplicados += 1
-                        pbar.update(1)
-                        continue
-
-                    movimientos_existentes.add(clave)
+        fechas_invalidas = {'fecha_salida': 0, 'fecha_entrada': 0}
 
-                    # ================= LÓGICA DE ESTADOS =================
+        with tqdm(total=None, unit='reg', desc='Procesando') as pbar:
+            for df in importacion.bloques():
+                df = self.preparar_bloque(df, fechas_invalidas)
 
-                    estado_csv = clean_text(row.get('estado', '')).upper()
+                # Filas del bloque, su inserción y el punto de control se confirman juntos
+                with importacion.transaccion():
+                    for idx, row in df.iterrows():
+                        try:
+                            # Obtener datos básicos
+                            ficha_num = row.get('ficha')
+                            est_id = row.get('establecimiento')
+
+                            # Verificar que tenemos los datos necesarios
+                            if pd.isna(ficha_num) or pd.isna(est_id):
+                                total_omitidos += 1
+                                errores.append({
+                                    'fila_csv': idx + 2,
+                                    'motivo': 'DATOS_INCOMPLETOS',
+                                    'ficha': ficha_num,
+                                    'establecimiento': est_id
+                                })
+                                pbar.update(1)
+                                continue
+
+                            # Convertir a enteros
+                            try:
+                                ficha_num_int = int(ficha_num)
+                                est_id_int = int(est_id)
+                            except (ValueError, TypeError):
+                                total_omitidos += 1
+                                errores.append({
+                                    'fila_csv': idx + 2,
+                                    'motivo': 'DATOS_NUMERICOS_INVALIDOS',
+                                    'ficha': ficha_num,
+                                    'establecimiento': est_id
+                                })
+                                pbar.update(1)
+                                continue
+
+                            # Buscar ficha
+                            ficha = fichas_dict.get((ficha_num_int, est_id_int))
+                            if not ficha:
+                                total_omitidos += 1
+                                errores.append({
+                                    'fila_csv': idx + 2,
+                                    'motivo': 'FICHA_NO_EXISTE',
+                                    'ficha': ficha_num_int,
+                                    'establecimiento': est_id_int
+                                })
+                                pbar.update(1)
+                                continue
+
+                            # Fecha de envío (con manejo seguro)
+                            fecha_envio = safe_make_aware(row.get('fecha_salida'))
+
+                            # Verificar duplicado
+                            clave = (ficha.id, fecha_envio)
+                            if clave in movimientos_existentes:
+                                total_omitidos += 1
+                                total_duplicados += 1
+                                pbar.update(1)
+                                continue
+
+                            movimientos_existentes.add(clave)
+
+                            # ================= LÓGICA DE ESTADOS =================
+
+                            estado_csv = clean_text(row.get('estado', '')).upper()
+
+                            # Determinar si es Enviado (E) o Recibido (R)
+                            es_enviado = estado_csv == 'E'
+                            es_recibido = estado_csv == 'R'
+
+                            # Estadísticas
+                            if es_enviado:
+                                contador_e += 1
+                            elif es_recibido:
+                                contador_r += 1
+                            else:
+                                contador_sin_estado += 1
+                                # Si no tiene estado, asumimos que está enviado pero no recibido
+                                es_enviado = True
+                                es_recibido = False
 
-                    # Determinar si es Enviado (E) o Recibido (R)
-                    es_enviado = estado_csv == 'E'
-                    es_recibido = estado_csv == 'R'
+                            # ================= OBTENER DATOS DE REFERENCIA =================
 
-                    # Estadísticas
-                    if es_enviado:
-                        contador_e += 1
-                    elif es_recibido:
-                        contador_r += 1
-                    else:
-                        contador_sin_estado += 1
-                        # Si no tiene estado, asumimos que está enviado pero no recibido
-                        es_enviado = True
-                        es_recibido = False
+                            # Establecimiento
+                            establecimiento = establecimientos_dict.get(est_id_int)
 
-                    # ================= OBTENER DATOS DE REFERENCIA =================
+                            # Servicio clínico del CSV (envío/recepción)
+                            servicio_codigo = row.get('servicio_clinico')
+                            servicio_csv = None
+                            if not pd.isna(servicio_codigo):
+                                try:
+                                    # Convertir a entero (manejar "2.0" como 2)
+                                    if isinstance(servicio_codigo, float):
+                                        codigo_int = int(servicio_codigo)
+                                    else:
+                                        codigo_int = int(float(servicio_codigo))
+
+                                    servicio_csv = servicios_por_codigo.get(codigo_int)
+                                    if not servicio_csv:
+                                        total_servicios_no_encontrados += 1
+                                        self.stdout.write(self.style.WARNING(
+                                            f'⚠️ Servicio con código {codigo_int} no encontrado (fila {idx + 2})'
+                                        ))
+                                except (ValueError, TypeError, AttributeError) as e:
+                                    servicio_csv = None
+                                    self.stdout.write(self.style.WARNING(
+                                        f'⚠️ Error al procesar código de servicio: {servicio_codigo} (fila {idx + 2}): {str(e)}'
+                                    ))
+
+                            # Servicio clínico ARCHIVO según establecimiento
+                            servicio_archivo = servicios_archivo_por_establecimiento.get(est_id_int)
+                            if not servicio_archivo:
+                                self.stdout.write(self.style.WARNING(
+                                    f'⚠️ No se encontró servicio ARCHIVO para establecimiento {est_id_int} (fila {idx + 2})'
+                                ))
+                                # Intentar encontrar cualquier servicio ARCHIVO como fallback
+                                servicios_archivo_fallback = ServicioClinico.objects.filter(nombre='ARCHIVO').first()
+                                if servicios_archivo_fallback:
+                                    servicio_archivo = servicios_archivo_fallback
+                                    servicios_archivo_por_establecimiento[est_id_int] = servicio_archivo
+
+                            # Usuarios anteriores
+                            usuario_entrega_ant = usuarios_ant_dict.get(row.get('usuario_entrega', ''))
+                            usuario_entrada_ant = usuarios_ant_dict.get(row.get('usuario_entrada', ''))
+
+                            # Profesional
+                            profesional = profesionales_dict.get(row.get('profesional', ''))
+
+                            # ================= CONFIGURAR CAMPOS SEGÚN ESTADO =================
+
+                            # LÓGICA MODIFICADA:
+                            # - Servicio ARCHIVO siempre se asigna al establecimiento
+                            # - Servicio del CSV se usa para envío/recepción si está disponible
+
+                            # Fecha de recepción (solo si está recibido)
+                            fecha_recepcion = None
+                            if es_recibido:
+                                fecha_recepcion = safe_make_aware(row.get('fecha_entrada'))
+                                # Si no hay fecha de entrada, usar fecha de salida
+                                if not fecha_recepcion:
+                                    fecha_recepcion = fecha_envio
+
+                            # Campos para ENVÍO (siempre se llenan si está enviado o recibido)
+                            estado_envio_final = 'ENVIADO' if (es_enviado or es_recibido) else ''
+
+                            # Servicio para envío: primero intentar servicio del CSV, luego ARCHIVO
+                            servicio_envio_final = servicio_csv if servicio_csv else servicio_archivo
+
+                            profesional_envio_final = profesional if (es_enviado or es_recibido) else None
+                            usuario_envio_ant_final = usuario_entrega_ant if (es_enviado or es_recibido) else None
+
+                            # Campos para RECEPCIÓN (solo si está recibido)
+                            estado_recepcion_final = 'RECIBIDO' if es_recibido else 'EN ESPERA'
+
+                            # Servicio para recepción: mismo que para envío
+                            servicio_recepcion_final = servicio_csv if servicio_csv else servicio_archivo
+
+                            profesional_recepcion_final = profesional if es_recibido else None
+                            usuario_recepcion_ant_final = usuario_entrada_ant if es_recibido else None
+
+                            # Si está recibido pero no hay usuario_entrada, usar usuario_entrega
+                            if es_recibido and not usuario_recepcion_ant_final:
+                                usuario_recepcion_ant_final = usuario_entrega_ant
+
+                            # ================= CREAR MOVIMIENTO =================
+
+                            movimiento = MovimientoFicha(
+                                ficha=ficha,
+                                establecimiento=establecimiento,
+
+                                # Datos de ENVÍO
+                                fecha_envio=fecha_envio,
+                                estado_envio=estado_envio_final,
+                                servicio_clinico_envio=servicio_envio_final,
+                                profesional_envio=profesional_envio_final,
+                                usuario_envio_anterior=usuario_envio_ant_final,
+                                observacion_envio=clean_text(row.get('observacion_salida', '')),
+
+                                # Datos de RECEPCIÓN
+                                fecha_recepcion=fecha_recepcion,
+                                estado_recepcion=estado_recepcion_final,
+                                servicio_clinico_recepcion=servicio_recepcion_final,
+                                profesional_recepcion=profesional_recepcion_final,
+                                usuario_recepcion_anterior=usuario_recepcion_ant_final,
+                                observacion_recepcion=clean_text(row.get('observacion_entrada', '')),
+
+                                # Datos de TRASPASO (siempre sin traspaso en esta importación)
+                                estado_traspaso='SIN TRASPASO',
+                                observacion_traspaso=clean_text(row.get('observacion_traspaso', '')),
+
+                                # RUTs antiguos (para auditoría)
+                                rut_anterior=row.get('rut_paciente', '') or 'SIN RUT',
+                                rut_anterior_profesional=row.get('profesional', '') or 'SIN RUT'
+                            )
+
+                            movimientos_a_crear.append(movimiento)
+
+                            # Insertar en lote
+                            if len(movimientos_a_crear) >= batch_size:
+                                try:
+                                    with transaction.atomic():
+                                        MovimientoFicha.objects.bulk_create(movimientos_a_crear, ignore_conflicts=True)
+                                    total_importados += len(movimientos_a_crear)
+                                    movimientos_a_crear.clear()
+                                except Exception as e:
+                                    self.stdout.write(self.style.ERROR(f'❌ Error en batch: {str(e)}'))
+                                    total_errores += len(movimientos_a_crear)
+                                    movimientos_a_crear.clear()
 
-                    # Establecimiento
-                    establecimiento = establecimientos_dict.get(est_id_int)
+                        except Exception as e:
+                            total_errores += 1
+                            errores.append({
+                                'fila_csv': idx + 2,
+                                'motivo': f'ERROR_GENERAL: {str(e)}',
+                                'ficha': row.get('ficha', ''),
+                                'establecimiento': row.get('establecimiento', '')
+                            })
 
-                    # Servicio clínico del CSV (envío/recepción)
-                    servicio_codigo = row.get('servicio_clinico')
-                    servicio_csv = None
-                    if not pd.isna(servicio_codigo):
-                        try:
-                            # Convertir a entero (manejar "2.0" como 2)
-                            if isinstance(servicio_codigo, float):
-                                codigo_int = int(servicio_codigo)
-                            else:
-                                codigo_int = int(float(servicio_codigo))
+                        pbar.update(1)
 
-                            servicio_csv = servicios_por_codigo.get(codigo_int)
-                            if not servicio_csv:
-                                total_servicios_no_encontrados += 1
-                                self.stdout.write(self.style.WARNING(
-                                    f'⚠️ Servicio con código {codigo_int} no encontrado (fila {idx + 2})'
-                                ))
-                        except (ValueError, TypeError, AttributeError) as e:
-                            servicio_csv = None
-                            self.stdout.write(self.style.WARNING(
-                                f'⚠️ Error al procesar código de servicio: {servicio_codigo} (fila {idx + 2}): {str(e)}'
-                            ))
-
-                    # Servicio clínico ARCHIVO según establecimiento
-                    servicio_archivo = servicios_archivo_por_establecimiento.get(est_id_int)
-                    if not servicio_archivo:
-                        self.stdout.write(self.style.WARNING(
-                            f'⚠️ No se encontró servicio ARCHIVO para establecimiento {est_id_int} (fila {idx + 2})'
-                        ))
-                        # Intentar encontrar cualquier servicio ARCHIVO como fallback
-                        servicios_archivo_fallback = ServicioClinico.objects.filter(nombre='ARCHIVO').first()
-                        if servicios_archivo_fallback:
-                            servicio_archivo = servicios_archivo_fallback
-                            servicios_archivo_por_establecimiento[est_id_int] = servicio_archivo
-
-                    # Usuarios anteriores
-                    usuario_entrega_ant = usuarios_ant_dict.get(normalize_rut(row.get('usuario_entrega', '')))
-                    usuario_entrada_ant = usuarios_ant_dict.get(normalize_rut(row.get('usuario_entrada', '')))
-
-                    # Profesional
-                    profesional = profesionales_dict.get(normalize_rut(row.get('profesional', '')))
-
-                    # ================= CONFIGURAR CAMPOS SEGÚN ESTADO =================
-
-                    # LÓGICA MODIFICADA:
-                    # - Servicio ARCHIVO siempre se asigna al establecimiento
-                    # - Servicio del CSV se usa para envío/recepción si está disponible
-
-                    # Fecha de recepción (solo si está recibido)
-                    fecha_recepcion = None
-                    if es_recibido:
-                        fecha_recepcion = safe_make_aware(row.get('fecha_entrada'))
-                        # Si no hay fecha de entrada, usar fecha de salida
-                        if not fecha_recepcion:
-                            fecha_recepcion = fecha_envio
-
-                    # Campos para ENVÍO (siempre se llenan si está enviado o recibido)
-                    estado_envio_final = 'ENVIADO' if (es_enviado or es_recibido) else ''
-
-                    # Servicio para envío: primero intentar servicio del CSV, luego ARCHIVO
-                    servicio_envio_final = servicio_csv if servicio_csv else servicio_archivo
-
-                    profesional_envio_final = profesional if (es_enviado or es_recibido) else None
-                    usuario_envio_ant_final = usuario_entrega_ant if (es_enviado or es_recibido) else None
-
-                    # Campos para RECEPCIÓN (solo si está recibido)
-                    estado_recepcion_final = 'RECIBIDO' if es_recibido else 'EN ESPERA'
-
-                    # Servicio para recepción: mismo que para envío
-                    servicio_recepcion_final = servicio_csv if servicio_csv else servicio_archivo
-
-                    profesional_recepcion_final = profesional if es_recibido else None
-                    usuario_recepcion_ant_final = usuario_entrada_ant if es_recibido else None
-
-                    # Si está recibido pero no hay usuario_entrada, usar usuario_entrega
-                    if es_recibido and not usuario_recepcion_ant_final:
-                        usuario_recepcion_ant_final = usuario_entrega_ant
-
-                    # ================= CREAR MOVIMIENTO =================
-
-                    movimiento = MovimientoFicha(
-                        ficha=ficha,
-                        establecimiento=establecimiento,
-
-                        # Datos de ENVÍO
-                        fecha_envio=fecha_envio,
-                        estado_envio=estado_envio_final,
-                        servicio_clinico_envio=servicio_envio_final,
-                        profesional_envio=profesional_envio_final,
-                        usuario_envio_anterior=usuario_envio_ant_final,
-                        observacion_envio=clean_text(row.get('observacion_salida', '')),
-
-                        # Datos de RECEPCIÓN
-                        fecha_recepcion=fecha_recepcion,
-                        estado_recepcion=estado_recepcion_final,
-                        servicio_clinico_recepcion=servicio_recepcion_final,
-                        profesional_recepcion=profesional_recepcion_final,
-                        usuario_recepcion_anterior=usuario_recepcion_ant_final,
-                        observacion_recepcion=clean_text(row.get('observacion_entrada', '')),
-
-                        # Datos de TRASPASO (siempre sin traspaso en esta importación)
-                        estado_traspaso='SIN TRASPASO',
-                        observacion_traspaso=clean_text(row.get('observacion_traspaso', '')),
-
-                        # RUTs antiguos (para auditoría)
-                        rut_anterior=normalize_rut(row.get('rut_paciente', '')) or 'SIN RUT',
-                        rut_anterior_profesional=normalize_rut(row.get('profesional', '')) or 'SIN RUT'
-                    )
-
-                    movimientos_a_crear.append(movimiento)
-
-                    # Insertar en lote
-                    if len(movimientos_a_crear) >= batch_size:
+                    # Insertar los registros restantes del bloque
+                    if movimientos_a_crear:
                         try:
                             with transaction.atomic():
                                 MovimientoFicha.objects.bulk_create(movimientos_a_crear, ignore_conflicts=True)
                             total_importados += len(movimientos_a_crear)
-                            movimientos_a_crear.clear()
                         except Exception as e:
-                            self.stdout.write(self.style.ERROR(f'❌ Error en batch: {str(e)}'))
+                            self.stdout.write(self.style.ERROR(f'❌ Error en el batch del bloque: {str(e)}'))
                             total_errores += len(movimientos_a_crear)
-                            movimientos_a_crear.clear()
-
-                except Exception as e:
-                    total_errores += 1
-                    errores.append({
-                        'fila_csv': idx + 2,
-                        'motivo': f'ERROR_GENERAL: {str(e)}',
-                        'ficha': row.get('ficha', ''),
-                        'establecimiento': row.get('establecimiento', '')
-                    })
-
-                pbar.update(1)
-
-        # Insertar los registros restantes
-        if movimientos_a_crear:
-            try:
-                with transaction.atomic():
-                    MovimientoFicha.objects.bulk_create(movimientos_a_crear, ignore_conflicts=True)
-                total_importados += len(movimientos_a_crear)
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'❌ Error en último batch: {str(e)}'))
-                total_errores += len(movimientos_a_crear)
+                        movimientos_a_crear.clear()
+
+        importacion.finalizar()
+
+        for col, invalidas in fechas_invalidas.items():
+            if invalidas > 0:
+                self.stdout.write(self.style.WARNING(f'⚠️ Fechas de {col.replace("fecha_", "")} inválidas: {invalidas}'))
 
         # Guardar errores si los hay
         if errores:
@@ -454,6 +465,7 @@ class Command(BaseCommand):
         # Mostrar resumen
         self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
         self.stdout.write(self.style.SUCCESS('📊 RESUMEN FINAL'))
+        self.stdout.write(self.style.SUCCESS(f'📄 Filas procesadas en esta ejecución: {importacion.filas_leidas:,}'))
         self.stdout.write(self.style.SUCCESS(f'✅ Importados: {total_importados:,}'))
         self.stdout.write(self.style.WARNING(f'⚠️ Omitidos: {total_omitidos:,}'))
         self.stdout.write(self.style.WARNING(f'🔁 Duplicados: {total_duplicados:,}'))
@@ -473,6 +485,10 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('=' * 60))
 
         # Mostrar distribución de estados finales
+        # bulk_create no pasa por save(): recalcular el estado actual de las fichas
+        self.stdout.write(self.style.SUCCESS('\nReconstruyendo estado actual de fichas...'))
+        call_command('reconstruir_estado_fichas')
+
         self.stdout.write(self.style.SUCCESS('\n📋 DISTRIBUCIÓN DE ESTADOS FINALES:'))
         if total_importados > 0:
             movimientos_importados = MovimientoFicha.objects.order_by('-id')[:total_importados]
@@ -1,6 +1,7 @@
 import os
 
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
@@ -8,6 +9,7 @@ from tqdm import tqdm
 
 from clinica.models.ficha import Ficha
 from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
+from core.utils.importacion import ImportacionPorBloques, agregar_argumentos
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.servicio_clinico import ServicioClinico
 from personas.models.pacientes import Paciente
@@ -20,6 +22,7 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('excel_file', type=str)
+        agregar_argumentos(parser)
 
     def clean_rut(self, rut):
         if pd.isna(rut):
@@ -91,12 +94,22 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f'Leyendo archivo: {excel_path}'))
 
-        df = pd.read_excel(excel_path)
-        df.columns = df.columns.str.strip()
-        df.dropna(how='all', inplace=True)  # Descartar filas vacías
+        # Valores tal como vienen en las celdas (sin dtype=str): fechas y números ya tipados
+        importacion = ImportacionPorBloques(
+            'importar_movimientos_fichas_monologo_controlado', excel_path, tamano_bloque=kwargs['bloque'],
+            reiniciar=kwargs['reiniciar'], texto=False,
+        )
 
-        total_rows = len(df)
-        self.stdout.write(f'Total registros: {total_rows}')
+        total_rows = importacion.total_estimado()
+        if total_rows is not None:
+            self.stdout.write(f'Total registros (estimado): {total_rows}')
+            total_rows = max(total_rows - importacion.inicio, 0)
+        if importacion.completada:
+            self.stdout.write(self.style.WARNING(
+                'El archivo ya se importó por completo; use --reiniciar para procesarlo de nuevo'))
+            return
+        if importacion.inicio:
+            self.stdout.write(self.style.WARNING(f'Reanudando desde la fila {importacion.inicio:,} del Excel'))
 
         # =============================
         # CARGA EN MEMORIA
@@ -146,145 +159,163 @@ class Command(BaseCommand):
         errores = 0
         objetos = []
 
-        log = open('log_importacion_debug.txt', 'w', encoding='utf-8')
-
-        for index, row in tqdm(df.iterrows(), total=total_rows, desc='⏳ Importando movimientos', unit='fila'):
-            try:
-                estab_id = int(row['establecimiento'])
-
-                if estab_id not in estabs_set:
-                    raise ValueError(f'Establecimiento {estab_id} no existe')
-
-                # === Extracción de datos con limpieza ===
-                raw_rut = row.get('rut_paciente')
-                rut_clean = self.clean_rut(raw_rut)
-                # Formatear RUT para el campo de texto (XX.XXX.XXX-X)
-                rut_texto = self.format_rut_chilean(rut_clean)
-
-                paciente_id = pacientes_map.get(rut_clean)
-
-                ficha_num = int(row['ficha']) if pd.notna(row.get('ficha')) else 0
-                ficha_id = fichas_map.get((ficha_num, estab_id))
-
-                usuario_entrega_raw = row.get('usuario_entrega')
-                usuario_entrega_clean = self.clean_rut(usuario_entrega_raw)
-                usuario_entrega_id = usuarios_map.get(usuario_entrega_clean)
-                usuario_entrega_texto = str(usuario_entrega_raw) if pd.notna(usuario_entrega_raw) else None
-
-                usuario_entrada_raw = row.get('usuario_entrada')
-                usuario_entrada_clean = self.clean_rut(usuario_entrada_raw)
-                usuario_entrada_id = usuarios_map.get(usuario_entrada_clean)
-                usuario_entrada_texto = str(usuario_entrada_raw) if pd.notna(usuario_entrada_raw) else None
-
-                profesional_raw = row.get('profesional')
-                profesional_clean = self.clean_rut(profesional_raw)
-                profesional_fk_id = profesionales_map.get(profesional_clean)
-                profesional_texto = str(profesional_raw) if pd.notna(profesional_raw) else None
-
-                servicio_cod = row.get('servicio_clinico')
-                servicio_id = None
-                if pd.notna(servicio_cod):
-                    try:
-                        servicio_id = servicios_map.get((int(float(str(servicio_cod))), estab_id))
-                    except Exception:
-                        servicio_id = None
-
-                estado = str(row.get('estado')).strip().upper()
-
-                if estado not in ['E', 'R']:
-                    raise ValueError(f"Estado inválido: {estado}")
-
-                # Fechas pre-parsed (evita parsearlas varias veces)
-                fecha_salida_dt = self.parse_date(row.get('fecha_salida'))
-                fecha_entrada_dt = self.parse_date(row.get('fecha_entrada'))
-                fecha_traspaso_dt = self.parse_date(row.get('fecha_traspaso'))
-
-                # La BD actualmente exige fecha_salida NOT NULL (ver log). Si viene vacía,
-                # aplicamos una política segura para no perder filas:
-                # 1) Usar fecha_entrada si existe.
-                # 2) Si tampoco existe, usar "ahora" (aware) y dejar registro en el log.
-                if fecha_salida_dt is None:
-                    if fecha_entrada_dt is not None:
-                        fecha_salida_dt = fecha_entrada_dt
-                        log.write(f'Fila {index + 2}: fecha_salida vacía → se usó fecha_entrada.\n')
-                    else:
-                        # último recurso: ahora
-                        fecha_salida_dt = timezone.now()
-                        log.write(f'Fila {index + 2}: fecha_salida y fecha_entrada vacías → se usó NOW().\n')
-
-                mov = MovimientoMonologoControlado(
-                    rut=rut_texto,
-                    numero_ficha=ficha_num,
-                    rut_paciente_id=paciente_id,
-                    ficha_id=ficha_id,
-                    establecimiento_id=estab_id,
-                    servicio_clinico_destino_id=servicio_id,
-                    profesional_id=profesional_fk_id,
-                    profesional_anterior=profesional_texto,
-                    fecha_salida=fecha_salida_dt,
-                    fecha_entrada=fecha_entrada_dt,
-                    fecha_traspaso=fecha_traspaso_dt,
-                    usuario_entrega=usuario_entrega_texto,
-                    # OJO: el campo en el modelo se llama `usuario_entrega_id` (ForeignKey),
-                    # por lo que el atributo crudo para asignar el ID es `usuario_entrega_id_id`.
-                    usuario_entrega_id_id=usuario_entrega_id,
-                    usuario_entrada=usuario_entrada_texto,
-                    # Igual para `usuario_entrada_id`.
-                    usuario_entrada_id_id=usuario_entrada_id,
-                    observacion_salida=self.clean_obs(row.get('observacion_salida')),
-                    observacion_entrada=self.clean_obs(row.get('observacion_entrada')),
-                    observacion_traspaso=self.clean_obs(row.get('observacion_traspaso')),
-                    estado=estado
-                )
-
-                objetos.append(mov)
-
-                # Insertar en bloques seguros
-                if len(objetos) == 500:
-                    try:
-                        with transaction.atomic():
-                            MovimientoMonologoControlado.objects.bulk_create(objetos)
-                        registros_creados += len(objetos)
-                        objetos = []
-                    except Exception as e:
-                        # Fallback registro a registro para no perder filas buenas
-                        log.write(f'ERROR BULK fila aprox {index}: {str(e)}\n')
-                        # Reintentar individualmente
-                        ok = 0
-                        for obj in objetos:
-                            try:
-                                with transaction.atomic():
-                                    obj.save()
-                                ok += 1
-                            except Exception as ei:
-                                errores += 1
-                                log.write(f'  - Error guardando individual: {ei}\n')
-                        registros_creados += ok
+        # Al reanudar se conserva el log de la ejecución interrumpida
+        log = open('log_importacion_debug.txt', 'a' if importacion.inicio else 'w', encoding='utf-8')
+
+        with tqdm(total=total_rows, desc='⏳ Importando movimientos', unit='fila') as pbar:
+            for df in importacion.bloques():
+                filas_bloque = len(df)
+                df.columns = df.columns.str.strip()
+                df = df.dropna(how='all')  # Descartar filas vacías
+
+                # Movimientos del bloque y punto de control se confirman juntos
+                with importacion.transaccion():
+                    for index, row in df.iterrows():
+                        try:
+                            estab_id = int(row['establecimiento'])
+
+                            if estab_id not in estabs_set:
+                                raise ValueError(f'Establecimiento {estab_id} no existe')
+
+                            # === Extracción de datos con limpieza ===
+                            raw_rut = row.get('rut_paciente')
+                            rut_clean = self.clean_rut(raw_rut)
+                            # Formatear RUT para el campo de texto (XX.XXX.XXX-X)
+                            rut_texto = self.format_rut_chilean(rut_clean)
+
+                            paciente_id = pacientes_map.get(rut_clean)
+
+                            ficha_num = int(row['ficha']) if pd.notna(row.get('ficha')) else 0
+                            ficha_id = fichas_map.get((ficha_num, estab_id))
+
+                            usuario_entrega_raw = row.get('usuario_entrega')
+                            usuario_entrega_clean = self.clean_rut(usuario_entrega_raw)
+                            usuario_entrega_id = usuarios_map.get(usuario_entrega_clean)
+                            usuario_entrega_texto = str(usuario_entrega_raw) if pd.notna(usuario_entrega_raw) else None
+
+                            usuario_entrada_raw = row.get('usuario_entrada')
+                            usuario_entrada_clean = self.clean_rut(usuario_entrada_raw)
+                            usuario_entrada_id = usuarios_map.get(usuario_entrada_clean)
+                            usuario_entrada_texto = str(usuario_entrada_raw) if pd.notna(usuario_entrada_raw) else None
+
+                            profesional_raw = row.get('profesional')
+                            profesional_clean = self.clean_rut(profesional_raw)
+                            profesional_fk_id = profesionales_map.get(profesional_clean)
+                            profesional_texto = str(profesional_raw) if pd.notna(profesional_raw) else None
+
+                            servicio_cod = row.get('servicio_clinico')
+                            servicio_id = None
+                            if pd.notna(servicio_cod):
+                                try:
+                                    servicio_id = servicios_map.get((int(float(str(servicio_cod))), estab_id))
+                                except Exception:
+                                    servicio_id = None
+
+                            estado = str(row.get('estado')).strip().upper()
+
+                            if estado not in ['E', 'R']:
+                                raise ValueError(f"Estado inválido: {estado}")
+
+                            # Fechas pre-parsed (evita parsearlas varias veces)
+                            fecha_salida_dt = self.parse_date(row.get('fecha_salida'))
+                            fecha_entrada_dt = self.parse_date(row.get('fecha_entrada'))
+                            fecha_traspaso_dt = self.parse_date(row.get('fecha_traspaso'))
+
+                            # La BD actualmente exige fecha_salida NOT NULL (ver log). Si viene vacía,
+                            # aplicamos una política segura para no perder filas:
+                            # 1) Usar fecha_entrada si existe.
+                            # 2) Si tampoco existe, usar "ahora" (aware) y dejar registro en el log.
+                            if fecha_salida_dt is None:
+                                if fecha_entrada_dt is not None:
+                                    fecha_salida_dt = fecha_entrada_dt
+                                    log.write(f'Fila {index + 2}: fecha_salida vacía → se usó fecha_entrada.\n')
+                                else:
+                                    # último recurso: ahora
+                                    fecha_salida_dt = timezone.now()
+                                    log.write(f'Fila {index + 2}: fecha_salida y fecha_entrada vacías → se usó NOW().\n')
+
+                            mov = MovimientoMonologoControlado(
+                                rut=rut_texto,
+                                numero_ficha=ficha_num,
+                                rut_paciente_id=paciente_id,
+                                ficha_id=ficha_id,
+                                establecimiento_id=estab_id,
+                                servicio_clinico_destino_id=servicio_id,
+                                profesional_id=profesional_fk_id,
+                                profesional_anterior=profesional_texto,
+                                fecha_salida=fecha_salida_dt,
+                                fecha_entrada=fecha_entrada_dt,
+                                fecha_traspaso=fecha_traspaso_dt,
+                                usuario_entrega=usuario_entrega_texto,
+                                # OJO: el campo en el modelo se llama `usuario_entrega_id` (ForeignKey),
+                                # por lo que el atributo crudo para asignar el ID es `usuario_entrega_id_id`.
+                                usuario_entrega_id_id=usuario_entrega_id,
+                                usuario_entrada=usuario_entrada_texto,
+                                # Igual para `usuario_entrada_id`.
+                                usuario_entrada_id_id=usuario_entrada_id,
+                                observacion_salida=self.clean_obs(row.get('observacion_salida')),
+                                observacion_entrada=self.clean_obs(row.get('observacion_entrada')),
+                                observacion_traspaso=self.clean_obs(row.get('observacion_traspaso')),
+                                estado=estado
+                            )
+
+                            objetos.append(mov)
+
+                            # Insertar en bloques seguros
+                            if len(objetos) == 500:
+                                try:
+                                    with transaction.atomic():
+                                        MovimientoMonologoControlado.objects.bulk_create(objetos)
+                                    registros_creados += len(objetos)
+                                    objetos = []
+                                except Exception as e:
+                                    # Fallback registro a registro para no perder filas buenas
+                                    log.write(f'ERROR BULK fila aprox {index}: {str(e)}\n')
+                                    # Reintentar individualmente
+                                    ok = 0
+                                    for obj in objetos:
+                                        try:
+                                            with transaction.atomic():
+                                                obj.save()
+                                            ok += 1
+                                        except Exception as ei:
+                                            errores += 1
+                                            log.write(f'  - Error guardando individual: {ei}\n')
+                                    registros_creados += ok
+                                    objetos = []
+
+                        except Exception as e:
+                            errores += 1
+                            log.write(f'Fila {index + 2}: {str(e)}\n')
+
+                    # Insertar resto del bloque
+                    if objetos:
+                        try:
+                            with transaction.atomic():
+                                MovimientoMonologoControlado.objects.bulk_create(objetos)
+                            registros_creados += len(objetos)
+                        except Exception as e:
+                            log.write(f'ERROR BULK FINAL: {str(e)}\n')
+                            # Fallback final: registro a registro
+                            ok = 0
+                            for obj in objetos:
+                                try:
+                                    with transaction.atomic():
+                                        obj.save()
+                                    ok += 1
+                                except Exception as ei:
+                                    errores += 1
+                                    log.write(f'  - Error guardando individual: {ei}\n')
+                            registros_creados += ok
                         objetos = []
 
-            except Exception as e:
-                errores += 1
-                log.write(f'Fila {index + 2}: {str(e)}\n')
-
-        # Insertar resto
-        if objetos:
-            try:
-                with transaction.atomic():
-                    MovimientoMonologoControlado.objects.bulk_create(objetos)
-                registros_creados += len(objetos)
-            except Exception as e:
-                log.write(f'ERROR BULK FINAL: {str(e)}\n')
-                # Fallback final: registro a registro
-                ok = 0
-                for obj in objetos:
-                    try:
-                        with transaction.atomic():
-                            obj.save()
-                        ok += 1
-                    except Exception as ei:
-                        errores += 1
-                        log.write(f'  - Error guardando individual: {ei}\n')
-                registros_creados += ok
+                pbar.update(filas_bloque)
+
+        importacion.finalizar()
+
+        # bulk_create no pasa por save(): recalcular el estado actual de las fichas
+        self.stdout.write(self.style.SUCCESS('\nReconstruyendo estado actual de fichas...'))
+        call_command('reconstruir_estado_fichas')
 
         log.close()
 
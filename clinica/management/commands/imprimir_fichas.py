@@ -0,0 +1,65 @@
+# python manage.py imprimir_fichas caratula --desde 2026-10-01 --hasta 2026-10-18 --establecimiento 1
+# python manage.py imprimir_fichas stickers --sector 4 --por-archivo 200 --procesos 4 --salida impresiones/
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from clinica.impresion import FORMATOS, fichas_a_imprimir, generar_pdf_por_partes
+
+
+class Command(BaseCommand):
+    help = ('Imprime carátulas o stickers de varias fichas (por IDs, rango de fecha de creación o sector) '
+            'en PDFs de varias páginas; los lotes grandes se dividen en archivos generados en paralelo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('formato', choices=sorted(FORMATOS), help='Formato a imprimir')
+        parser.add_argument('--ids', type=str, default='', help='IDs de ficha separados por coma')
+        parser.add_argument('--desde', type=str, default=None, help='Fichas creadas desde (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=str, default=None, help='Fichas creadas hasta (AAAA-MM-DD)')
+        parser.add_argument('--sector', type=int, default=None, help='Solo fichas de este sector')
+        parser.add_argument('--establecimiento', type=int, default=None,
+                            help='Solo fichas de este establecimiento')
+        parser.add_argument('--salida', type=str, default='.', help='Directorio de los PDF (por defecto: actual)')
+        parser.add_argument('--por-archivo', type=int, default=500,
+                            help='Fichas por PDF (por defecto: 500)')
+        parser.add_argument('--procesos', type=int, default=1,
+                            help='Procesos que generan los PDF en paralelo (por defecto: 1)')
+
+    def _fecha(self, valor, opcion):
+        if valor is None:
+            return None
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise CommandError(f'{opcion} debe tener el formato AAAA-MM-DD: {valor}')
+        return fecha
+
+    def handle(self, *args, **options):
+        formato = options['formato']
+        ids = [int(i) for i in options['ids'].split(',') if i.strip().isdigit()]
+        desde = self._fecha(options['desde'], '--desde')
+        hasta = self._fecha(options['hasta'], '--hasta')
+
+        if not (ids or desde or hasta or options['sector']):
+            raise CommandError('Indique --ids, --desde / --hasta o --sector')
+
+        fichas = fichas_a_imprimir(ids=ids, desde=desde, hasta=hasta, sector_id=options['sector'],
+                                   establecimiento_id=options['establecimiento'])
+        ids_lote = list(fichas.values_list('id', flat=True))
+
+        self.stdout.write(self.style.SUCCESS(f'Fichas a imprimir: {len(ids_lote):,}'))
+        if not ids_lote:
+            return
+
+        os.makedirs(options['salida'], exist_ok=True)
+        partes = generar_pdf_por_partes(
+            ids_lote, formato, options['salida'], prefijo=formato,
+            por_archivo=options['por_archivo'], procesos=options['procesos'],
+        )
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        for ruta, total in partes:
+            self.stdout.write(self.style.SUCCESS(f'📄 {ruta}: {total:,} fichas'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Fichas impresas: {sum(total for _, total in partes):,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
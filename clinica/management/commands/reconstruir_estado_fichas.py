@@ -0,0 +1,43 @@
+# python manage.py reconstruir_estado_fichas --batch-size 2000 --establecimiento 1
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from clinica.models.ficha import Ficha
+from clinica.services import actualizar_estado_fichas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla EstadoFicha (estado actual de cada ficha) desde los movimientos históricos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Fichas por lote (por defecto: 2000)')
+        parser.add_argument('--establecimiento', type=int, default=None,
+                            help='Reconstruir solo las fichas de este establecimiento')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        qs = Ficha.objects.order_by('id')
+        if options['establecimiento']:
+            qs = qs.filter(establecimiento_id=options['establecimiento'])
+        total = qs.count()
+
+        self.stdout.write(self.style.SUCCESS(f'Fichas a procesar: {total:,}'))
+
+        actualizadas = 0
+        ultimo_id = 0
+
+        with tqdm(total=total, desc='Reconstruyendo estado', unit='ficha') as pbar:
+            while True:
+                lote = list(qs.filter(id__gt=ultimo_id).values_list('id', flat=True)[:batch_size])
+                if not lote:
+                    break
+
+                actualizadas += actualizar_estado_fichas(lote)
+                ultimo_id = lote[-1]
+                pbar.update(len(lote))
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Estados de ficha actualizados: {actualizadas:,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0012_ficha_unique_ficha_numero_por_establecimiento'),
+        ('establecimientos', '0003_alter_servicioclinico_options'),
+        ('personas', '0008_pacientenombretoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoFicha',
+            fields=[
+                ('ficha', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estado_actual', serialize=False, to='clinica.ficha', verbose_name='Ficha')),
+                ('fecha_movimiento', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Último Movimiento')),
+                ('en_transito', models.BooleanField(default=False, verbose_name='En Tránsito')),
+                ('en_transito_monologo', models.BooleanField(default=False, verbose_name='En Tránsito (Monólogo)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('establecimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estados_fichas', to='establecimientos.establecimiento', verbose_name='Establecimiento')),
+                ('profesional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='personas.profesional', verbose_name='Profesional Actual')),
+                ('servicio_clinico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='establecimientos.servicioclinico', verbose_name='Servicio Clínico Actual')),
+                ('ultimo_movimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clinica.movimientoficha', verbose_name='Último Movimiento')),
+                ('ultimo_movimiento_monologo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clinica.movimientomonologocontrolado', verbose_name='Último Movimiento Monólogo')),
+            ],
+            options={
+                'verbose_name': 'Estado Ficha',
+                'verbose_name_plural': 'Estados Fichas',
+                'indexes': [models.Index(fields=['establecimiento', 'en_transito'], name='estado_ficha_transito_idx'), models.Index(fields=['establecimiento', 'en_transito_monologo'], name='estado_ficha_transito_mon_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0013_estadoficha'),
+        ('establecimientos', '0003_alter_servicioclinico_options'),
+        ('personas', '0008_pacientenombretoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['establecimiento', 'estado_envio', 'fecha_envio'], name='mov_ficha_est_envio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['establecimiento', 'estado_recepcion', 'fecha_recepcion'], name='mov_ficha_est_recep_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['establecimiento', 'estado_traspaso', 'fecha_traspaso'], name='mov_ficha_est_trasp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoficha',
+            index=models.Index(fields=['ficha', 'estado_recepcion'], name='mov_ficha_ficha_recep_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientomonologocontrolado',
+            index=models.Index(fields=['establecimiento', 'estado', 'status', 'fecha_salida'], name='mov_mon_est_salida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientomonologocontrolado',
+            index=models.Index(fields=['establecimiento', 'status', 'fecha_entrada'], name='mov_mon_est_entrada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientomonologocontrolado',
+            index=models.Index(fields=['ficha', 'estado', 'status'], name='mov_mon_ficha_estado_idx'),
+        ),
+    ]
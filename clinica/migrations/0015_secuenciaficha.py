@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0014_indices_movimientos'),
+        ('establecimientos', '0003_alter_servicioclinico_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaFicha',
+            fields=[
+                ('establecimiento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='secuencia_ficha', serialize=False, to='establecimientos.establecimiento', verbose_name='Establecimiento')),
+                ('ultimo_numero', models.IntegerField(default=0, verbose_name='Último Número Asignado')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Ficha',
+                'verbose_name_plural': 'Secuencias de Fichas',
+            },
+        ),
+    ]
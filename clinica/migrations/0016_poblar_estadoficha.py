@@ -0,0 +1,123 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:40
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Subquery
+
+LOTE = 2000
+
+CAMPOS_CLASICO = (
+    'id', 'fecha_envio', 'fecha_recepcion', 'fecha_traspaso', 'created_at', 'estado_traspaso',
+    'servicio_clinico_recepcion_id', 'profesional_recepcion_id', 'servicio_clinico_traspaso_id',
+    'profesional_traspaso_id',
+)
+CAMPOS_MONOLOGO = (
+    'id', 'estado', 'fecha_entrada', 'fecha_salida', 'created_at', 'servicio_clinico_destino_id', 'profesional_id',
+)
+
+
+# Copia del cálculo de clinica.services.actualizar_estado_fichas con los modelos históricos: la
+# migración no depende de cómo cambien después los modelos ni el servicio.
+
+def _fecha_clasico(m):
+    return m['fecha_traspaso'] or m['fecha_recepcion'] or m['fecha_envio'] or m['created_at']
+
+
+def _fecha_monologo(m):
+    return (m['fecha_entrada'] if m['estado'] == 'R' else None) or m['fecha_salida'] or m['created_at']
+
+
+def _estado(clasico, monologo):
+    """(servicio_clinico_id, profesional_id, fecha) según el movimiento más reciente de la ficha."""
+    candidatos = []
+    if clasico:
+        if clasico['estado_traspaso'] == 'TRASPASADO':
+            poseedor = clasico['servicio_clinico_traspaso_id'], clasico['profesional_traspaso_id']
+        else:
+            poseedor = clasico['servicio_clinico_recepcion_id'], clasico['profesional_recepcion_id']
+        candidatos.append((_fecha_clasico(clasico), poseedor))
+    if monologo:
+        if monologo['estado'] == 'E':
+            poseedor = monologo['servicio_clinico_destino_id'], monologo['profesional_id']
+        else:
+            poseedor = None, None
+        candidatos.append((_fecha_monologo(monologo), poseedor))
+    if not candidatos:
+        return None, None, None
+
+    # Ante fechas iguales gana el movimiento clásico, como en el servicio
+    fecha, (servicio_id, profesional_id) = max(candidatos, key=lambda c: c[0])
+    return servicio_id, profesional_id, fecha
+
+
+def poblar_estado_fichas(apps, schema_editor):
+    # Sin este llenado, las validaciones de tránsito que leen EstadoFicha dejarían pasar todas las
+    # fichas hasta ejecutar reconstruir_estado_fichas a mano
+    Ficha = apps.get_model('clinica', 'Ficha')
+    MovimientoFicha = apps.get_model('clinica', 'MovimientoFicha')
+    MovimientoMonologoControlado = apps.get_model('clinica', 'MovimientoMonologoControlado')
+    EstadoFicha = apps.get_model('clinica', 'EstadoFicha')
+
+    ultimo_clasico = MovimientoFicha.objects.filter(
+        ficha=OuterRef('pk')
+    ).order_by('-fecha_envio', '-id').values('id')[:1]
+    ultimo_monologo = MovimientoMonologoControlado.objects.filter(
+        ficha=OuterRef('pk'), status=True
+    ).order_by('-id').values('id')[:1]
+
+    ultimo_id = 0
+    while True:
+        filas = list(Ficha.objects.filter(id__gt=ultimo_id).order_by('id').annotate(
+            ultimo_id=Subquery(ultimo_clasico),
+            ultimo_monologo_id=Subquery(ultimo_monologo),
+            transito=Exists(MovimientoFicha.objects.filter(
+                ficha=OuterRef('pk'), estado_recepcion='EN ESPERA', establecimiento=OuterRef('establecimiento')
+            )),
+            transito_monologo=Exists(MovimientoMonologoControlado.objects.filter(
+                ficha=OuterRef('pk'), estado='E', status=True
+            )),
+        ).values('id', 'establecimiento_id', 'ultimo_id', 'ultimo_monologo_id', 'transito',
+                 'transito_monologo')[:LOTE])
+        if not filas:
+            break
+
+        clasicos = {m['id']: m for m in MovimientoFicha.objects.filter(
+            id__in=[f['ultimo_id'] for f in filas if f['ultimo_id']]
+        ).values(*CAMPOS_CLASICO)}
+        monologos = {m['id']: m for m in MovimientoMonologoControlado.objects.filter(
+            id__in=[f['ultimo_monologo_id'] for f in filas if f['ultimo_monologo_id']]
+        ).values(*CAMPOS_MONOLOGO)}
+
+        estados = []
+        for fila in filas:
+            servicio_id, profesional_id, fecha = _estado(
+                clasicos.get(fila['ultimo_id']), monologos.get(fila['ultimo_monologo_id'])
+            )
+            estados.append(EstadoFicha(
+                ficha_id=fila['id'],
+                establecimiento_id=fila['establecimiento_id'],
+                servicio_clinico_id=servicio_id,
+                profesional_id=profesional_id,
+                ultimo_movimiento_id=fila['ultimo_id'],
+                ultimo_movimiento_monologo_id=fila['ultimo_monologo_id'],
+                fecha_movimiento=fecha,
+                en_transito=fila['transito'],
+                en_transito_monologo=fila['transito_monologo'],
+            ))
+
+        ids = [fila['id'] for fila in filas]
+        EstadoFicha.objects.filter(ficha_id__in=ids).delete()
+        EstadoFicha.objects.bulk_create(estados)
+        ultimo_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinica', '0015_secuenciaficha'),
+    ]
+
+    operations = [
+        # Al revertir no se borra nada: la tabla la elimina (o la reconstruye reconstruir_estado_fichas)
+        # la migración que la creó
+        migrations.RunPython(poblar_estado_fichas, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
 from .ficha import *
 from .movimiento_ficha import *
 from .movimiento_ficha_monologo_controlado import *
+from .estado_ficha import *
+from .secuencia_ficha import *
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class EstadoFicha(models.Model):
+    """
+    Estado actual (desnormalizado) de cada ficha física: dónde está, quién la tiene,
+    su último movimiento y si está en tránsito. Lo mantiene clinica.services.actualizar_estado_fichas
+    al guardar movimientos; se reconstruye con el comando reconstruir_estado_fichas.
+    """
+    ficha = models.OneToOneField('clinica.Ficha', on_delete=models.CASCADE, primary_key=True,
+                                 verbose_name='Ficha', related_name='estado_actual')
+    establecimiento = models.ForeignKey('establecimientos.Establecimiento', on_delete=models.CASCADE, null=True,
+                                        blank=True, verbose_name='Establecimiento', related_name='estados_fichas')
+
+    servicio_clinico = models.ForeignKey('establecimientos.ServicioClinico', on_delete=models.SET_NULL, null=True,
+                                         blank=True, verbose_name='Servicio Clínico Actual', related_name='+')
+    profesional = models.ForeignKey('personas.Profesional', on_delete=models.SET_NULL, null=True, blank=True,
+                                    verbose_name='Profesional Actual', related_name='+')
+
+    ultimo_movimiento = models.ForeignKey('clinica.MovimientoFicha', on_delete=models.SET_NULL, null=True,
+                                          blank=True, verbose_name='Último Movimiento', related_name='+')
+    ultimo_movimiento_monologo = models.ForeignKey('clinica.MovimientoMonologoControlado', on_delete=models.SET_NULL,
+                                                   null=True, blank=True,
+                                                   verbose_name='Último Movimiento Monólogo', related_name='+')
+    fecha_movimiento = models.DateTimeField(null=True, blank=True, verbose_name='Fecha Último Movimiento')
+
+    # MovimientoFicha EN ESPERA de recepción / MovimientoMonologoControlado enviado (estado E)
+    en_transito = models.BooleanField(default=False, verbose_name='En Tránsito')
+    en_transito_monologo = models.BooleanField(default=False, verbose_name='En Tránsito (Monólogo)')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    def __str__(self):
+        return f'{self.ficha_id} - {"EN TRÁNSITO" if self.en_transito or self.en_transito_monologo else "EN ARCHIVO"}'
+
+    class Meta:
+        verbose_name = 'Estado Ficha'
+        verbose_name_plural = 'Estados Fichas'
+        indexes = [
+            models.Index(fields=['establecimiento', 'en_transito'], name='estado_ficha_transito_idx'),
+            models.Index(fields=['establecimiento', 'en_transito_monologo'], name='estado_ficha_transito_mon_idx'),
+        ]
@@ -53,28 +53,18 @@ class Ficha(StandardModel):
             return f"Ficha #{numero} - Sin paciente"
 
     def save(self, *args, **kwargs):
-        # Determinamos si necesitamos asignar un número de ficha automáticamente
-        # 1. Si no tiene número de ficha sistema
-        # 2. Y tiene un establecimiento asignado
-        if not self.numero_ficha_sistema and self.establecimiento:
-            # Obtener el máximo actual en ese establecimiento
-            max_ficha = Ficha.objects.filter(establecimiento=self.establecimiento) \
-                .aggregate(models.Max('numero_ficha_sistema'))['numero_ficha_sistema__max']
-
-            if max_ficha is not None:
-                self.numero_ficha_sistema = max_ficha + 1
-            else:
-                # Fallback: si no hay registros previos con número, intentamos usar el PK si existe
-                # o dejamos que el save posterior asigne un número basado en el PK si sigue vacío
-                if self.pk:
-                    self.numero_ficha_sistema = self.pk
-                else:
-                    # Si estamos creando, guardaremos primero para obtener el PK
-                    pass
+        from clinica.services import registrar_numeros_ficha, reservar_numeros_ficha
+
+        # Sin número de ficha y con establecimiento: se toma el siguiente de la secuencia del establecimiento
+        if not self.numero_ficha_sistema and self.establecimiento_id:
+            self.numero_ficha_sistema = reservar_numeros_ficha(self.establecimiento_id)[0]
+        elif self._state.adding:
+            # Número asignado a mano: la secuencia no debe volver a entregarlo
+            registrar_numeros_ficha([(self.establecimiento_id, self.numero_ficha_sistema)])
 
         super().save(*args, **kwargs)
 
-        # Si después de guardar sigue sin número (caso de creación inicial sin registros previos)
+        # Ficha sin establecimiento (no tiene secuencia): se numera con su PK
         if not self.numero_ficha_sistema and self.pk:
             self.numero_ficha_sistema = self.pk
             super().save(update_fields=['numero_ficha_sistema'])
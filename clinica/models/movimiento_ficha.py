@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from simple_history.models import HistoricalRecords
 
@@ -150,7 +150,12 @@ class MovimientoFicha(StandardModel):
 
         # Validación de datos antes de guardar
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Mantener el estado materializado de la ficha en la misma transacción
+            if self.ficha_id:
+                from clinica.services import actualizar_estado_fichas
+                actualizar_estado_fichas([self.ficha_id])
 
     def __str__(self):
         return f"Movimiento de Ficha #{self.ficha.numero_ficha_sistema if self.ficha else 'N/A'}"
@@ -158,3 +163,13 @@ class MovimientoFicha(StandardModel):
     class Meta:
         verbose_name = 'Movimiento Ficha'
         verbose_name_plural = 'Movimientos Fichas'
+        # Filtros frecuentes: listados y PDFs por (establecimiento, estado, fecha_*) y
+        # validación de tránsito por (ficha, estado_recepcion)
+        indexes = [
+            models.Index(fields=['establecimiento', 'estado_envio', 'fecha_envio'], name='mov_ficha_est_envio_idx'),
+            models.Index(fields=['establecimiento', 'estado_recepcion', 'fecha_recepcion'],
+                         name='mov_ficha_est_recep_idx'),
+            models.Index(fields=['establecimiento', 'estado_traspaso', 'fecha_traspaso'],
+                         name='mov_ficha_est_trasp_idx'),
+            models.Index(fields=['ficha', 'estado_recepcion'], name='mov_ficha_ficha_recep_idx'),
+        ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from core.models import StandardModel
 
@@ -40,6 +40,14 @@ class MovimientoMonologoControlado(StandardModel):
 
     estado = models.CharField(max_length=1, choices=ESTADO_CHOICES)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Mantener el estado materializado de la ficha en la misma transacción
+            if self.ficha_id:
+                from clinica.services import actualizar_estado_fichas
+                actualizar_estado_fichas([self.ficha_id])
+
     def __str__(self):
         return f'{self.establecimiento.nombre} - {self.rut_paciente} - {self.numero_ficha}'
 
@@ -47,3 +55,10 @@ class MovimientoMonologoControlado(StandardModel):
         verbose_name = 'Movimiento Monologo Controlado'
         verbose_name_plural = 'Movimientos Monologo Controlados'
         ordering = ['-id']
+        # Filtros frecuentes: listados y PDFs por (establecimiento, estado, status, fecha_*) y
+        # validación de tránsito por (ficha, estado, status)
+        indexes = [
+            models.Index(fields=['establecimiento', 'estado', 'status', 'fecha_salida'], name='mov_mon_est_salida_idx'),
+            models.Index(fields=['establecimiento', 'status', 'fecha_entrada'], name='mov_mon_est_entrada_idx'),
+            models.Index(fields=['ficha', 'estado', 'status'], name='mov_mon_ficha_estado_idx'),
+        ]
@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class SecuenciaFicha(models.Model):
+    """
+    Último numero_ficha_sistema entregado en cada establecimiento. Las reservas bloquean solo esta
+    fila (clinica.services.reservar_numeros_ficha), en lugar de calcular MAX()+1 sobre todas las
+    fichas del establecimiento en cada inserción.
+    """
+    establecimiento = models.OneToOneField('establecimientos.Establecimiento', on_delete=models.CASCADE,
+                                           primary_key=True, verbose_name='Establecimiento',
+                                           related_name='secuencia_ficha')
+    ultimo_numero = models.IntegerField(default=0, verbose_name='Último Número Asignado')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    def __str__(self):
+        return f'{self.establecimiento_id} - {self.ultimo_numero}'
+
+    class Meta:
+        verbose_name = 'Secuencia de Ficha'
+        verbose_name_plural = 'Secuencias de Fichas'
@@ -0,0 +1,365 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Max, OuterRef, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from clinica.models.estado_ficha import EstadoFicha
+from clinica.models.ficha import Ficha
+from clinica.models.movimiento_ficha import MovimientoFicha
+from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
+from clinica.models.secuencia_ficha import SecuenciaFicha
+from core.utils.bulk import bulk_upsert
+
+ESTADO_FICHA_CAMPOS = [
+    'establecimiento', 'servicio_clinico', 'profesional', 'ultimo_movimiento', 'ultimo_movimiento_monologo',
+    'fecha_movimiento', 'en_transito', 'en_transito_monologo', 'updated_at',
+]
+
+
+# =========================================================
+# ESTADO "EN TRÁNSITO" DE FICHAS
+# =========================================================
+# Cada función responde para un conjunto de fichas con UNA consulta, evitando el patrón N+1
+# (un .exists() / .first() por cada ficha encontrada). Las preguntas "¿está fuera?" se responden
+# desde la tabla EstadoFicha; los detalles del movimiento, desde los movimientos.
+
+
+def _ids(fichas):
+    """Acepta fichas, ids o un queryset de fichas y devuelve la lista de ids."""
+    return [getattr(f, 'pk', f) for f in fichas]
+
+
+def _ultimo_por_ficha(queryset, fichas, *order):
+    """
+    Último movimiento de cada ficha según ``order`` en una sola consulta:
+    se ordena por ficha y se conserva el primero de cada grupo.
+    """
+    ficha_ids = _ids(fichas)
+    if not ficha_ids:
+        return {}
+
+    resultado = {}
+    for movimiento in queryset.filter(ficha_id__in=ficha_ids).order_by('ficha_id', *order):
+        resultado.setdefault(movimiento.ficha_id, movimiento)
+    return resultado
+
+
+def fichas_en_transito(fichas, establecimiento):
+    """
+    Ids de las fichas del establecimiento con un MovimientoFicha EN ESPERA de recepción.
+    """
+    ficha_ids = _ids(fichas)
+    if not ficha_ids:
+        return set()
+
+    return set(
+        EstadoFicha.objects.filter(
+            ficha_id__in=ficha_ids,
+            establecimiento=establecimiento,
+            en_transito=True,
+        ).values_list('ficha_id', flat=True)
+    )
+
+
+def fichas_en_transito_monologo(fichas, establecimiento=None):
+    """
+    Ids de las fichas con un MovimientoMonologoControlado enviado (estado 'E') y activo.
+    """
+    ficha_ids = _ids(fichas)
+    if not ficha_ids:
+        return set()
+
+    qs = EstadoFicha.objects.filter(ficha_id__in=ficha_ids, en_transito_monologo=True)
+    if establecimiento is not None:
+        qs = qs.filter(establecimiento=establecimiento)
+    return set(qs.values_list('ficha_id', flat=True))
+
+
+def ficha_en_transito(ficha, establecimiento):
+    return bool(fichas_en_transito([ficha], establecimiento))
+
+
+def ficha_en_transito_monologo(ficha, establecimiento=None):
+    return bool(fichas_en_transito_monologo([ficha], establecimiento))
+
+
+def movimientos_en_espera_por_ficha(fichas, establecimiento):
+    """
+    {ficha_id: último MovimientoFicha ENVIADO y EN ESPERA de recepción} (módulo de Recepción).
+    """
+    qs = MovimientoFicha.objects.filter(
+        estado_envio='ENVIADO',
+        estado_recepcion='EN ESPERA',
+        establecimiento=establecimiento,
+    ).select_related('servicio_clinico_envio', 'servicio_clinico_recepcion')
+    return _ultimo_por_ficha(qs, fichas, '-fecha_envio', '-id')
+
+
+def movimientos_traspasables_por_ficha(fichas, establecimiento):
+    """
+    {ficha_id: último MovimientoFicha EN ESPERA o RECIBIDO aún no traspasado} (módulo de Traspaso).
+    """
+    qs = MovimientoFicha.objects.filter(
+        estado_recepcion__in=['EN ESPERA', 'RECIBIDO'],
+        establecimiento=establecimiento,
+    ).exclude(
+        estado_traspaso='TRASPASADO'
+    ).select_related('servicio_clinico_envio', 'servicio_clinico_recepcion')
+    return _ultimo_por_ficha(qs, fichas, '-created_at', '-id')
+
+
+def movimientos_monologo_en_transito_por_ficha(fichas, establecimiento, *order):
+    """
+    {ficha_id: MovimientoMonologoControlado enviado (estado 'E') y activo}.
+    Por defecto el más reciente por id (ordering del modelo).
+    """
+    qs = MovimientoMonologoControlado.objects.filter(
+        estado='E',
+        establecimiento=establecimiento,
+        status=True,
+    ).select_related('servicio_clinico_destino', 'profesional')
+    return _ultimo_por_ficha(qs, fichas, *(order or ('-id',)))
+
+
+# =========================================================
+# TABLA MATERIALIZADA EstadoFicha
+# =========================================================
+
+def _fecha_movimiento(movimiento):
+    if isinstance(movimiento, MovimientoFicha):
+        fecha = movimiento.fecha_traspaso or movimiento.fecha_recepcion or movimiento.fecha_envio
+    else:
+        fecha = (movimiento.fecha_entrada if movimiento.estado == 'R' else None) or movimiento.fecha_salida
+    return fecha or movimiento.created_at
+
+
+def _poseedor(movimiento):
+    """(servicio_clinico_id, profesional_id) que tiene la ficha según el movimiento; (None, None) si está en archivo."""
+    if movimiento is None:
+        return None, None
+    if isinstance(movimiento, MovimientoFicha):
+        if movimiento.estado_traspaso == 'TRASPASADO':
+            return movimiento.servicio_clinico_traspaso_id, movimiento.profesional_traspaso_id
+        return movimiento.servicio_clinico_recepcion_id, movimiento.profesional_recepcion_id
+    if movimiento.estado == 'E':
+        return movimiento.servicio_clinico_destino_id, movimiento.profesional_id
+    return None, None
+
+
+def actualizar_estado_fichas(fichas):
+    """
+    Recalcula EstadoFicha para las fichas dadas a partir de sus movimientos y lo guarda con un
+    único upsert. Cuatro consultas por lote, independiente de la cantidad de fichas o movimientos.
+    """
+    ficha_ids = _ids(fichas)
+    if not ficha_ids:
+        return 0
+
+    ultimo_clasico = MovimientoFicha.objects.filter(
+        ficha=OuterRef('pk')
+    ).order_by('-fecha_envio', '-id').values('id')[:1]
+    ultimo_monologo = MovimientoMonologoControlado.objects.filter(
+        ficha=OuterRef('pk'), status=True
+    ).order_by('-id').values('id')[:1]
+
+    filas = list(Ficha.objects.filter(pk__in=ficha_ids).annotate(
+        ultimo_id=Subquery(ultimo_clasico),
+        ultimo_monologo_id=Subquery(ultimo_monologo),
+        transito=Exists(MovimientoFicha.objects.filter(
+            ficha=OuterRef('pk'), estado_recepcion='EN ESPERA', establecimiento=OuterRef('establecimiento')
+        )),
+        transito_monologo=Exists(MovimientoMonologoControlado.objects.filter(
+            ficha=OuterRef('pk'), estado='E', status=True
+        )),
+    ).values('pk', 'establecimiento_id', 'ultimo_id', 'ultimo_monologo_id', 'transito', 'transito_monologo'))
+
+    clasicos = MovimientoFicha.objects.in_bulk([f['ultimo_id'] for f in filas if f['ultimo_id']])
+    monologos = MovimientoMonologoControlado.objects.in_bulk(
+        [f['ultimo_monologo_id'] for f in filas if f['ultimo_monologo_id']]
+    )
+
+    estados = []
+    for fila in filas:
+        movimientos = [m for m in (clasicos.get(fila['ultimo_id']), monologos.get(fila['ultimo_monologo_id'])) if m]
+        actual = max(movimientos, key=_fecha_movimiento) if movimientos else None
+        servicio_id, profesional_id = _poseedor(actual)
+
+        estados.append(EstadoFicha(
+            ficha_id=fila['pk'],
+            establecimiento_id=fila['establecimiento_id'],
+            servicio_clinico_id=servicio_id,
+            profesional_id=profesional_id,
+            ultimo_movimiento_id=fila['ultimo_id'],
+            ultimo_movimiento_monologo_id=fila['ultimo_monologo_id'],
+            fecha_movimiento=_fecha_movimiento(actual) if actual else None,
+            en_transito=fila['transito'],
+            en_transito_monologo=fila['transito_monologo'],
+        ))
+
+    bulk_upsert(EstadoFicha, estados, unique_fields=['ficha'], update_fields=ESTADO_FICHA_CAMPOS)
+    return len(estados)
+
+
+# =========================================================
+# NUMERACIÓN DE FICHAS (numero_ficha_sistema)
+# =========================================================
+# Cada establecimiento tiene una fila en SecuenciaFicha con el último número entregado. Reservar es un
+# UPDATE ultimo_numero = ultimo_numero + N sobre esa fila: el bloqueo dura lo que la transacción y no
+# toca la tabla de fichas. El MAX() solo se calcula la primera vez, al crear la fila.
+
+def _crear_secuencia(establecimiento_id):
+    """Crea la secuencia partiendo del mayor número existente; si otra petición ya la creó, no hace nada."""
+    maximo = Ficha.objects.filter(establecimiento_id=establecimiento_id).aggregate(
+        m=Max('numero_ficha_sistema')
+    )['m']
+    try:
+        with transaction.atomic():
+            SecuenciaFicha.objects.create(establecimiento_id=establecimiento_id, ultimo_numero=maximo or 0)
+    except IntegrityError:
+        pass
+
+
+def reservar_numeros_ficha(establecimiento_id, cantidad=1):
+    """
+    Reserva ``cantidad`` números consecutivos de ficha en el establecimiento y los devuelve como range.
+    Si la transacción que llama se revierte, la reserva también.
+    """
+    if cantidad < 1:
+        raise ValueError('La cantidad de números a reservar debe ser mayor que 0')
+
+    secuencia = SecuenciaFicha.objects.filter(establecimiento_id=establecimiento_id)
+    with transaction.atomic():
+        if not secuencia.update(ultimo_numero=F('ultimo_numero') + cantidad):
+            _crear_secuencia(establecimiento_id)
+            secuencia.update(ultimo_numero=F('ultimo_numero') + cantidad)
+        ultimo = secuencia.values_list('ultimo_numero', flat=True).get()
+
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+def registrar_numeros_ficha(numeros):
+    """
+    Recibe pares (establecimiento_id, numero) ya usados (asignados a mano o de una importación) y avanza
+    la secuencia de cada establecimiento hasta el mayor, para que las reservas siguientes no choquen.
+    Solo se escribe (y bloquea) la fila si la secuencia queda atrás. Si aún no existe no se hace nada:
+    se creará desde el MAX() en la primera reserva.
+    """
+    maximos = {}
+    for establecimiento_id, numero in numeros:
+        if establecimiento_id and numero:
+            maximos[establecimiento_id] = max(numero, maximos.get(establecimiento_id, numero))
+    if not maximos:
+        return
+
+    atrasadas = SecuenciaFicha.objects.filter(establecimiento_id__in=maximos).values_list(
+        'establecimiento_id', 'ultimo_numero'
+    )
+    for establecimiento_id, ultimo in list(atrasadas):
+        if ultimo < maximos[establecimiento_id]:
+            SecuenciaFicha.objects.filter(
+                establecimiento_id=establecimiento_id, ultimo_numero__lt=maximos[establecimiento_id]
+            ).update(ultimo_numero=maximos[establecimiento_id])
+
+
+# =========================================================
+# REPORTES DE MOVIMIENTOS (pdf_movimientos_fichas*)
+# =========================================================
+# Los reportes agrupan los movimientos por servicio clínico y profesional, en orden de su movimiento
+# más reciente, y cortan cada nivel (ej: 3 servicios, 2 profesionales, 10 fichas). Con límites, los
+# cortes se resuelven en la base de datos: un GROUP BY con MAX(fecha) elige los servicios, ROW_NUMBER()
+# por servicio elige los profesionales y ROW_NUMBER() por (servicio, profesional) las fichas. Solo se
+# leen e instancian las filas que se imprimen, no todo el historial del período.
+
+def _clave_numero_ficha(fila):
+    numero = fila['numero_ficha']
+    return int(numero) if str(numero).isdigit() else 0
+
+
+def _grupos_limitados(queryset, campo_fecha, campo_servicio, campo_profesional,
+                      limite_servicios, limite_profesionales, limite_fichas):
+    """Servicios → profesionales (ids, en orden) y los movimientos a imprimir, con los cortes en la base de datos."""
+    servicio_id, profesional_id = f'{campo_servicio}_id', f'{campo_profesional}_id'
+    con_servicio = queryset.filter(**{f'{servicio_id}__isnull': False})
+
+    servicios = con_servicio.values(servicio_id).annotate(ultima=Max(campo_fecha)).order_by('-ultima')
+    if limite_servicios:
+        servicios = servicios[:limite_servicios]
+    grupos = {fila[servicio_id]: {} for fila in servicios}
+    if not grupos:
+        return grupos, []
+
+    pares = con_servicio.filter(**{f'{servicio_id}__in': list(grupos), f'{profesional_id}__isnull': False}).values(
+        servicio_id, profesional_id
+    ).annotate(ultima=Max(campo_fecha))
+    if limite_profesionales:
+        pares = pares.annotate(rango=Window(
+            RowNumber(), partition_by=F(servicio_id), order_by=[F('ultima').desc(), F(profesional_id)]
+        )).filter(rango__lte=limite_profesionales)
+    for fila in pares.order_by(servicio_id, '-ultima', profesional_id):
+        grupos[fila[servicio_id]][fila[profesional_id]] = []
+
+    filtro = Q()
+    for s_id, profesionales in grupos.items():
+        if profesionales:
+            filtro |= Q(**{servicio_id: s_id, f'{profesional_id}__in': list(profesionales)})
+    if not filtro:
+        return grupos, []
+
+    movimientos = queryset.filter(filtro)
+    if limite_fichas:
+        movimientos = movimientos.annotate(fila_grupo=Window(
+            RowNumber(), partition_by=[F(servicio_id), F(profesional_id)],
+            order_by=[F(campo_fecha).desc(), F('pk').desc()]
+        )).filter(fila_grupo__lte=limite_fichas)
+    return grupos, movimientos.order_by(f'-{campo_fecha}', '-pk')
+
+
+def agrupar_movimientos(queryset, campo_fecha, campo_servicio, campo_profesional, fila,
+                        limite_servicios=None, limite_profesionales=None, limite_fichas=None,
+                        omitir_servicios_vacios=False):
+    """
+    Datos de la plantilla pdfs/movimientos_fichas.html: [{'nombre', 'profesionales': [{'nombre',
+    'movimientos'}]}]. ``fila(movimiento)`` arma el diccionario de cada movimiento; las fichas de cada
+    profesional quedan por número de ficha de mayor a menor. Sin límites se imprime todo ``queryset``
+    (ya acotado por los filtros del usuario) y se agrupa en una sola pasada.
+    """
+    servicios = {}
+    objetos = {}
+    if limite_servicios or limite_profesionales or limite_fichas:
+        ids, movimientos = _grupos_limitados(queryset, campo_fecha, campo_servicio, campo_profesional,
+                                             limite_servicios, limite_profesionales, limite_fichas)
+        servicios = {s_id: {p_id: [] for p_id in profesionales} for s_id, profesionales in ids.items()}
+    else:
+        movimientos = queryset.order_by(f'-{campo_fecha}')
+
+    for movimiento in movimientos:
+        servicio = getattr(movimiento, campo_servicio)
+        if servicio is None:
+            continue
+        objetos[(campo_servicio, servicio.pk)] = servicio
+        profesionales = servicios.setdefault(servicio.pk, {})
+
+        profesional = getattr(movimiento, campo_profesional)
+        if profesional is None:
+            continue
+        objetos[(campo_profesional, profesional.pk)] = profesional
+        profesionales.setdefault(profesional.pk, []).append(movimiento)
+
+    # Servicios elegidos sin profesionales (sin filas que leer): se traen solo para el nombre
+    faltantes = [s_id for s_id in servicios if (campo_servicio, s_id) not in objetos]
+    if faltantes:
+        modelo = queryset.model._meta.get_field(campo_servicio).related_model
+        for s_id, servicio in modelo.objects.in_bulk(faltantes).items():
+            objetos[(campo_servicio, s_id)] = servicio
+
+    datos = []
+    for s_id, profesionales in servicios.items():
+        profesionales_list = [
+            {
+                'nombre': str(objetos[(campo_profesional, p_id)]),
+                'movimientos': sorted(map(fila, movimientos_profesional), key=_clave_numero_ficha, reverse=True),
+            }
+            for p_id, movimientos_profesional in profesionales.items()
+        ]
+        if profesionales_list or not omitir_servicios_vacios:
+            datos.append({'nombre': objetos[(campo_servicio, s_id)].nombre, 'profesionales': profesionales_list})
+    return datos
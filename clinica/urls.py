@@ -17,7 +17,7 @@ from clinica.views.pdf import (
     pdf_caratula_reportlab,
     pdf_index, pdf_movimientos_fichas,
     pdf_movimientos_fichas_monologo_controlado, pdf_index_rn, pdf_stickers_ejemplos,
-    pdf_stickers_66_25, pdf_stickers_66_25_reportlab, pdf_caratula__rn_reportlab
+    pdf_stickers_66_25, pdf_stickers_66_25_reportlab, pdf_caratula__rn_reportlab, pdf_impresion_lote
 )
 
 urlpatterns = [
@@ -97,6 +97,8 @@ urlpatterns = [
 
     path("pdfs/ficha/paciente-rn/<int:paciente_id>/", pdf_index_rn, name="pdf_ficha_paciente_rn"),
 
+    path("pdfs/lote/", pdf_impresion_lote, name="pdf_impresion_lote"),
+
     path("pdfs/movimientos/", pdf_movimientos_fichas, name="pdf_movimientos_fichas"),
     path("pdfs/movimientos-monologo/", pdf_movimientos_fichas_monologo_controlado,
          name="pdf_movimientos_fichas_monologo_controlado"),
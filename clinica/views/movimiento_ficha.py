@@ -11,8 +11,8 @@ from clinica.forms.movimiento_ficha import (
     FormSalidaFicha, FiltroSalidaFichaForm, FormEntradaFicha, FormTraspasoFicha
 )
 from clinica.models import MovimientoFicha
+from clinica.services import ficha_en_transito
 from core.mixin import DataTableMixinMov
-from personas.models.profesionales import Profesional
 
 
 class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
@@ -22,6 +22,7 @@ class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
     """
     template_name = 'movimiento_ficha/salida_ficha_update.html'
     model = MovimientoFicha
+    datatable_keyset = True
 
     datatable_columns = [
         'ID', 'RUT', 'Ficha', 'Nombre completo', 'Servicio Clínico Envío',
@@ -66,8 +67,7 @@ class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
 
         if establecimiento:
             if 'profesional' in context['filter_form'].fields:
-                context['filter_form'].fields['profesional'].queryset = Profesional.objects.filter(
-                    establecimiento=establecimiento)
+                context['filter_form'].fields['profesional'].limitar(establecimiento_id=establecimiento.pk)
 
         return context
 
@@ -144,11 +144,7 @@ class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
                 ficha_id = data.get('ficha_id') or data.get('ficha') or data.get('ficha_id_hidden')
 
                 # Validación si ya existe movimiento en tránsito
-                movimiento_abierto = MovimientoFicha.objects.filter(
-                    ficha_id=ficha_id,
-                    estado_recepcion='EN ESPERA',
-                    establecimiento=request.user.establecimiento
-                ).exists()
+                movimiento_abierto = ficha_en_transito(ficha_id, request.user.establecimiento)
 
                 if movimiento_abierto:
                     return JsonResponse({
@@ -205,6 +201,7 @@ class SalidaTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
 class FichasEnTransito(LoginRequiredMixin, DataTableMixinMov, TemplateView):
     template_name = 'movimiento_ficha/tabla_salida_ficha_update.html'
     model = MovimientoFicha
+    datatable_keyset = True
 
     datatable_columns = [
         'ID', 'RUT', 'Ficha', 'Nombre completo', 'Servicio Clínico Envío',
@@ -248,7 +245,7 @@ class FichasEnTransito(LoginRequiredMixin, DataTableMixinMov, TemplateView):
         # Formulario de filtro
         filter_form = FiltroSalidaFichaForm(self.request.GET or None, user=self.request.user)
         if establecimiento and 'profesional' in filter_form.fields:
-            filter_form.fields['profesional'].queryset = Profesional.objects.filter(establecimiento=establecimiento)
+            filter_form.fields['profesional'].limitar(establecimiento_id=establecimiento.pk)
 
         context.update({
             'title': 'Fichas en Tránsito',
@@ -325,6 +322,7 @@ class FichasEnTransito(LoginRequiredMixin, DataTableMixinMov, TemplateView):
 class RecepcionTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
     template_name = 'movimiento_ficha/recepcion_ficha.html'
     model = MovimientoFicha
+    datatable_keyset = True
 
     datatable_columns = ['ID', 'RUT', 'Ficha', 'Nombre completo', 'Servicio Clínico Envío', 'Profesional Envío',
                          'Fecha envío', 'Fecha recepción',
@@ -363,7 +361,7 @@ class RecepcionTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateVie
         # Formulario de filtro (mismo que en salida)
         filter_form = FiltroSalidaFichaForm(self.request.GET or None, user=self.request.user)
         if establecimiento and 'profesional' in filter_form.fields:
-            filter_form.fields['profesional'].queryset = Profesional.objects.filter(establecimiento=establecimiento)
+            filter_form.fields['profesional'].limitar(establecimiento_id=establecimiento.pk)
 
         context.update({
             'title': 'Recepción de Fichas',
@@ -503,6 +501,7 @@ class RecepcionTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateVie
 class TraspasoTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView):
     template_name = 'movimiento_ficha/traspaso_ficha.html'
     model = MovimientoFicha
+    datatable_keyset = True
 
     datatable_columns = ['ID', 'actions', 'RUT', 'Ficha', 'Nombre completo', 'Servicio Clínico Envío',
                          'Servicio Clínico Recepción',
@@ -541,7 +540,7 @@ class TraspasoTablaFichaView(LoginRequiredMixin, DataTableMixinMov, TemplateView
 
         filter_form = FiltroSalidaFichaForm(self.request.GET or None, user=self.request.user)
         if establecimiento and 'profesional' in filter_form.fields:
-            filter_form.fields['profesional'].queryset = Profesional.objects.filter(establecimiento=establecimiento)
+            filter_form.fields['profesional'].limitar(establecimiento_id=establecimiento.pk)
 
         context.update({
             'title': 'Traspaso de Fichas',
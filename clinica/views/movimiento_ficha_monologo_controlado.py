@@ -14,7 +14,7 @@ from clinica.forms.movimiento_ficha_monologo_controlado import (
 )
 from clinica.models import Ficha
 from clinica.models.movimiento_ficha_monologo_controlado import MovimientoMonologoControlado
-from core.utils.search_utils import get_rut_q_filter, get_name_q_filter
+from core.utils.search_utils import get_rut_q_filter, get_name_q_filter, get_paciente_rut_q_filter
 from personas.models.pacientes import Paciente
 
 
@@ -70,7 +70,7 @@ class SalidaFichaView(LoginRequiredMixin, TemplateView):
         search_value = request.GET.get('search[value]', '').strip()
         if search_value:
             q = get_rut_q_filter(search_value, 'rut')
-            q |= get_rut_q_filter(search_value, 'rut_paciente__rut')
+            q |= get_paciente_rut_q_filter(search_value, 'rut_paciente__')
             q |= get_name_q_filter(search_value, 'rut_paciente__')
             q |= Q(numero_ficha__icontains=search_value)
             q |= Q(servicio_clinico_destino__nombre__icontains=search_value)
@@ -162,7 +162,7 @@ class TraspasoFichaView(LoginRequiredMixin, TemplateView):
         search_value = request.GET.get('search[value]', '').strip()
         if search_value:
             q = get_rut_q_filter(search_value, 'rut')
-            q |= get_rut_q_filter(search_value, 'rut_paciente__rut')
+            q |= get_paciente_rut_q_filter(search_value, 'rut_paciente__')
             q |= get_name_q_filter(search_value, 'rut_paciente__')
             q |= Q(numero_ficha__icontains=search_value)
             q |= Q(servicio_clinico_destino__nombre__icontains=search_value)
@@ -362,7 +362,7 @@ class RecepcionFichaView(LoginRequiredMixin, TemplateView):
         search_value = request.GET.get('search[value]', '').strip()
         if search_value:
             q = get_rut_q_filter(search_value, 'rut')
-            q |= get_rut_q_filter(search_value, 'rut_paciente__rut')
+            q |= get_paciente_rut_q_filter(search_value, 'rut_paciente__')
             q |= get_name_q_filter(search_value, 'rut_paciente__')
             q |= Q(numero_ficha__icontains=search_value)
             q |= Q(servicio_clinico_destino__nombre__icontains=search_value)
@@ -503,7 +503,7 @@ class FichasEnTransitoView(LoginRequiredMixin, TemplateView):
         search_value = request.GET.get('search[value]', '').strip()
         if search_value:
             q = get_rut_q_filter(search_value, 'rut')
-            q |= get_rut_q_filter(search_value, 'rut_paciente__rut')
+            q |= get_paciente_rut_q_filter(search_value, 'rut_paciente__')
             q |= get_name_q_filter(search_value, 'rut_paciente__')
             q |= Q(numero_ficha__icontains=search_value)
             q |= Q(servicio_clinico_destino__nombre__icontains=search_value)
@@ -128,9 +128,66 @@ SIMPLE_HISTORY_ENABLED = env_bool('SIMPLE_HISTORY_ENABLED', True)
 
 DATABASES = MYSQL
 
+# CACHÉ
+# Las versiones e invalidaciones de conteos, dashboard, principal y catálogos deben verse desde todos los
+# workers: en producción con varios procesos usar Redis (django.core.cache.backends.redis.RedisCache,
+# requiere el paquete redis) o Memcached (PyMemcacheCache, requiere pymemcache) vía CACHE_BACKEND /
+# CACHE_LOCATION. Sin configurar se usa LocMem, por proceso, apta solo para desarrollo (check core.W001).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.getenv('CACHE_LOCATION') or 'kardex',
+    }
+}
+
 # MANTENIMIENTO
 MAINTENANCE_MODE = env_bool('MAINTENANCE_MODE', False)
 
+# BÚSQUEDA DE PACIENTES
+# Usa y mantiene el índice PacienteNombreToken en lugar de icontains; desactivado no se escriben tokens, al
+# activarlo llenar el índice con reconstruir_indice_nombres
+PACIENTE_NAME_SEARCH_INDEX = env_bool('PACIENTE_NAME_SEARCH_INDEX', False)
+
+# CONTEOS DE TABLAS (DataTables)
+# Segundos que se cachea cada COUNT(*); se invalida antes al guardar/eliminar en los modelos de los listados
+# (core.utils.count_cache.COUNTED_MODELS)
+DATATABLE_COUNT_CACHE_TIMEOUT = int(os.getenv('DATATABLE_COUNT_CACHE_TIMEOUT', 60))
+# Sobre esta cantidad de filas, los conteos sin filtro usan la estimación del motor
+DATATABLE_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('DATATABLE_COUNT_ESTIMATE_THRESHOLD', 500000))
+
+# DASHBOARD
+# Segundos que se cachea cada widget por establecimiento; se invalida antes al cambiar sus datos
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300))
+
+# PRINCIPAL (users.principal)
+# Segundos que se cachean establecimiento, rol y permisos del usuario; se invalida al guardar User/Role
+# y al cambiar Role.updated_at (versión del rol que se compara en cada petición)
+PRINCIPAL_CACHE_TIMEOUT = int(os.getenv('PRINCIPAL_CACHE_TIMEOUT', 60))
+
+# CATÁLOGOS (core.utils.catalogos)
+# Segundos entre revisiones de la versión compartida de cada catálogo y vida máxima de la copia en memoria
+CATALOGOS_REVISION_SEGUNDOS = int(os.getenv('CATALOGOS_REVISION_SEGUNDOS', 5))
+CATALOGOS_CACHE_TIMEOUT = int(os.getenv('CATALOGOS_CACHE_TIMEOUT', 600))
+
+# EXPORTACIONES EN SEGUNDO PLANO (reports.jobs)
+# Directorio de archivos generados, segundos que se conservan, segundos en que una solicitud idéntica reutiliza
+# el archivo ya generado (0 siempre genera uno nuevo) y cantidad de hilos de trabajo
+EXPORT_JOBS_DIR = os.getenv('EXPORT_JOBS_DIR') or str(BASE_DIR / 'exports')
+EXPORT_JOBS_TTL = int(os.getenv('EXPORT_JOBS_TTL', 86400))
+EXPORT_JOBS_REUSE = int(os.getenv('EXPORT_JOBS_REUSE', 300))
+EXPORT_JOBS_WORKERS = int(os.getenv('EXPORT_JOBS_WORKERS', 2))
+
+# CÓDIGOS DE BARRAS (core.utils.codigos_barras)
+# Directorio de los SVG ya generados (vacío en .env usa el predeterminado), máximo de archivos que se
+# conservan en él (se borran los más antiguos) y entradas de la caché en memoria
+BARCODE_CACHE_DIR = os.getenv('BARCODE_CACHE_DIR') or str(BASE_DIR / 'cache' / 'barcodes')
+BARCODE_CACHE_DIR_MAX_FILES = int(os.getenv('BARCODE_CACHE_DIR_MAX_FILES', 20000))
+BARCODE_CACHE_SIZE = int(os.getenv('BARCODE_CACHE_SIZE', 2048))
+
+# IMPRESIÓN POR LOTE (clinica.impresion)
+# Máximo de fichas por PDF desde la web; lotes mayores se imprimen con el comando imprimir_fichas
+IMPRESION_LOTE_MAX = int(os.getenv('IMPRESION_LOTE_MAX', 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
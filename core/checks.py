@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends que no comparten datos entre workers o no incrementan de forma atómica
+CACHES_NO_COMPARTIDAS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def revisar_cache_compartida(app_configs, **kwargs):
+    """Las invalidaciones de conteos, dashboard, principal y catálogos necesitan una caché compartida."""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in CACHES_NO_COMPARTIDAS:
+        return []
+    return [Warning(
+        f'CACHES["default"] usa {backend.rsplit(".", 1)[-1]}: con varios workers las invalidaciones solo '
+        f'llegan al proceso que guarda.',
+        hint='Configure CACHE_BACKEND / CACHE_LOCATION con Redis o Memcached.',
+        id='core.W001',
+    )]
@@ -0,0 +1,147 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from clinica.models import Ficha
+from core.models import Contador
+from core.utils.bulk import bulk_upsert
+from personas.models.pacientes import Paciente
+
+# =========================================================
+# CONTADORES
+# =========================================================
+# Los valores viven en la tabla Contador y se ajustan con +/- desde las señales de Paciente y Ficha
+# (core.signals). Cada lectura es una fila por índice único, sin caché propia: el valor confirmado se ve
+# al instante en todos los procesos. El COUNT(*) solo se ejecuta si la fila aún no existe, y una sola
+# vez aunque lleguen muchas peticiones a la vez.
+# Las rutas masivas (bulk_create / update) no emiten señales: reconciliar_contadores corrige el desvío.
+
+PACIENTES_ACTIVOS = 'pacientes_activos'
+FICHAS_ACTIVAS = 'fichas_activas'
+
+GLOBAL = 0
+
+CONTADOR_CACHE_PREFIX = 'contador'
+
+# Tiempo máximo que una petición espera a que otra termine de recalcular el mismo contador
+ESPERA_RECALCULO = 10
+
+
+def _contar(nombre, establecimiento_id):
+    if nombre == PACIENTES_ACTIVOS:
+        return Paciente.objects.filter(status=True).count()
+    if nombre == FICHAS_ACTIVAS:
+        return Ficha.objects.filter(establecimiento_id=establecimiento_id, paciente__status=True).count()
+    raise ValueError(f'Contador desconocido: {nombre}')
+
+
+def calcular_todos():
+    """Valores reales de todos los contadores: {(nombre, establecimiento_id): valor}."""
+    valores = {(PACIENTES_ACTIVOS, GLOBAL): Paciente.objects.filter(status=True).count()}
+    fichas = Ficha.objects.filter(
+        establecimiento__isnull=False, paciente__status=True
+    ).values_list('establecimiento_id').annotate(total=Count('id')).order_by()
+    for establecimiento_id, total in fichas:
+        valores[(FICHAS_ACTIVAS, establecimiento_id)] = total
+    return valores
+
+
+def _cache_key(nombre, establecimiento_id):
+    return f'{CONTADOR_CACHE_PREFIX}:{nombre}:{establecimiento_id}'
+
+
+def _recalcular(nombre, establecimiento_id):
+    """Crea la fila del contador con un COUNT(*); las peticiones concurrentes esperan su resultado."""
+    lock_key = f'{_cache_key(nombre, establecimiento_id)}:lock'
+
+    if cache.add(lock_key, 1, ESPERA_RECALCULO * 3):
+        try:
+            valor = _contar(nombre, establecimiento_id)
+            Contador.objects.update_or_create(
+                nombre=nombre, establecimiento_id=establecimiento_id, defaults={'valor': valor}
+            )
+            return valor
+        finally:
+            cache.delete(lock_key)
+
+    limite = time.monotonic() + ESPERA_RECALCULO
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        valor = Contador.objects.filter(
+            nombre=nombre, establecimiento_id=establecimiento_id
+        ).values_list('valor', flat=True).first()
+        if valor is not None:
+            return valor
+    return _contar(nombre, establecimiento_id)
+
+
+def valor(nombre, establecimiento_id=GLOBAL):
+    resultado = Contador.objects.filter(
+        nombre=nombre, establecimiento_id=establecimiento_id
+    ).values_list('valor', flat=True).first()
+    if resultado is None:
+        resultado = _recalcular(nombre, establecimiento_id)
+    return resultado
+
+
+def aplicar(deltas):
+    """
+    Suma ``{(nombre, establecimiento_id): delta}`` a las filas existentes en la transacción actual.
+    Si la fila aún no existe no se hace nada: se creará con el valor real en la primera lectura.
+    """
+    for (nombre, establecimiento_id), delta in deltas.items():
+        if not delta:
+            continue
+        Contador.objects.filter(nombre=nombre, establecimiento_id=establecimiento_id).update(
+            valor=F('valor') + delta
+        )
+
+
+def guardar(valores):
+    """Reemplaza los valores de los contadores (reconciliación)."""
+    bulk_upsert(
+        Contador,
+        [Contador(nombre=n, establecimiento_id=e, valor=v) for (n, e), v in valores.items()],
+        unique_fields=['nombre', 'establecimiento_id'],
+        update_fields=['valor', 'updated_at'],
+    )
+
+
+# =========================================================
+# APORTES DE CADA REGISTRO (usados por las señales)
+# =========================================================
+
+def estado_paciente(pk):
+    """Estado guardado del paciente (None si no existe)."""
+    if not pk:
+        return None
+    return Paciente.objects.filter(pk=pk).values_list('status', flat=True).first()
+
+
+def deltas_cambio_status_paciente(paciente_id, activo):
+    """Un paciente pasa a activo/inactivo: ajusta el total global y las fichas de cada establecimiento."""
+    signo = 1 if activo else -1
+    deltas = {(PACIENTES_ACTIVOS, GLOBAL): signo}
+    fichas = Ficha.objects.filter(
+        paciente_id=paciente_id, establecimiento__isnull=False
+    ).values_list('establecimiento_id').annotate(total=Count('id')).order_by()
+    for establecimiento_id, total in fichas:
+        deltas[(FICHAS_ACTIVAS, establecimiento_id)] = signo * total
+    return deltas
+
+
+def aporte_ficha(establecimiento_id, paciente_activo):
+    """Clave del contador al que suma una ficha (None si no suma a ninguno)."""
+    if establecimiento_id and paciente_activo:
+        return FICHAS_ACTIVAS, establecimiento_id
+    return None
+
+
+def estado_ficha(pk):
+    """(establecimiento_id, paciente_id, paciente activo) guardados de la ficha, o None."""
+    if not pk:
+        return None
+    return Ficha.objects.filter(pk=pk).values_list(
+        'establecimiento_id', 'paciente_id', 'paciente__status'
+    ).first()
@@ -0,0 +1,161 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from clinica.models import Ficha
+from core import contadores
+from core.history import GenericHistoryListView
+from core.utils.history_diff import build_history_diffs
+from core.utils.versiones import leer_versiones, subir_version
+from personas.models.pacientes import Paciente
+
+# =========================================================
+# CACHÉ DE WIDGETS
+# =========================================================
+# Cada widget se cachea por establecimiento. La clave incluye dos versiones (global y del
+# establecimiento) que se incrementan desde las señales cuando cambian los datos que usa el widget,
+# así la invalidación no necesita conocer las claves ya guardadas.
+
+WIDGET_CACHE_PREFIX = 'dashboard_widget'
+WIDGET_VERSION_PREFIX = 'dashboard_version'
+
+# Modelo (label_lower) → widgets que dependen de él y si el cambio afecta a todos los establecimientos
+WIDGET_DEPENDENCIAS = {
+    'personas.paciente': (('busqueda', 'pacientes_recientes'), True),
+    'personas.historicalpaciente': (('cambios_recientes',), True),
+    'clinica.ficha': (('pacientes_recientes',), False),
+}
+
+
+def _scope(establecimiento_id):
+    return establecimiento_id or 'global'
+
+
+def _version_key(widget, establecimiento_id=None):
+    return f'{WIDGET_VERSION_PREFIX}:{widget}:{_scope(establecimiento_id)}'
+
+
+def cached_widget(widget, establecimiento_id, builder, *extra):
+    """Devuelve los datos del widget desde la caché o los calcula con ``builder()``."""
+    version_keys = [_version_key(widget), _version_key(widget, establecimiento_id)]
+    versions = leer_versiones(version_keys)
+
+    key = ':'.join([
+        WIDGET_CACHE_PREFIX, widget, str(_scope(establecimiento_id)),
+        *(str(versions[k]) for k in version_keys),
+        *extra,
+    ])
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_widget(widget, establecimiento_id=None):
+    """Invalida el widget de un establecimiento (o de todos si ``establecimiento_id`` es None)."""
+    subir_version(_version_key(widget, establecimiento_id))
+
+
+def invalidate_widgets_for(sender, instance):
+    """Se llama desde las señales post_save / post_delete. Las rutas bulk las cubre el TTL."""
+    widgets, es_global = WIDGET_DEPENDENCIAS.get(sender._meta.label_lower, ((), True))
+    establecimiento_id = None if es_global else getattr(instance, 'establecimiento_id', None)
+    for widget in widgets:
+        invalidate_widget(widget, establecimiento_id)
+
+
+# =========================================================
+# WIDGETS
+# =========================================================
+
+def busqueda_rapida(q, establecimiento_id=None):
+    """{'pk': id} si la búsqueda identifica un solo paciente; si no {'total': 0 | 2 (varios)}."""
+    q = q.strip()
+
+    def build():
+        pks = list(Paciente.objects.filter(status=True).filter(
+            Q(rut__iexact=q) |
+            Q(nombre__icontains=q) |
+            Q(apellido_paterno__icontains=q) |
+            Q(apellido_materno__icontains=q)
+        ).values_list('pk', flat=True)[:2])
+        return {'pk': pks[0]} if len(pks) == 1 else {'total': len(pks)}
+
+    q_hash = hashlib.md5(q.lower().encode()).hexdigest()
+    return cached_widget('busqueda', establecimiento_id, build, q_hash)
+
+
+def metricas(establecimiento_id):
+    """Totales del dashboard desde core.contadores (sin COUNT(*) por petición)."""
+    return {
+        # Total Pacientes: Global y Activos (status=True)
+        'total_pacientes': contadores.valor(contadores.PACIENTES_ACTIVOS),
+        # Fichas del establecimiento con paciente activo
+        'total_fichas_est': contadores.valor(contadores.FICHAS_ACTIVAS, establecimiento_id)
+        if establecimiento_id else 0,
+    }
+
+
+def pacientes_recientes(establecimiento_id):
+    def build():
+        if not establecimiento_id:
+            return []
+
+        fichas_recientes = Ficha.objects.select_related('paciente').filter(
+            establecimiento_id=establecimiento_id,
+            paciente__status=True
+        ).order_by('-created_at')[:10]
+
+        data = []
+        for ficha in fichas_recientes:
+            paciente = ficha.paciente
+            # URL para ver la ficha del paciente
+            url_paciente = reverse('paciente_view_param', args=[paciente.id]) if paciente else "#"
+
+            data.append({
+                'nombre_completo': f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno}" if paciente else "Desconocido",
+                'rut': paciente.rut if paciente and paciente.rut else "-",
+                'fecha_ingreso': ficha.created_at.strftime('%d-%m-%Y %H:%M'),
+                'numero_ficha': str(ficha.numero_ficha_sistema).zfill(
+                    4) if ficha.numero_ficha_sistema is not None else None,
+                'url_paciente': url_paciente
+            })
+        return data
+
+    return cached_widget('pacientes_recientes', establecimiento_id, build)
+
+
+def cambios_recientes(establecimiento_id):
+    """Conteo de cambios de pacientes en 7 días y los últimos 5 con su primer campo modificado."""
+    def build():
+        last_7 = timezone.now() - timedelta(days=7)
+        count = Paciente.history.filter(history_date__gte=last_7).count()
+
+        history_items = list(Paciente.history.select_related('history_user').order_by('-history_date')[:5])
+        diffs = build_history_diffs(Paciente, history_items, GenericHistoryListView.history_exclude_fields)
+
+        cambios = []
+        for h in history_items:
+            # Primer campo modificado (cambios precalculados en CambioHistorico)
+            campo = antes = despues = None
+            if diffs.get(h.history_id):
+                campo, antes, despues = diffs[h.history_id][0]
+
+            cambios.append({
+                'paciente_str': str(h.instance),
+                'campo': campo,
+                'antes': antes,
+                'despues': despues,
+                'fecha': timezone.localtime(h.history_date).strftime('%d-%m-%Y %H:%M'),
+                'usuario': getattr(h.history_user, 'username', None),
+            })
+
+        return {'cambios_recientes_count': count, 'cambios': cambios}
+
+    return cached_widget('cambios_recientes', establecimiento_id, build)
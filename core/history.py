@@ -8,12 +8,15 @@ from django.utils.safestring import mark_safe
 from django.views.generic import TemplateView
 
 from core.mixin import DataTableMixin
+from core.utils.history_diff import build_history_diffs, display_value, field_label, resolve_fk_labels
 
 
 class GenericHistoryListView(DataTableMixin, TemplateView):
     """
     Vista genérica de historial con django-simple-history mejorada.
     Proporciona cambios legibles, manejo de FKs, choices, booleanos y exclusión de campos.
+    Los cambios de cada página se calculan en lote: versiones anteriores en una consulta y
+    etiquetas de FKs con un in_bulk por modelo relacionado.
     """
     base_model: Optional[Type[models.Model]] = None
 
@@ -63,45 +66,14 @@ class GenericHistoryListView(DataTableMixin, TemplateView):
 
     def _get_verbose_name(self, field_name: str) -> str:
         """Obtiene el verbose_name del campo en el modelo base."""
-        try:
-            return self.base_model._meta.get_field(field_name).verbose_name.capitalize()
-        except:
-            return field_name.replace('_', ' ').capitalize()
+        return field_label(self.base_model, field_name)
 
     def _get_field_display_value(self, field_name: str, value, record) -> str:
         """
         Resuelve el valor legible de un campo (FK, Choices, Boolean, etc.)
         """
-        if value is None or value == "":
-            return "—"
-
-        try:
-            field = self.base_model._meta.get_field(field_name)
-
-            # 1. Manejo de Booleano
-            if isinstance(field, (models.BooleanField, models.NullBooleanField)):
-                return "Sí" if value else "No"
-
-            # 2. Manejo de Choices
-            if field.choices:
-                return dict(field.choices).get(value, value)
-
-            # 3. Manejo de ForeignKey / OneToOne
-            if isinstance(field, (models.ForeignKey, models.OneToOneField)):
-                related_model = field.remote_field.model
-                try:
-                    # Intentamos obtener el objeto relacionado actual para usar su __str__
-                    related_obj = related_model.objects.get(pk=value)
-                    return str(related_obj)
-                except related_model.DoesNotExist:
-                    return f"ID {value} (Eliminado)"
-                except:
-                    return f"ID {value}"
-
-        except:
-            pass
-
-        return str(value)
+        fk_labels = resolve_fk_labels(self.base_model, [[(field_name, value, None)]])
+        return display_value(self.base_model, field_name, value, fk_labels)
 
     def _get_user_display(self, user):
         if not user:
@@ -123,41 +95,34 @@ class GenericHistoryListView(DataTableMixin, TemplateView):
     # 🔥 CAMBIOS DETALLADOS (REFACTORIZADO)
     # ==============================================================
 
+    def prepare_page(self, objs):
+        """Calcula los cambios de toda la página en lote (ver core.utils.history_diff)."""
+        self._page_changes = build_history_diffs(self.base_model, objs, self.history_exclude_fields)
+
     def _get_changes(self, obj) -> str:
         """
-        Calcula y formatea los cambios entre el registro actual y el anterior.
+        Formatea los cambios entre el registro actual y el anterior.
         """
         # Si es creación, no comparamos (opcionalmente podríamos mostrar todos los campos iniciales)
         if obj.history_type == '+':
             return "<i>Registro inicial</i>"
 
-        # Usamos prev_record que provee django-simple-history de forma eficiente
-        previous = obj.prev_record
-        if not previous:
-            return "—"
-
-        delta = obj.diff_against(previous)
-        result = []
-
-        for change in delta.changes:
-            # Excluir campos técnicos
-            if change.field in self.history_exclude_fields:
-                continue
+        page_changes = getattr(self, '_page_changes', {})
+        if obj.history_id not in page_changes:
+            page_changes = build_history_diffs(self.base_model, [obj], self.history_exclude_fields)
 
-            field_label = self._get_verbose_name(change.field)
-            old_val = self._get_field_display_value(change.field, change.old, previous)
-            new_val = self._get_field_display_value(change.field, change.new, obj)
-
-            # Solo agregar si el valor legible realmente cambió (evita ruido en FKs o campos procesados)
-            if old_val != new_val:
-                result.append(
-                    format_html(
-                        "<b>{}:</b> <span style='color:#d9534f; text-decoration:line-through;'>{}</span> "
-                        "&rarr; <span style='color:#5cb85c; font-weight:bold;'>{}</span>",
-                        field_label, old_val, new_val
-                    )
-                )
+        changes = page_changes[obj.history_id]
+        if changes is None:
+            return "—"
 
+        result = [
+            format_html(
+                "<b>{}:</b> <span style='color:#d9534f; text-decoration:line-through;'>{}</span> "
+                "&rarr; <span style='color:#5cb85c; font-weight:bold;'>{}</span>",
+                label, old_val, new_val
+            )
+            for label, old_val, new_val in changes
+        ]
         return mark_safe("<br>".join(result)) if result else "—"
 
     # ==============================================================
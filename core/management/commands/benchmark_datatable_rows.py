@@ -0,0 +1,106 @@
+# python manage.py benchmark_datatable_rows --rows 100 --repeat 50
+
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+
+from personas.models.pacientes import Paciente
+from personas.views.pacientes import PacienteListView
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo por fila de las acciones y el formato de filas de DataTables (antes / después).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Filas por página (por defecto: 100)')
+        parser.add_argument('--repeat', type=int, default=50, help='Páginas a renderizar (por defecto: 50)')
+
+    # ================== ANTES: reverse() + HTML por fila ==================
+
+    def legacy_actions(self, view, obj):
+        actions = []
+        if view.url_detail:
+            actions.append(f"""
+                <a href="{reverse(view.url_detail, kwargs={'pk': obj.pk})}"
+                   class="btn p-1 btn-sm btn-secondary view-btn" title="Ver detalle">
+                   <i class="fas fa-search"></i></a>
+            """)
+        url_update = view.get_url_update()
+        if url_update:
+            actions.append(f"""
+                <a href="{reverse(url_update, kwargs={'paciente_id': obj.pk})}"
+                   class="btn p-1 btn-sm btn-info" title="Editar">
+                   <i class="fas fa-edit"></i></a>
+            """)
+        base_url = reverse('ficha_paciente_manage')
+        actions.append(f"""
+            <a href="{base_url}?rut={obj.rut}"
+               class="btn p-1 btn-sm btn-success" title="Actualizar v2">
+               <i class="fas fa-edit"></i></a>
+        """)
+        return ''.join(actions)
+
+    def render_legacy(self, view, objs):
+        data = []
+        for obj in objs:
+            row = {'ID': obj.pk, 'RUT': obj.rut, 'Nombre': obj.nombre}
+            row['actions'] = self.legacy_actions(view, obj)
+            data.append(row)
+        return json.dumps({'data': data})
+
+    # ================== DESPUÉS: esquema + filas compactas ==================
+
+    def render_compact(self, view, objs):
+        view._datatable_actions = None
+        data = [[obj.pk, obj.rut, obj.nombre, view.get_action_params(obj)] for obj in objs]
+        return json.dumps({'data': data, 'actions': view._get_cached_datatable_actions()})
+
+    def render_server_html(self, view, objs):
+        view._datatable_actions = None
+        data = []
+        for obj in objs:
+            row = {'ID': obj.pk, 'RUT': obj.rut, 'Nombre': obj.nombre}
+            row['actions'] = view.get_actions(obj)
+            data.append(row)
+        return json.dumps({'data': data})
+
+    def measure(self, func, view, objs, repeat):
+        inicio = time.perf_counter()
+        for _ in range(repeat):
+            payload = func(view, objs)
+        total = time.perf_counter() - inicio
+        return total / (repeat * len(objs)) * 1_000_000, len(payload)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        view = PacienteListView()
+        view.request = request
+
+        # Instancias sin guardar: se mide solo el armado de filas, no la base de datos
+        objs = [
+            Paciente(pk=i, rut=f'{10_000_000 + i:,}'.replace(',', '.') + '-K', nombre=f'PACIENTE {i}')
+            for i in range(1, rows + 1)
+        ]
+
+        resultados = [
+            ('Antes (reverse + HTML por fila)', self.render_legacy),
+            ('Plantillas de URL + HTML en servidor', self.render_server_html),
+            ('Plantillas de URL + filas compactas', self.render_compact),
+        ]
+
+        self.stdout.write(self.style.SUCCESS(f'Filas por página: {rows} | Páginas: {repeat}'))
+        base = None
+        for nombre, func in resultados:
+            us_fila, bytes_pagina = self.measure(func, view, objs, repeat)
+            base = base or us_fila
+            self.stdout.write(
+                f'{nombre:<40} {us_fila:8.2f} µs/fila  {bytes_pagina:>8,} bytes/página  x{base / us_fila:.1f}'
+            )
@@ -0,0 +1,32 @@
+# python manage.py reconciliar_contadores
+
+from django.core.management.base import BaseCommand
+
+from core import contadores
+from core.models import Contador
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los contadores del dashboard (core.contadores) con COUNT(*) y corrige el desvío '
+            'causado por cargas masivas que no emiten señales. Pensado para ejecutarse periódicamente.')
+
+    def handle(self, *args, **options):
+        reales = contadores.calcular_todos()
+        guardados = {(c.nombre, c.establecimiento_id): c.valor for c in Contador.objects.all()}
+
+        # Contadores que ya no tienen registros (ej: establecimiento sin fichas activas)
+        for clave in guardados:
+            reales.setdefault(clave, 0)
+
+        desviados = {clave: valor for clave, valor in reales.items() if guardados.get(clave) != valor}
+        for (nombre, establecimiento_id), valor in sorted(desviados.items()):
+            anterior = guardados.get((nombre, establecimiento_id))
+            self.stdout.write(f'{nombre} [{establecimiento_id}]: {anterior if anterior is not None else "—"} → {valor}')
+
+        if desviados:
+            contadores.guardar(desviados)
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Contadores revisados: {len(reales):,}'))
+        self.stdout.write(self.style.SUCCESS(f'Contadores corregidos: {len(desviados):,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,73 @@
+# python manage.py reconstruir_cambios_historicos --batch-size 2000 --model personas.Paciente
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from core.models import CambioHistorico
+from core.utils.history_diff import store_change_sets
+
+
+class Command(BaseCommand):
+    help = ('Calcula los campos modificados (CambioHistorico) de los registros históricos existentes. '
+            'Los registros ya calculados se omiten salvo con --rebuild.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Registros por lote (por defecto: 2000)')
+        parser.add_argument('--model', action='append', default=[],
+                            help='Procesar solo este modelo (app_label.Modelo); se puede repetir')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Eliminar y recalcular los cambios ya guardados')
+
+    def get_models(self, labels):
+        if labels:
+            try:
+                models = [apps.get_model(label) for label in labels]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+        else:
+            models = apps.get_models()
+        return [m for m in models if getattr(m._meta, 'simple_history_manager_attribute', None)]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total_guardados = 0
+
+        for base_model in self.get_models(options['model']):
+            history_model = base_model.history.model
+            content_type = ContentType.objects.get_for_model(base_model)
+
+            if options['rebuild']:
+                CambioHistorico.objects.filter(content_type=content_type).delete()
+
+            qs = history_model.objects.order_by('history_id')
+            total = qs.count()
+            antes = CambioHistorico.objects.filter(content_type=content_type).count()
+            ultimo_id = None
+
+            with tqdm(total=total, desc=base_model._meta.label, unit='reg') as pbar:
+                while True:
+                    lote_qs = qs if ultimo_id is None else qs.filter(history_id__gt=ultimo_id)
+                    lote = list(lote_qs[:batch_size])
+                    if not lote:
+                        break
+
+                    existentes = set(CambioHistorico.objects.filter(
+                        content_type=content_type,
+                        history_id__in=[str(r.history_id) for r in lote],
+                    ).values_list('history_id', flat=True))
+                    pendientes = [r for r in lote if str(r.history_id) not in existentes]
+                    if pendientes:
+                        store_change_sets(base_model, pendientes)
+
+                    ultimo_id = lote[-1].history_id
+                    pbar.update(len(lote))
+
+            guardados = CambioHistorico.objects.filter(content_type=content_type).count() - antes
+            total_guardados += guardados
+            self.stdout.write(f'{base_model._meta.label}: {guardados:,} cambios calculados')
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Cambios históricos calculados: {total_guardados:,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
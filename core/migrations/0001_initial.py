@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('history_id', models.CharField(max_length=36, verbose_name='ID Histórico')),
+                ('object_id', models.CharField(max_length=64, verbose_name='ID Objeto')),
+                ('history_date', models.DateTimeField(verbose_name='Fecha')),
+                ('history_type', models.CharField(max_length=1, verbose_name='Acción')),
+                ('cambios', models.JSONField(blank=True, null=True, verbose_name='Cambios')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Modelo')),
+            ],
+            options={
+                'verbose_name': 'Cambio Histórico',
+                'verbose_name_plural': 'Cambios Históricos',
+                'indexes': [models.Index(fields=['content_type', 'history_date'], name='cambio_historico_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'history_id'), name='cambio_historico_unico')],
+            },
+        ),
+    ]
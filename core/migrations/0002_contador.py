@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, verbose_name='Nombre')),
+                ('establecimiento_id', models.PositiveIntegerField(default=0, verbose_name='Establecimiento')),
+                ('valor', models.BigIntegerField(default=0, verbose_name='Valor')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Contador',
+                'verbose_name_plural': 'Contadores',
+                'constraints': [models.UniqueConstraint(fields=('nombre', 'establecimiento_id'), name='contador_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_contador'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True, verbose_name='Nombre')),
+                ('ultimo_valor', models.BigIntegerField(default=0, verbose_name='Último Valor')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Secuencia',
+                'verbose_name_plural': 'Secuencias',
+            },
+        ),
+    ]
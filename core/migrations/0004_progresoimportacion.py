@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_secuencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comando', models.CharField(max_length=100, verbose_name='Comando')),
+                ('archivo', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('firma', models.CharField(max_length=40, verbose_name='Firma del Archivo')),
+                ('filas_procesadas', models.BigIntegerField(default=0, verbose_name='Filas Procesadas')),
+                ('completada', models.BooleanField(default=False, verbose_name='Completada')),
+                ('datos', models.JSONField(blank=True, default=dict, verbose_name='Datos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Inicio')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Progreso de Importación',
+                'verbose_name_plural': 'Progresos de Importación',
+                'constraints': [models.UniqueConstraint(fields=('comando', 'firma'), name='progreso_importacion_unico')],
+            },
+        ),
+    ]
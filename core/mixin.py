@@ -1,11 +1,269 @@
-from django.db.models import Q
+import datetime
+import decimal
+import functools
+import hashlib
+import re
+from urllib.parse import quote
+
+from django.core import signing
+from django.db.models import F, Q
 from django.http import JsonResponse
-from django.urls import reverse_lazy, reverse
+from django.urls import reverse, get_script_prefix, NoReverseMatch
+from django.utils.html import escape
 
-from core.utils.search_utils import get_rut_q_filter, get_name_q_filter
+from core.utils.count_cache import cached_count
+from core.utils.search_utils import get_rut_q_filter, get_name_q_filter, get_paciente_rut_q_filter, \
+    get_paciente_rut_prefix
 
 
-class DataTableMixin:
+DATATABLE_CURSOR_SALT = 'core.mixin.datatable_cursor'
+# Parámetros de DataTables que no cambian el conjunto de resultados (solo la página)
+DATATABLE_PAGE_PARAMS = {'draw', 'start', 'length', 'cursor', '_'}
+
+
+# Valor de relleno para obtener la plantilla de una URL con un solo reverse()
+URL_TEMPLATE_SENTINEL = 987654321
+URL_PARAM_RE = re.compile(r'\{(\w+)\}')
+
+
+@functools.lru_cache(maxsize=None)
+def _url_template(url_name, kwarg, script_prefix):
+    url = reverse(url_name, kwargs={kwarg: URL_TEMPLATE_SENTINEL})
+    return url.replace(str(URL_TEMPLATE_SENTINEL), '{pk}')
+
+
+def url_template(url_name, kwarg='pk'):
+    """
+    URL con '{pk}' en lugar del identificador (ej: '/kardex/pacientes/{pk}/'), resuelta una vez
+    por proceso y prefijo de script.
+    """
+    return _url_template(url_name, kwarg, get_script_prefix())
+
+
+def datatable_action(url_name, css, icon, title):
+    """Botón de acción para DataTables; 'paciente_view_param' usa 'paciente_id' en lugar de 'pk'."""
+    kwarg = 'paciente_id' if url_name == 'paciente_view_param' else 'pk'
+    return {'url': url_template(url_name, kwarg), 'css': css, 'icon': icon, 'title': title}
+
+
+def render_datatable_actions(actions, params):
+    """HTML de los botones a partir del esquema (mismo resultado que renderDatatableActions en base.html)."""
+    html = []
+    for action in actions:
+        url = URL_PARAM_RE.sub(lambda m: quote(str(params.get(m.group(1), '')), safe=''), action['url'])
+        html.append(
+            f'<a href="{escape(url)}" class="btn p-1 btn-sm {action["css"]}" title="{action["title"]}">'
+            f'<i class="fas {action["icon"]}"></i></a>'
+        )
+    return ''.join(html)
+
+
+class DataTablePaginationMixin:
+    """
+    Respuesta AJAX de DataTables (server-side) común a DataTableMixin y DataTableMixinMov.
+
+    Con ``datatable_keyset = True`` la página siguiente se busca por cursor (último valor del
+    orden activo + pk) en lugar de OFFSET. El cliente devuelve ``cursor`` solo cuando pide la
+    página que sigue a la anterior; cualquier otro salto de página usa OFFSET.
+    Los totales salen de core.utils.count_cache (``datatable_count_cache_timeout`` segundos,
+    None = settings.DATATABLE_COUNT_CACHE_TIMEOUT).
+    """
+    datatable_keyset = False
+    datatable_count_cache_timeout = None
+    # Filas como listas en el orden de datatable_columns (+ parámetros de acciones al final);
+    # los botones los arma base.html con el esquema 'actions' de la respuesta
+    datatable_compact_rows = False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['datatable_compact_rows'] = self.datatable_compact_rows
+        return context
+
+    def get_datatable_actions(self):
+        return []
+
+    def get_action_params(self, obj):
+        return {'pk': obj.pk}
+
+    def _get_cached_datatable_actions(self):
+        # El esquema depende solo de la vista y del usuario: una vez por request
+        if getattr(self, '_datatable_actions', None) is None:
+            self._datatable_actions = self.get_datatable_actions()
+        return self._datatable_actions
+
+    def get_actions(self, obj):
+        """
+        Devuelve el HTML de los botones de acciones a partir de get_datatable_actions().
+        """
+        return render_datatable_actions(self._get_cached_datatable_actions(), self.get_action_params(obj))
+
+    def get_datatable_signature(self, request):
+        """
+        Identifica el conjunto de resultados (vista, establecimiento, búsqueda, filtros y orden),
+        sin los parámetros de paginación.
+        """
+        user = getattr(request, 'user', None)
+        params = sorted(
+            (key, value) for key, value in request.GET.lists() if key not in DATATABLE_PAGE_PARAMS
+        )
+        raw = repr((
+            f'{type(self).__module__}.{type(self).__qualname__}',
+            request.path,
+            getattr(user, 'establecimiento_id', None),
+            params,
+        ))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_datatable_counts(self, request, qs):
+        """
+        (recordsTotal, recordsFiltered) desde la caché de conteos; el total sin filtros de tablas
+        muy grandes puede ser la estimación del motor.
+        """
+        establecimiento_id = getattr(getattr(request, 'user', None), 'establecimiento_id', None)
+        timeout = self.datatable_count_cache_timeout
+        records_total = cached_count(self.get_base_queryset(), establecimiento_id, timeout)
+        records_filtered = cached_count(qs, establecimiento_id, timeout)
+        return records_total, records_filtered
+
+    def get_datatable_order(self, request):
+        """Devuelve (campo, descendente) según la columna de orden pedida por DataTables."""
+        try:
+            order_col = int(request.GET.get('order[0][column]', 0))
+        except (TypeError, ValueError):
+            order_col = 0
+        order_dir = request.GET.get('order[0][dir]', 'asc')
+
+        pk_field = self.model._meta.pk.name if self.model else 'id'
+
+        order_field = (
+            self.datatable_order_fields[order_col]
+            if 0 <= order_col < len(self.datatable_order_fields)
+            else pk_field
+        )
+        return order_field, order_dir == 'desc'
+
+    @staticmethod
+    def _cursor_value(value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    def _keyset_q(self, order_field, descending, cursor):
+        """Filas posteriores al cursor para el orden (order_field, pk) con NULL al principio en asc."""
+        pk_field = self.model._meta.pk.name
+        op = 'lt' if descending else 'gt'
+        after_pk = Q(**{f'{pk_field}__{op}': cursor['pk']})
+        if order_field == pk_field:
+            return after_pk
+
+        value = cursor['value']
+        if value is None:
+            q = Q(**{f'{order_field}__isnull': True}) & after_pk
+            if not descending:
+                q |= Q(**{f'{order_field}__isnull': False})
+            return q
+
+        q = Q(**{f'{order_field}__{op}': value}) | (Q(**{order_field: value}) & after_pk)
+        if descending:
+            q |= Q(**{f'{order_field}__isnull': True})
+        return q
+
+    def get_keyset_page(self, request, qs, order_field, descending, start, length):
+        pk_field = self.model._meta.pk.name
+        order_field = order_field or pk_field
+        signature = self.get_datatable_signature(request)
+
+        if descending:
+            qs = qs.order_by(F(order_field).desc(nulls_last=True), f'-{pk_field}')
+        else:
+            qs = qs.order_by(F(order_field).asc(nulls_first=True), pk_field)
+        if order_field != pk_field:
+            qs = qs.annotate(datatable_cursor_value=F(order_field))
+
+        cursor = None
+        token = request.GET.get('cursor')
+        if token:
+            try:
+                cursor = signing.loads(token, salt=DATATABLE_CURSOR_SALT)
+            except signing.BadSignature:
+                cursor = None
+            if cursor and (cursor.get('sig') != signature or cursor.get('start') != start):
+                cursor = None
+
+        if cursor:
+            page = list(qs.filter(self._keyset_q(order_field, descending, cursor))[:length])
+        else:
+            page = list(qs[start:start + length])
+
+        next_cursor = None
+        if len(page) == length:
+            last = page[-1]
+            next_cursor = signing.dumps({
+                'sig': signature,
+                'start': start + length,
+                'pk': last.pk,
+                'value': self._cursor_value(getattr(last, 'datatable_cursor_value', last.pk)),
+            }, salt=DATATABLE_CURSOR_SALT)
+
+        return page, next_cursor
+
+    def prepare_page(self, objs):
+        """Hook para precargar en lote lo que render_row necesita de toda la página."""
+        pass
+
+    def get_datatable_response(self, request):
+        qs = self.get_base_queryset()
+
+        draw = int(request.GET.get('draw', 1))
+        start = int(request.GET.get('start', 0))
+        length = int(request.GET.get('length', 100))
+        search_value = request.GET.get('search[value]', '').strip()
+
+        qs = self.filter_queryset(qs, search_value)
+        records_total, records_filtered = self.get_datatable_counts(request, qs)
+
+        # Ordenamiento
+        order_field, descending = self.get_datatable_order(request)
+
+        next_cursor = None
+        if self.datatable_keyset and length > 0:
+            qs_page, next_cursor = self.get_keyset_page(request, qs, order_field, descending, start, length)
+        else:
+            if order_field:
+                qs = qs.order_by(f'-{order_field}' if descending else order_field)
+            qs_page = list(qs[start:start + length])
+
+        self.prepare_page(qs_page)
+
+        data = []
+        if self.datatable_compact_rows:
+            columns = self.datatable_columns
+            for obj in qs_page:
+                row = self.render_row(obj)
+                data.append([row.get(col, '') for col in columns] + [self.get_action_params(obj)])
+        else:
+            for obj in qs_page:
+                row = self.render_row(obj)
+                row['actions'] = self.get_actions(obj)
+                data.append(row)
+
+        response = {
+            'draw': draw,
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': data,
+        }
+        if self.datatable_compact_rows:
+            response['actions'] = self._get_cached_datatable_actions()
+        if next_cursor:
+            response['next_cursor'] = next_cursor
+            response['next_start'] = start + length
+        return JsonResponse(response)
+
+
+class DataTableMixin(DataTablePaginationMixin):
     datatable_columns = []  # e.g. ['ID', 'Nombre', 'Codigo']
     datatable_search_fields = []  # e.g. ['nombre__icontains', 'codigo__icontains']
     datatable_order_fields = []  # e.g. ['id', None, 'nombre', 'codigo']
@@ -62,67 +320,43 @@ class DataTableMixin:
             'Codigo': getattr(obj, 'codigo', ''),
         }
 
-    def get_actions(self, obj):
+    def get_datatable_actions(self):
         """
-        Devuelve el HTML de los botones de acciones, según permisos definidos en la clase hija.
+        Esquema de los botones de acciones según permisos definidos en la clase hija.
+        Las URLs son plantillas con '{pk}' (y '{rut}' para Paciente) resueltas una vez por proceso.
         """
-        user = self.request.user
         actions = []
 
         if self.url_detail:
-            # Check if url_detail is 'paciente_view_param' to use 'paciente_id' instead of 'pk'
-            detail_kwargs = {'pk': obj.pk}
-            if self.url_detail == 'paciente_view_param':
-                detail_kwargs = {'paciente_id': obj.pk}
-
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{self.url_detail}', kwargs=detail_kwargs)}"
-                   class="btn p-1 btn-sm btn-secondary view-btn" title="Ver detalle">
-                   <i class="fas fa-search"></i></a>
-            """)
+            actions.append(datatable_action(self.url_detail, 'btn-secondary view-btn', 'fa-search', 'Ver detalle'))
 
         url_update = self.get_url_update()
         if url_update:
-            # Check if url_update is 'paciente_view_param' to use 'paciente_id' instead of 'pk'
-            update_kwargs = {'pk': obj.pk}
-            if url_update == 'paciente_view_param':
-                update_kwargs = {'paciente_id': obj.pk}
-
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{url_update}', kwargs=update_kwargs)}"
-                   class="btn p-1 btn-sm btn-info" title="Editar">
-                   <i class="fas fa-edit"></i></a>
-            """)
+            actions.append(datatable_action(url_update, 'btn-info', 'fa-edit', 'Editar'))
 
         url_delete = self.get_url_delete()
         if url_delete:
-            delete_kwargs = {'pk': obj.pk}
-            if url_delete == 'paciente_view_param':
-                delete_kwargs = {'paciente_id': obj.pk}
-
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{url_delete}', kwargs=delete_kwargs)}"
-                   class="btn p-1 btn-sm btn-danger delete-btn" title="Eliminar">
-                   <i class="fas fa-trash"></i></a>
-            """)
+            actions.append(datatable_action(url_delete, 'btn-danger delete-btn', 'fa-trash', 'Eliminar'))
 
         # Si el modelo es Paciente, agregar el botón "Actualizar v2"
         if self.model.__name__ == 'Paciente':
-            rut_param = getattr(obj, 'rut', '') or ''
             try:
-                base_url = reverse('ficha_paciente_manage')
-                url_v2 = f"{base_url}?rut={rut_param}"
-                actions.append(f"""
-                    <a href="{url_v2}"
-                       class="btn p-1 btn-sm btn-success" title="Actualizar v2">
-                       <i class="fas fa-edit"></i></a>
-                """)
-            except:
+                actions.append({
+                    'url': f"{reverse('ficha_paciente_manage')}?rut={{rut}}",
+                    'css': 'btn-success',
+                    'icon': 'fa-edit',
+                    'title': 'Actualizar v2',
+                })
+            except NoReverseMatch:
                 pass
 
-        return ''.join(actions)
-
+        return actions
 
+    def get_action_params(self, obj):
+        params = {'pk': obj.pk}
+        if self.model.__name__ == 'Paciente':
+            params['rut'] = getattr(obj, 'rut', '') or ''
+        return params
 
     def filter_queryset(self, qs, search_value):
         """
@@ -131,58 +365,17 @@ class DataTableMixin:
         if search_value and self.datatable_search_fields:
             q = Q()
             for field in self.datatable_search_fields:
-                q |= Q(**{field: search_value})
+                rut_prefix = get_paciente_rut_prefix(self.model, field.replace('__icontains', ''))
+                if rut_prefix is not None:
+                    # RUT de paciente: búsqueda por prefijo sobre la columna indexada
+                    q |= get_paciente_rut_q_filter(search_value, rut_prefix)
+                else:
+                    q |= Q(**{field: search_value})
             qs = qs.filter(q)
         return qs
 
-    def get_datatable_response(self, request):
-        qs = self.get_base_queryset()
 
-        draw = int(request.GET.get('draw', 1))
-        start = int(request.GET.get('start', 0))
-        length = int(request.GET.get('length', 100))
-        search_value = request.GET.get('search[value]', '').strip()
-
-        qs = self.filter_queryset(qs, search_value)
-        records_total = self.get_base_queryset().count()
-        records_filtered = qs.count()
-
-        # Ordenamiento
-        try:
-            order_col = int(request.GET.get('order[0][column]', 0))
-        except (TypeError, ValueError):
-            order_col = 0
-        order_dir = request.GET.get('order[0][dir]', 'asc')
-
-        pk_field = self.model._meta.pk.name if self.model else 'id'
-
-        order_field = (
-            self.datatable_order_fields[order_col]
-            if 0 <= order_col < len(self.datatable_order_fields)
-            else pk_field
-        )
-        if order_field:
-            if order_dir == 'desc':
-                order_field = f'-{order_field}'
-            qs = qs.order_by(order_field)
-
-        qs_page = qs[start:start + length]
-
-        data = []
-        for obj in qs_page:
-            row = self.render_row(obj)
-            row['actions'] = self.get_actions(obj)
-            data.append(row)
-
-        return JsonResponse({
-            'draw': draw,
-            'recordsTotal': records_total,
-            'recordsFiltered': records_filtered,
-            'data': data,
-        })
-
-
-class DataTableMixinMov:
+class DataTableMixinMov(DataTablePaginationMixin):
     datatable_columns = []  # e.g. ['ID', 'Nombre', 'Codigo']
     datatable_search_fields = []  # e.g. ['nombre__icontains', 'codigo__icontains']
     datatable_order_fields = []  # e.g. ['id', None, 'nombre', 'codigo']
@@ -232,39 +425,20 @@ class DataTableMixinMov:
             'Codigo': getattr(obj, 'codigo', ''),
         }
 
-    def get_actions(self, obj):
+    def get_datatable_actions(self):
         """
-        Devuelve el HTML de los botones de acciones, según permisos definidos en la clase hija.
+        Esquema de los botones de acciones según permisos definidos en la clase hija.
         """
-        user = self.request.user
         actions = []
 
         if self.url_detail:
-            # Check if url_detail is 'paciente_view_param' to use 'paciente_id' instead of 'pk'
-            detail_kwargs = {'pk': obj.pk}
-            if self.url_detail == 'paciente_view_param':
-                detail_kwargs = {'paciente_id': obj.pk}
-
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{self.url_detail}', kwargs=detail_kwargs)}"
-                   class="btn p-1 btn-sm btn-secondary view-btn" title="Ver detalle">
-                   <i class="fas fa-search"></i></a>
-            """)
+            actions.append(datatable_action(self.url_detail, 'btn-secondary view-btn', 'fa-search', 'Ver detalle'))
 
         url_update = self.get_url_update()
         if url_update:
-            # Check if url_update is 'paciente_view_param' to use 'paciente_id' instead of 'pk'
-            update_kwargs = {'pk': obj.pk}
-            if url_update == 'paciente_view_param':
-                update_kwargs = {'paciente_id': obj.pk}
-
-            actions.append(f"""
-                <a href="{reverse_lazy(f'{url_update}', kwargs=update_kwargs)}"
-                   class="btn p-1 btn-sm btn-info" title="Editar">
-                   <i class="fas fa-edit"></i></a>
-            """)
+            actions.append(datatable_action(url_update, 'btn-info', 'fa-edit', 'Editar'))
 
-        return ''.join(actions)
+        return actions
 
     def filter_queryset(self, qs, search_value):
         """
@@ -275,7 +449,12 @@ class DataTableMixinMov:
             for field in self.datatable_search_fields:
                 if 'rut' in field.lower() and '__icontains' in field:
                     rut_field = field.replace('__icontains', '')
-                    q |= get_rut_q_filter(search_value, rut_field)
+                    rut_prefix = get_paciente_rut_prefix(self.model, rut_field)
+                    if rut_prefix is not None:
+                        # RUT de paciente: búsqueda por prefijo sobre la columna indexada
+                        q |= get_paciente_rut_q_filter(search_value, rut_prefix)
+                    else:
+                        q |= get_rut_q_filter(search_value, rut_field)
                 elif any(
                         name_part in field.lower() for name_part in
                         ['nombre', 'apellido_paterno', 'apellido_materno']):
@@ -306,49 +485,3 @@ class DataTableMixinMov:
 
             qs = qs.filter(q)
         return qs
-
-    def get_datatable_response(self, request):
-        qs = self.get_base_queryset()
-
-        draw = int(request.GET.get('draw', 1))
-        start = int(request.GET.get('start', 0))
-        length = int(request.GET.get('length', 100))
-        search_value = request.GET.get('search[value]', '').strip()
-
-        qs = self.filter_queryset(qs, search_value)
-        records_total = self.get_base_queryset().count()
-        records_filtered = qs.count()
-
-        # Ordenamiento
-        try:
-            order_col = int(request.GET.get('order[0][column]', 0))
-        except (TypeError, ValueError):
-            order_col = 0
-        order_dir = request.GET.get('order[0][dir]', 'asc')
-
-        pk_field = self.model._meta.pk.name if self.model else 'id'
-
-        order_field = (
-            self.datatable_order_fields[order_col]
-            if 0 <= order_col < len(self.datatable_order_fields)
-            else pk_field
-        )
-        if order_field:
-            if order_dir == 'desc':
-                order_field = f'-{order_field}'
-            qs = qs.order_by(order_field)
-
-        qs_page = qs[start:start + length]
-
-        data = []
-        for obj in qs_page:
-            row = self.render_row(obj)
-            row['actions'] = self.get_actions(obj)
-            data.append(row)
-
-        return JsonResponse({
-            'draw': draw,
-            'recordsTotal': records_total,
-            'recordsFiltered': records_filtered,
-            'data': data,
-        })
@@ -20,3 +20,96 @@ class StandardModel(models.Model):
     class Meta:
         abstract = True
         ordering = ['-updated_at']
+
+
+class CambioHistorico(models.Model):
+    """
+    Campos modificados de cada registro histórico (django-simple-history), calculados al guardar
+    para no comparar versiones consecutivas en cada lectura. Ver core.utils.history_diff.
+    """
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE,
+                                     verbose_name='Modelo')
+    history_id = models.CharField(max_length=36, verbose_name='ID Histórico')
+    object_id = models.CharField(max_length=64, verbose_name='ID Objeto')
+    history_date = models.DateTimeField(verbose_name='Fecha')
+    history_type = models.CharField(max_length=1, verbose_name='Acción')
+    # [[campo, valor anterior, valor nuevo], ...] en bruto (FKs como id); None si no hay versión anterior
+    cambios = models.JSONField(null=True, blank=True, verbose_name='Cambios')
+
+    def __str__(self):
+        return f'{self.content_type_id} - {self.history_id}'
+
+    class Meta:
+        verbose_name = 'Cambio Histórico'
+        verbose_name_plural = 'Cambios Históricos'
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'history_id'], name='cambio_historico_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'history_date'], name='cambio_historico_fecha_idx'),
+        ]
+
+
+class Contador(models.Model):
+    """
+    Conteo mantenido por señales (ver core.contadores) para no ejecutar COUNT(*) en cada lectura.
+    ``establecimiento_id`` = 0 para los contadores globales.
+    """
+    nombre = models.CharField(max_length=50, verbose_name='Nombre')
+    establecimiento_id = models.PositiveIntegerField(default=0, verbose_name='Establecimiento')
+    valor = models.BigIntegerField(default=0, verbose_name='Valor')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    def __str__(self):
+        return f'{self.nombre} ({self.establecimiento_id}): {self.valor}'
+
+    class Meta:
+        verbose_name = 'Contador'
+        verbose_name_plural = 'Contadores'
+        constraints = [
+            models.UniqueConstraint(fields=['nombre', 'establecimiento_id'], name='contador_unico'),
+        ]
+
+
+class Secuencia(models.Model):
+    """
+    Secuencia con nombre para numerar registros antes del INSERT (ver core.secuencias).
+    Las reservas son un UPDATE atómico sobre esta fila y pueden pedir bloques de N valores.
+    """
+    nombre = models.CharField(max_length=50, unique=True, verbose_name='Nombre')
+    ultimo_valor = models.BigIntegerField(default=0, verbose_name='Último Valor')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    def __str__(self):
+        return f'{self.nombre}: {self.ultimo_valor}'
+
+    class Meta:
+        verbose_name = 'Secuencia'
+        verbose_name_plural = 'Secuencias'
+
+
+class ProgresoImportacion(models.Model):
+    """
+    Punto de control de una importación por bloques (core.utils.importacion): cuántas filas del archivo
+    quedaron confirmadas, para retomar desde ahí si el comando se interrumpe. El archivo se identifica
+    por su contenido (``firma``), no por su ruta.
+    """
+    comando = models.CharField(max_length=100, verbose_name='Comando')
+    archivo = models.CharField(max_length=255, verbose_name='Archivo')
+    firma = models.CharField(max_length=40, verbose_name='Firma del Archivo')
+    filas_procesadas = models.BigIntegerField(default=0, verbose_name='Filas Procesadas')
+    completada = models.BooleanField(default=False, verbose_name='Completada')
+    # Estado propio del comando que debe sobrevivir a una reanudación (ej: último ID antes de importar)
+    datos = models.JSONField(default=dict, blank=True, verbose_name='Datos')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Inicio')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    def __str__(self):
+        return f'{self.comando} - {self.archivo}: {self.filas_procesadas}'
+
+    class Meta:
+        verbose_name = 'Progreso de Importación'
+        verbose_name_plural = 'Progresos de Importación'
+        constraints = [
+            models.UniqueConstraint(fields=['comando', 'firma'], name='progreso_importacion_unico'),
+        ]
@@ -0,0 +1,39 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.models import Secuencia
+
+# =========================================================
+# SECUENCIAS
+# =========================================================
+# Numeración previa al INSERT: reservar es un UPDATE ultimo_valor = ultimo_valor + N sobre la fila de
+# la secuencia, que solo queda bloqueada mientras dura la transacción que reserva. La fila se crea la
+# primera vez con el valor que devuelve ``inicial()`` (por ejemplo, el mayor código ya usado).
+
+
+def _crear(nombre, inicial):
+    valor_inicial = inicial() if inicial else 0
+    try:
+        with transaction.atomic():
+            Secuencia.objects.create(nombre=nombre, ultimo_valor=valor_inicial or 0)
+    except IntegrityError:
+        # Otra petición la creó entre el UPDATE y este INSERT
+        pass
+
+
+def reservar(nombre, cantidad=1, inicial=None):
+    """
+    Reserva ``cantidad`` valores consecutivos de la secuencia y los devuelve como range.
+    Si la transacción que llama se revierte, la reserva también.
+    """
+    if cantidad < 1:
+        raise ValueError('La cantidad de valores a reservar debe ser mayor que 0')
+
+    secuencia = Secuencia.objects.filter(nombre=nombre)
+    with transaction.atomic():
+        if not secuencia.update(ultimo_valor=F('ultimo_valor') + cantidad):
+            _crear(nombre, inicial)
+            secuencia.update(ultimo_valor=F('ultimo_valor') + cantidad)
+        ultimo = secuencia.values_list('ultimo_valor', flat=True).get()
+
+    return range(ultimo - cantidad + 1, ultimo + 1)
@@ -0,0 +1,81 @@
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+from simple_history.signals import post_create_historical_record
+
+from core import contadores
+from core.dashboard import invalidate_widgets_for
+from core.utils.catalogos import es_catalogo, invalidar_catalogo
+from core.utils.count_cache import invalidate_model_counts, is_counted_model
+from core.utils.history_diff import store_change_sets
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_counts_on_change(sender, **kwargs):
+    # Solo los modelos de listados, widgets o catálogos escriben en la caché; el resto no hace nada
+    if is_counted_model(sender):
+        invalidate_model_counts(sender)
+    invalidate_widgets_for(sender, kwargs['instance'])
+    if es_catalogo(sender):
+        invalidar_catalogo(sender)
+
+
+@receiver(post_create_historical_record)
+def store_history_change_set(sender, instance, history_instance, **kwargs):
+    """Guarda los campos modificados del nuevo registro histórico (ver CambioHistorico)."""
+    previous = {}
+    if history_instance.history_type != '+':
+        previous = {history_instance.history_id: history_instance.prev_record}
+    store_change_sets(history_instance.instance_type, [history_instance], previous)
+
+
+# ==============================================================
+# CONTADORES (core.contadores)
+# ==============================================================
+
+@receiver(pre_save, sender='personas.Paciente')
+@receiver(pre_delete, sender='personas.Paciente')
+def paciente_status_previo(sender, instance, **kwargs):
+    instance._status_previo = contadores.estado_paciente(instance.pk)
+
+
+@receiver(post_save, sender='personas.Paciente')
+def actualizar_contadores_paciente(sender, instance, **kwargs):
+    activo_antes = bool(getattr(instance, '_status_previo', None))
+    if bool(instance.status) != activo_antes:
+        contadores.aplicar(contadores.deltas_cambio_status_paciente(instance.pk, bool(instance.status)))
+
+
+@receiver(post_delete, sender='personas.Paciente')
+def descontar_paciente(sender, instance, **kwargs):
+    if getattr(instance, '_status_previo', None):
+        contadores.aplicar({(contadores.PACIENTES_ACTIVOS, contadores.GLOBAL): -1})
+
+
+@receiver(pre_save, sender='clinica.Ficha')
+@receiver(pre_delete, sender='clinica.Ficha')
+def ficha_estado_previo(sender, instance, **kwargs):
+    instance._estado_previo = contadores.estado_ficha(instance.pk)
+
+
+@receiver(post_save, sender='clinica.Ficha')
+@receiver(post_delete, sender='clinica.Ficha')
+def actualizar_contadores_ficha(sender, instance, **kwargs):
+    previo = getattr(instance, '_estado_previo', None)
+    antes = contadores.aporte_ficha(previo[0], previo[2]) if previo else None
+
+    despues = None
+    if kwargs['signal'] is post_save:
+        if previo and previo[1] == instance.paciente_id:
+            paciente_activo = previo[2]
+        else:
+            paciente_activo = contadores.estado_paciente(instance.paciente_id)
+        despues = contadores.aporte_ficha(instance.establecimiento_id, paciente_activo)
+
+    if antes != despues:
+        deltas = {}
+        if antes:
+            deltas[antes] = -1
+        if despues:
+            deltas[despues] = deltas.get(despues, 0) + 1
+        contadores.aplicar(deltas)
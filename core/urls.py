@@ -8,6 +8,7 @@ urlpatterns = [
     path('dashboard/metrics/', views.dashboard_metrics_view, name='dashboard_metrics'),
     path('dashboard/pacientes-recientes/', views.dashboard_pacientes_recientes_view,
          name='dashboard_pacientes_recientes'),
+    path('dashboard/cambios-recientes/', views.dashboard_cambios_recientes_view, name='dashboard_cambios_recientes'),
     path('no-posee-establecimiento/', views.no_establecimiento, name='no_establecimiento'),
     path('contacto/', ContactoView.as_view(), name='contacto'),
 ]
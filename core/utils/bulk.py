@@ -0,0 +1,15 @@
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    bulk_create(update_conflicts=True) portable: MySQL no acepta ``unique_fields`` (su
+    ON DUPLICATE KEY UPDATE usa cualquier índice único), mientras SQLite y PostgreSQL lo exigen.
+    """
+    connection = connections[router.db_for_write(model)]
+    kwargs = {}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+    return model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, update_fields=update_fields, **kwargs
+    )
@@ -0,0 +1,221 @@
+import time
+
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.forms.models import ModelChoiceIterator
+
+from core.utils.versiones import leer_version, subir_version
+
+# =========================================================
+# CATÁLOGOS EN MEMORIA
+# =========================================================
+# Las tablas chicas de catálogo (comunas, previsiones, géneros, servicios clínicos, profesionales y
+# sectores) se cargan completas en un diccionario {pk: objeto} por proceso. Cada catálogo tiene una
+# versión en la caché compartida (settings.CACHES) que se incrementa al confirmar los cambios de las
+# señales post_save / post_delete; cada proceso la revisa cada CATALOGOS_REVISION_SEGUNDOS y recarga su
+# copia si cambió. Las rutas bulk no emiten señales: las cubre CATALOGOS_CACHE_TIMEOUT. Un pk que no
+# está en la copia (creado recién en otro proceso) se busca en la base de datos, y los formularios
+# validan contra su queryset. Los objetos se comparten entre peticiones y no deben modificarse.
+
+CATALOGO_VERSION_PREFIX = 'catalogo_version'
+
+# Modelo (label_lower) → relaciones que necesita su __str__ (se cargan con select_related)
+CATALOGOS = {
+    'geografia.comuna': (),
+    'personas.prevision': (),
+    'personas.genero': (),
+    'establecimientos.servicioclinico': (),
+    'personas.profesional': (),
+    'establecimientos.sector': ('color',),
+}
+
+
+class _Copia:
+    def __init__(self, version, objetos):
+        self.version = version
+        self.objetos = objetos
+        self.cargada = self.revisada = time.monotonic()
+
+
+_copias = {}
+
+
+def _label(modelo):
+    if isinstance(modelo, str):
+        return apps.get_model(modelo)._meta.label_lower
+    return modelo._meta.label_lower
+
+
+def _version_key(label):
+    return f'{CATALOGO_VERSION_PREFIX}:{label}'
+
+
+def es_catalogo(modelo):
+    return _label(modelo) in CATALOGOS
+
+
+def catalogo(modelo):
+    """{pk: objeto} del catálogo, en el orden del modelo (Meta.ordering). Acepta la clase o 'app.Modelo'."""
+    label = _label(modelo)
+    ahora = time.monotonic()
+    copia = _copias.get(label)
+    if copia is not None and ahora - copia.cargada < settings.CATALOGOS_CACHE_TIMEOUT:
+        if ahora - copia.revisada < settings.CATALOGOS_REVISION_SEGUNDOS:
+            return copia.objetos
+        if leer_version(_version_key(label)) == copia.version:
+            copia.revisada = ahora
+            return copia.objetos
+
+    # La versión se lee antes de cargar: un cambio durante la carga deja la copia desactualizada
+    # con la versión anterior y se recarga en la siguiente revisión
+    version = leer_version(_version_key(label))
+    model = apps.get_model(label)
+    objetos = {obj.pk: obj for obj in model._default_manager.select_related(*CATALOGOS[label])}
+    _copias[label] = _Copia(version, objetos)
+    return objetos
+
+
+def _cumple(obj, filtros):
+    return all(getattr(obj, campo) == valor for campo, valor in filtros.items())
+
+
+def obtener(modelo, pk):
+    """
+    Objeto del catálogo por pk (None si no existe o ``pk`` es None). Si la copia no lo tiene se busca en la
+    base de datos y la copia se descarta, para recargarla en el siguiente acceso.
+    """
+    if pk is None:
+        return None
+    obj = catalogo(modelo).get(pk)
+    if obj is None:
+        label = _label(modelo)
+        obj = apps.get_model(label)._default_manager.select_related(*CATALOGOS[label]).filter(pk=pk).first()
+        if obj is not None:
+            _copias.pop(label, None)
+    return obj
+
+
+def filtrar(modelo, **filtros):
+    """
+    Objetos del catálogo cuyos atributos son iguales a ``filtros``. Usar nombres de columna para las FK
+    (``establecimiento_id=3``), así la comparación no consulta la base de datos.
+    """
+    return [obj for obj in catalogo(modelo).values() if _cumple(obj, filtros)]
+
+
+def buscar(modelo, **filtros):
+    """Primer objeto del catálogo que cumple ``filtros`` (None si no hay)."""
+    return next((obj for obj in catalogo(modelo).values() if _cumple(obj, filtros)), None)
+
+
+class Etiquetas(dict):
+    """{pk: valor} de un catálogo; los pk que faltan en la copia se resuelven con ``obtener``."""
+
+    def __init__(self, modelo, campo, vacio=None):
+        self.modelo = modelo
+        self.campo = campo
+        self.vacio = vacio
+        super().__init__((pk, self._valor(obj)) for pk, obj in catalogo(modelo).items())
+
+    def _valor(self, obj):
+        valor = getattr(obj, self.campo)
+        return self.vacio if valor is None else valor
+
+    def __missing__(self, pk):
+        obj = obtener(self.modelo, pk)
+        if obj is None:
+            raise KeyError(pk)
+        self[pk] = valor = self._valor(obj)
+        return valor
+
+    def __contains__(self, pk):
+        if dict.__contains__(self, pk):
+            return True
+        try:
+            self[pk]
+        except KeyError:
+            return False
+        return True
+
+
+def etiquetas(modelo, campo, vacio=None):
+    """
+    {pk: valor de ``campo``} del catálogo (ej: nombres de comunas para una exportación); ``vacio``
+    reemplaza los valores None.
+    """
+    return Etiquetas(modelo, campo, vacio)
+
+
+def resolver(objetos, *campos):
+    """
+    Deja en la caché de FKs de cada objeto el relacionado del catálogo: después ``paciente.comuna`` no
+    consulta. ``campos`` son nombres de FK hacia modelos de catálogo; los ya cargados (select_related o
+    asignados) se dejan como están.
+    """
+    for campo in campos:
+        field = None
+        for obj in objetos:
+            field = field or obj._meta.get_field(campo)
+            if not field.is_cached(obj):
+                field.set_cached_value(obj, obtener(field.related_model, getattr(obj, field.attname)))
+    return objetos
+
+
+def _nueva_version(label):
+    _copias.pop(label, None)
+    subir_version(_version_key(label))
+
+
+def invalidar_catalogo(modelo):
+    """
+    Descarta la copia del proceso y avisa a los demás procesos (se llama desde las señales). Se hace al
+    confirmar la transacción: una recarga concurrente no puede guardar las filas anteriores con la
+    versión nueva.
+    """
+    label = _label(modelo)
+    transaction.on_commit(lambda: _nueva_version(label))
+
+
+# =========================================================
+# FORMULARIOS
+# =========================================================
+
+class _CatalogoIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.objetos():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objetos()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.objetos())
+
+
+class CatalogoChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField cuyas opciones salen del catálogo en memoria, sin consultas. ``filtros`` se comparan
+    con los atributos de cada objeto (ver ``filtrar``); ``limitar()`` los reemplaza. El valor enviado se
+    valida contra el queryset, como en ModelChoiceField: un registro recién creado o desactivado en otro
+    proceso se acepta o rechaza según la base de datos.
+    """
+
+    iterator = _CatalogoIterator
+
+    def __init__(self, modelo, filtros=None, **kwargs):
+        self.modelo = modelo
+        self.filtros = dict(filtros or {})
+        kwargs['queryset'] = modelo._default_manager.filter(**self.filtros)
+        super().__init__(**kwargs)
+
+    def limitar(self, **filtros):
+        self.filtros = filtros
+        # El queryset no se evalúa al mostrar; solo se usa para validar el valor enviado
+        self.queryset = self.modelo._default_manager.filter(**filtros)
+
+    def objetos(self):
+        return filtrar(self.modelo, **self.filtros)
@@ -0,0 +1,243 @@
+import base64
+import functools
+import hashlib
+import itertools
+import os
+import tempfile
+from html import escape
+from pathlib import Path
+
+import barcode
+from django.conf import settings
+from reportlab.graphics.shapes import Drawing, Rect
+from reportlab.lib import colors
+
+# =========================================================
+# CÓDIGOS DE BARRAS
+# =========================================================
+# El código de un paciente no cambia entre impresiones: se codifica una vez y el resultado se reutiliza
+# desde una caché LRU en memoria y, entre procesos y reinicios, desde BARCODE_CACHE_DIR (acotado a
+# BARCODE_CACHE_DIR_MAX_FILES archivos: se borran los más antiguos). La salida es
+# vectorial: SVG liviano para las plantillas HTML (un solo <path>, sin PIL ni PNG) y un Drawing de
+# reportlab para los PDF generados con canvas.
+
+# Cambiar al modificar el SVG generado: invalida lo guardado en disco
+VERSION_SVG = 1
+
+# Misma resolución que ImageWriter: el SVG conserva el tamaño en pantalla que tenía el PNG
+DPI = 300
+
+# Cada cuántas escrituras en disco el proceso revisa el tamaño del directorio (y en la primera)
+PODA_CADA = 100
+_escrituras = itertools.count(1)
+
+# Márgenes por defecto de python-barcode (mm)
+MARGEN_VERTICAL = 1.0
+
+OPCIONES_BASE = {
+    'module_width': 0.2,
+    'module_height': 15.0,
+    'quiet_zone': 6.5,
+    'font_size': 10,
+    'text_distance': 5.0,
+    'write_text': True,
+}
+
+
+def _mm2px(mm):
+    return int(mm * DPI / 25.4)
+
+
+def _pt2mm(pt):
+    return pt * 0.352777
+
+
+def _num(valor):
+    """Número corto para el SVG (sin ceros sobrantes)."""
+    return f'{valor:.3f}'.rstrip('0').rstrip('.')
+
+
+@functools.lru_cache(maxsize=4096)
+def barras(valor, simbologia='code128'):
+    """
+    Barras del código como tuplas (inicio, ancho) en módulos, y el total de módulos. La codificación
+    es la de python-barcode (la misma que usaba ImageWriter).
+    """
+    patron = barcode.get(simbologia, valor).build()[0]
+
+    tramos = []
+    inicio = None
+    for posicion, modulo in enumerate(patron):
+        if modulo == '1' and inicio is None:
+            inicio = posicion
+        elif modulo != '1' and inicio is not None:
+            tramos.append((inicio, posicion - inicio))
+            inicio = None
+    if inicio is not None:
+        tramos.append((inicio, len(patron) - inicio))
+    return tuple(tramos), len(patron)
+
+
+# ==================== SVG (plantillas HTML) ====================
+
+def _generar_svg(valor, simbologia, opciones):
+    ancho_modulo = opciones['module_width']
+    alto = opciones['module_height']
+    zona = opciones['quiet_zone']
+    tramos, modulos = barras(valor, simbologia)
+
+    texto = opciones['write_text'] and opciones['font_size']
+    ancho_mm = 2 * zona + modulos * ancho_modulo
+    alto_mm = 2 * MARGEN_VERTICAL + alto
+    if texto:
+        alto_mm += _pt2mm(opciones['font_size']) / 2 + opciones['text_distance']
+
+    trazo = ''.join(
+        f'M{_num(zona + inicio * ancho_modulo)} {_num(MARGEN_VERTICAL)}'
+        f'h{_num(ancho * ancho_modulo)}v{_num(alto)}h-{_num(ancho * ancho_modulo)}z'
+        for inicio, ancho in tramos
+    )
+
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_mm2px(ancho_mm)}" height="{_mm2px(alto_mm)}" '
+        f'viewBox="0 0 {_num(ancho_mm)} {_num(alto_mm)}" preserveAspectRatio="none" shape-rendering="crispEdges">',
+        '<rect width="100%" height="100%" fill="#fff"/>',
+        f'<path d="{trazo}" fill="#000"/>',
+    ]
+    if texto:
+        tamano = _pt2mm(opciones['font_size'])
+        y = MARGEN_VERTICAL + alto + opciones['text_distance'] + tamano / 2
+        partes.append(
+            f'<text x="{_num(ancho_mm / 2)}" y="{_num(y)}" font-family="DejaVu Sans Mono, monospace" '
+            f'font-size="{_num(tamano)}" text-anchor="middle">{escape(valor)}</text>'
+        )
+    partes.append('</svg>')
+    return ''.join(partes)
+
+
+def _ruta_en_disco(clave):
+    directorio = settings.BARCODE_CACHE_DIR
+    if not directorio:
+        return None
+    return Path(directorio) / f'{hashlib.sha1(repr(clave).encode()).hexdigest()}.svg'
+
+
+def _leer_de_disco(ruta):
+    try:
+        return ruta.read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+
+def _guardar_en_disco(ruta, svg):
+    """Escritura atómica (archivo temporal + rename): otro proceso nunca lee un SVG a medias."""
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+            archivo.write(svg)
+        os.replace(temporal, ruta)
+    except OSError:
+        # Sin disco disponible el código se sigue sirviendo desde la caché en memoria
+        return
+
+    escritura = next(_escrituras)
+    if escritura == 1 or escritura % PODA_CADA == 0:
+        _podar_disco(ruta.parent)
+
+
+def _podar_disco(directorio):
+    """
+    Deja el directorio con a lo más BARCODE_CACHE_DIR_MAX_FILES SVG borrando los escritos hace más tiempo.
+    Se borra un 10% adicional para no volver a podar en cada revisión.
+    """
+    maximo = settings.BARCODE_CACHE_DIR_MAX_FILES
+    archivos = []
+    try:
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.svg'):
+                    try:
+                        archivos.append((entrada.stat().st_mtime, entrada.path))
+                    except OSError:
+                        # Borrado por otro proceso mientras se recorría
+                        pass
+    except OSError:
+        return
+
+    if len(archivos) <= maximo:
+        return
+    archivos.sort()
+    for _, ruta in archivos[:len(archivos) - maximo + maximo // 10]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=settings.BARCODE_CACHE_SIZE)
+def _svg_en_cache(valor, simbologia, opciones):
+    clave = (VERSION_SVG, valor, simbologia, opciones)
+    ruta = _ruta_en_disco(clave)
+
+    svg = _leer_de_disco(ruta) if ruta else None
+    if svg is None:
+        svg = _generar_svg(valor, simbologia, dict(opciones))
+        if ruta:
+            _guardar_en_disco(ruta, svg)
+    return svg
+
+
+@functools.lru_cache(maxsize=settings.BARCODE_CACHE_SIZE)
+def _data_uri_en_cache(valor, simbologia, opciones):
+    svg = _svg_en_cache(valor, simbologia, opciones)
+    return f"data:image/svg+xml;base64,{base64.b64encode(svg.encode('utf-8')).decode('ascii')}"
+
+
+def _clave_opciones(opciones):
+    # Opciones desconocidas para el writer (ej: 'margin') se ignoran, igual que en python-barcode
+    opciones = {**OPCIONES_BASE, **{k: v for k, v in opciones.items() if k in OPCIONES_BASE}}
+    return tuple(sorted(opciones.items()))
+
+
+def barcode_svg(valor, simbologia='code128', **opciones):
+    """SVG del código (opciones con los mismos nombres que los writers de python-barcode)."""
+    return _svg_en_cache(str(valor), simbologia, _clave_opciones(opciones))
+
+
+def barcode_data_uri(valor, simbologia='code128', **opciones):
+    """SVG del código como data URI, listo para el ``src`` de un <img>."""
+    return _data_uri_en_cache(str(valor), simbologia, _clave_opciones(opciones))
+
+
+# ==================== REPORTLAB (PDF con canvas) ====================
+
+@functools.lru_cache(maxsize=settings.BARCODE_CACHE_SIZE)
+def barcode_drawing(valor, alto, ancho_barra=1.0, simbologia='code128'):
+    """
+    Drawing de reportlab con las barras del código (sin zonas de silencio), en puntos. Se puede dibujar
+    las veces que se necesite con ``renderPDF.draw(drawing, canvas, x, y)``; su ancho es ``drawing.width``.
+    """
+    tramos, modulos = barras(str(valor), simbologia)
+    drawing = Drawing(modulos * ancho_barra, alto)
+    for inicio, ancho in tramos:
+        drawing.add(Rect(inicio * ancho_barra, 0, ancho * ancho_barra, alto,
+                         fillColor=colors.black, strokeColor=None, strokeWidth=0))
+    return drawing
+
+
+def ancho_barcode(valor, ancho_barra=1.0, simbologia='code128'):
+    """Ancho en puntos de las barras del código (el mismo que ``barcode_drawing(...).width``)."""
+    return barras(str(valor), simbologia)[1] * ancho_barra
+
+
+def dibujar_barcode(c, valor, x, y, alto, ancho_barra=1.0, simbologia='code128'):
+    """
+    Dibuja las barras directamente en el canvas como un único trazado relleno, sin pasar por un Drawing
+    (para páginas que dibujan cada código una sola vez, como la carátula).
+    """
+    tramos, _ = barras(str(valor), simbologia)
+    trazado = c.beginPath()
+    for inicio, ancho in tramos:
+        trazado.rect(x + inicio * ancho_barra, y, ancho * ancho_barra, alto)
+    c.drawPath(trazado, stroke=0, fill=1)
@@ -0,0 +1,144 @@
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from core.utils.versiones import leer_versiones, subir_version
+
+COUNT_VERSION_PREFIX = 'count_version'
+COUNT_CACHE_PREFIX = 'count_cache'
+
+# Modelos de los listados DataTables (core.mixin). Solo sus cambios invalidan conteos: sesiones, contadores,
+# secuencias y demás tablas internas no escriben en la caché en cada guardado. Un conteo que use otra tabla
+# (ej: un join de búsqueda) se actualiza al vencer DATATABLE_COUNT_CACHE_TIMEOUT.
+COUNTED_MODELS = {
+    'geografia.comuna', 'geografia.pais',
+    'establecimientos.color', 'establecimientos.establecimiento', 'establecimientos.sector',
+    'establecimientos.servicioclinico',
+    'personas.genero', 'personas.paciente', 'personas.prevision', 'personas.profesion', 'personas.profesional',
+    'clinica.ficha', 'clinica.movimientoficha',
+    'respaldos.respaldoficha', 'respaldos.respaldomovimientomonologocontrolado', 'respaldos.respaldopaciente',
+    'users.role', 'users.user',
+}
+# Modelos con vista de historial (core.history.GenericHistoryListView): se cuenta su modelo histórico
+COUNTED_MODELS |= {
+    f'{app_label}.historical{model_name}'
+    for app_label, model_name in (label.split('.') for label in (
+        'geografia.comuna', 'geografia.pais',
+        'establecimientos.color', 'establecimientos.establecimiento', 'establecimientos.sector',
+        'establecimientos.servicioclinico',
+        'personas.genero', 'personas.paciente', 'personas.prevision', 'personas.profesion',
+        'personas.profesional',
+        'clinica.ficha',
+    ))
+}
+
+_models_by_table = None
+
+
+def _get_models_by_table():
+    global _models_by_table
+    if _models_by_table is None:
+        _models_by_table = {model._meta.db_table: model for model in apps.get_models()}
+    return _models_by_table
+
+
+def _version_key(model):
+    return f'{COUNT_VERSION_PREFIX}:{model._meta.label_lower}'
+
+
+def is_counted_model(model):
+    return model._meta.label_lower in COUNTED_MODELS
+
+
+def invalidate_model_counts(model):
+    """
+    Invalida todos los conteos cacheados que involucran la tabla del modelo (se llama desde
+    las señales post_save / post_delete). Las rutas bulk no emiten señales: las cubre el TTL.
+    """
+    subir_version(_version_key(model))
+
+
+def _get_versions(qs):
+    """Versión de cada tabla que participa en la consulta (modelo base y joins)."""
+    tables = {qs.model._meta.db_table}
+    tables.update(join.table_name for join in qs.query.alias_map.values())
+
+    models_by_table = _get_models_by_table()
+    models = sorted(
+        (models_by_table[table] for table in tables if table in models_by_table),
+        key=lambda m: m._meta.label_lower,
+    )
+    keys = [_version_key(model) for model in models]
+    versions = leer_versiones(keys)
+    return [(key, versions[key]) for key in keys]
+
+
+def _is_unfiltered(qs):
+    query = qs.query
+    return not query.where and not query.distinct and query.low_mark == 0 and query.high_mark is None
+
+
+def estimate_table_count(model, using='default'):
+    """
+    Cantidad aproximada de filas según las estadísticas de la base de datos (sin recorrer la tabla).
+    Devuelve None si el motor no lo soporta.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def cached_count(qs, establecimiento_id=None, timeout=None, allow_estimate=True):
+    """
+    COUNT(*) cacheado por modelo, establecimiento y firma de la consulta (SQL + parámetros).
+    Se invalida cuando cambia cualquier tabla de la consulta. Para consultas sin filtros sobre
+    tablas más grandes que settings.DATATABLE_COUNT_ESTIMATE_THRESHOLD usa la estimación del motor.
+    """
+    if timeout is None:
+        timeout = settings.DATATABLE_COUNT_CACHE_TIMEOUT
+
+    qs = qs.order_by()
+    # .none() o filtros imposibles (pk__in=[]) no generan SQL: el conteo es 0 sin consultar
+    if qs.query.is_empty():
+        return 0
+    try:
+        sql, params = qs.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    signature = hashlib.sha1(repr((sql, params, _get_versions(qs))).encode()).hexdigest()
+    key = f'{COUNT_CACHE_PREFIX}:{qs.model._meta.label_lower}:{establecimiento_id}:{signature}'
+
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    count = None
+    if allow_estimate and _is_unfiltered(qs):
+        estimate = estimate_table_count(qs.model, using=qs.db)
+        if estimate is not None and estimate >= settings.DATATABLE_COUNT_ESTIMATE_THRESHOLD:
+            count = estimate
+    if count is None:
+        count = qs.count()
+
+    cache.set(key, count, timeout)
+    return count
@@ -0,0 +1,226 @@
+import functools
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import OuterRef, Subquery
+
+# Valor que se muestra para campos vacíos
+EMPTY_DISPLAY = '—'
+
+
+@functools.lru_cache(maxsize=None)
+def history_field_meta(base_model):
+    """
+    Metadatos de presentación por campo del modelo base, calculados una vez por clase:
+    {nombre: (etiqueta, tipo, mapa de choices, modelo relacionado)}.
+    tipo ∈ {'bool', 'choice', 'fk', 'value'}
+    """
+    meta = {}
+    for field in base_model._meta.concrete_fields:
+        label = str(field.verbose_name).capitalize()
+        if isinstance(field, models.BooleanField):
+            meta[field.name] = (label, 'bool', None, None)
+        elif field.choices:
+            meta[field.name] = (label, 'choice', dict(field.flatchoices), None)
+        elif isinstance(field, (models.ForeignKey, models.OneToOneField)):
+            meta[field.name] = (label, 'fk', None, field.remote_field.model)
+        else:
+            meta[field.name] = (label, 'value', None, None)
+    return meta
+
+
+def field_label(base_model, field_name):
+    info = history_field_meta(base_model).get(field_name)
+    return info[0] if info else field_name.replace('_', ' ').capitalize()
+
+
+@functools.lru_cache(maxsize=None)
+def _tracked_fields(history_model):
+    """(nombre, attname) de los campos versionados y editables (los mismos que compara diff_against)."""
+    return tuple((f.name, f.attname) for f in history_model.tracked_fields if f.editable)
+
+
+def previous_records(base_model, records):
+    """
+    Versión anterior de cada registro histórico de la página, en dos consultas en total
+    (auto-join para el id anterior + in_bulk), equivalente a ``prev_record`` por fila.
+    Devuelve {history_id: registro anterior}.
+    """
+    if not records:
+        return {}
+
+    history_model = base_model.history.model
+    object_field = base_model._meta.pk.attname
+
+    previous_id = history_model.objects.filter(
+        **{object_field: OuterRef(object_field)},
+        history_date__lt=OuterRef('history_date'),
+    ).order_by('-history_date').values('history_id')[:1]
+
+    pairs = dict(
+        history_model.objects.filter(history_id__in=[r.history_id for r in records])
+        .annotate(previous_history_id=Subquery(previous_id))
+        .values_list('history_id', 'previous_history_id')
+    )
+    previous = history_model.objects.in_bulk([pk for pk in pairs.values() if pk is not None])
+    return {history_id: previous.get(prev_id) for history_id, prev_id in pairs.items() if prev_id is not None}
+
+
+def record_changes(record, previous, exclude_fields=()):
+    """Cambios en bruto [(campo, valor anterior, valor nuevo)] entre dos versiones, sin consultas."""
+    changes = []
+    for name, attname in _tracked_fields(type(record)):
+        if name in exclude_fields:
+            continue
+        old = getattr(previous, attname)
+        new = getattr(record, attname)
+        if old != new:
+            changes.append((name, old, new))
+    # Mismo orden que diff_against (por nombre de campo)
+    changes.sort(key=lambda change: change[0])
+    return changes
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def change_set(record, previous):
+    """Cambios serializables para CambioHistorico (None si la modificación no tiene versión anterior)."""
+    if record.history_type == '+':
+        return []
+    if previous is None:
+        return None
+    return [[name, _json_value(old), _json_value(new)] for name, old, new in record_changes(record, previous)]
+
+
+def store_change_sets(base_model, records, previous=None):
+    """
+    Guarda el CambioHistorico de cada registro. ``previous`` ({history_id: anterior}) se calcula
+    en lote si no se entrega. Los registros ya guardados se ignoran.
+    """
+    from core.models import CambioHistorico
+
+    if previous is None:
+        previous = previous_records(base_model, [r for r in records if r.history_type != '+'])
+
+    content_type = ContentType.objects.get_for_model(base_model)
+    object_field = base_model._meta.pk.attname
+    CambioHistorico.objects.bulk_create([
+        CambioHistorico(
+            content_type=content_type,
+            history_id=str(record.history_id),
+            object_id=str(getattr(record, object_field)),
+            history_date=record.history_date,
+            history_type=record.history_type,
+            cambios=change_set(record, previous.get(record.history_id)),
+        )
+        for record in records
+    ], ignore_conflicts=True)
+
+
+def stored_changes(base_model, records):
+    """
+    Cambios precalculados de los registros (una consulta por índice único).
+    Devuelve {history_id: [(campo, anterior, nuevo)] o None}; los registros sin CambioHistorico no aparecen.
+    """
+    from core.models import CambioHistorico
+
+    if not records:
+        return {}
+
+    by_key = {str(r.history_id): r.history_id for r in records}
+    rows = CambioHistorico.objects.filter(
+        content_type=ContentType.objects.get_for_model(base_model),
+        history_id__in=list(by_key),
+    ).values_list('history_id', 'cambios')
+    return {
+        by_key[history_id]: None if cambios is None else [tuple(change) for change in cambios]
+        for history_id, cambios in rows
+    }
+
+
+def resolve_fk_labels(base_model, changes_list):
+    """
+    Etiquetas de todas las FKs mencionadas en los cambios, con un ``in_bulk`` por modelo relacionado.
+    Devuelve {modelo relacionado: {pk: etiqueta}}.
+    """
+    meta = history_field_meta(base_model)
+    ids_by_model = {}
+    for changes in changes_list:
+        for name, old, new in changes:
+            info = meta.get(name)
+            if info and info[1] == 'fk':
+                ids = ids_by_model.setdefault(info[3], set())
+                ids.update(v for v in (old, new) if v not in (None, ''))
+
+    return {
+        related_model: {pk: str(obj) for pk, obj in related_model._default_manager.in_bulk(ids).items()}
+        for related_model, ids in ids_by_model.items()
+        if ids
+    }
+
+
+def display_value(base_model, field_name, value, fk_labels=None):
+    """Valor legible de un campo (booleano, choices, FK resuelta o valor crudo)."""
+    if value is None or value == '':
+        return EMPTY_DISPLAY
+
+    info = history_field_meta(base_model).get(field_name)
+    if not info:
+        return str(value)
+
+    _, kind, choices, related_model = info
+    if kind == 'bool':
+        return 'Sí' if value else 'No'
+    if kind == 'choice':
+        return str(choices.get(value, value))
+    if kind == 'fk':
+        labels = (fk_labels or {}).get(related_model, {})
+        return labels.get(value, f'ID {value} (Eliminado)')
+    return str(value)
+
+
+def build_history_diffs(base_model, records, exclude_fields=()):
+    """
+    Diferencias legibles de una página de registros históricos con una cantidad fija de consultas:
+    cambios precalculados (1), anteriores de los que no los tengan (2) y una por modelo
+    relacionado con FKs modificadas.
+    Devuelve {history_id: [(etiqueta, valor anterior, valor nuevo)]}; los registros de creación
+    o sin versión anterior quedan con ``None``.
+    """
+    candidates = [r for r in records if r.history_type != '+']
+    stored = stored_changes(base_model, candidates)
+
+    # Registros sin CambioHistorico (anteriores al backfill): se comparan en lote
+    missing = [r for r in candidates if r.history_id not in stored]
+    previous = previous_records(base_model, missing)
+
+    raw = {
+        history_id: [change for change in changes if change[0] not in exclude_fields]
+        for history_id, changes in stored.items() if changes is not None
+    }
+    raw.update({
+        r.history_id: record_changes(r, previous[r.history_id], exclude_fields)
+        for r in missing if r.history_id in previous
+    })
+    fk_labels = resolve_fk_labels(base_model, raw.values())
+
+    diffs = {}
+    for record in records:
+        changes = raw.get(record.history_id)
+        if changes is None:
+            diffs[record.history_id] = None
+            continue
+
+        rendered = []
+        for name, old, new in changes:
+            old_display = display_value(base_model, name, old, fk_labels)
+            new_display = display_value(base_model, name, new, fk_labels)
+            # Solo si el valor legible realmente cambió (evita ruido en FKs o campos procesados)
+            if old_display != new_display:
+                rendered.append((field_label(base_model, name), old_display, new_display))
+        diffs[record.history_id] = rendered
+    return diffs
@@ -0,0 +1,258 @@
+import hashlib
+import math
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+from django.db import transaction
+
+from core.models import ProgresoImportacion
+
+# =========================================================
+# IMPORTACIÓN POR BLOQUES
+# =========================================================
+# Los comandos de importación leen el archivo por bloques (CSV con el parser C de pandas, .xlsx en
+# modo read_only de openpyxl), así la memoria queda acotada al tamaño del bloque y no al del archivo.
+# Las escrituras de cada bloque y su punto de control (ProgresoImportacion) van en la misma
+# transacción: si el comando se interrumpe, la siguiente ejecución sobre el mismo archivo retoma desde
+# el primer bloque no confirmado, sin duplicar filas.
+
+TAMANO_BLOQUE = 5000
+
+# Bytes del inicio y del final del archivo que se usan para su firma
+MUESTRA_FIRMA = 1024 * 1024
+
+# Valores que se leen como nulos en modo texto (equivalente a na_values de read_excel / read_csv)
+VALORES_NULOS = {
+    '', ' ', 'nan', 'NaN', 'NAN', '-nan', '-NaN', 'N/A', 'n/a', 'NA', 'NULL', 'null', 'None', '#N/A', '<NA>',
+}
+
+
+def agregar_argumentos(parser, tamano_bloque=TAMANO_BLOQUE):
+    """Argumentos comunes de los comandos de importación por bloques."""
+    parser.add_argument('--bloque', type=int, default=tamano_bloque,
+                        help=f'Filas por bloque: lectura, inserción y punto de control (por defecto: {tamano_bloque})')
+    parser.add_argument('--reiniciar', action='store_true',
+                        help='Ignorar el punto de control guardado y procesar el archivo desde el inicio')
+
+
+def firma_archivo(ruta):
+    """SHA-1 del tamaño y de los primeros / últimos MUESTRA_FIRMA bytes del archivo."""
+    tamano = os.path.getsize(ruta)
+    sha1 = hashlib.sha1(str(tamano).encode())
+    with open(ruta, 'rb') as archivo:
+        sha1.update(archivo.read(MUESTRA_FIRMA))
+        if tamano > MUESTRA_FIRMA:
+            archivo.seek(max(tamano - MUESTRA_FIRMA, MUESTRA_FIRMA))
+            sha1.update(archivo.read())
+    return sha1.hexdigest()
+
+
+def _celda_cruda(valor):
+    """Valor tal como viene en la celda, salvo los textos nulos (como read_excel sin dtype)."""
+    if valor is None or (isinstance(valor, str) and valor in VALORES_NULOS):
+        return math.nan
+    return valor
+
+
+def _celda_a_texto(valor):
+    """Mismo resultado que read_excel(dtype=str): enteros sin '.0', nulos como NaN."""
+    if valor is None:
+        return math.nan
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, str):
+        return math.nan if valor in VALORES_NULOS else valor
+    return str(valor)
+
+
+class ImportacionPorBloques:
+    """
+    Lector por bloques con punto de control. Uso en un comando:
+
+        importacion = ImportacionPorBloques('importar_fichas', ruta, tamano_bloque=options['bloque'],
+                                            reiniciar=options['reiniciar'])
+        for bloque in importacion.bloques():
+            with importacion.transaccion():
+                ...  # procesar las filas del bloque y hacer el bulk_create
+        importacion.finalizar()
+
+    El índice de cada bloque es la posición de la fila en el archivo (0 = primera fila de datos), igual
+    que en un DataFrame leído completo. Con ``texto=True`` todas las columnas se leen como str (nulos
+    como NaN); con ``texto=False`` se conservan los tipos de las celdas.
+    """
+
+    def __init__(self, comando, ruta, tamano_bloque=TAMANO_BLOQUE, reiniciar=False, texto=True,
+                 sheet=0, skiprows=0, **opciones_csv):
+        self.ruta = ruta
+        self.tamano_bloque = tamano_bloque
+        self.texto = texto
+        self.sheet = sheet
+        self.skiprows = skiprows
+        self.opciones_csv = opciones_csv
+        self.extension = os.path.splitext(ruta)[1].lower()
+
+        self.progreso, _ = ProgresoImportacion.objects.get_or_create(
+            comando=comando, firma=firma_archivo(ruta), defaults={'archivo': os.path.basename(ruta)}
+        )
+        if reiniciar:
+            self.progreso.filas_procesadas = 0
+            self.progreso.completada = False
+            self.progreso.datos = {}
+            self.progreso.save()
+
+        # Primera fila que se procesa en esta ejecución y siguiente fila a confirmar
+        self.inicio = self.progreso.filas_procesadas
+        self._fin_bloque = self.inicio
+        self.filas_leidas = 0
+
+    # ==================== ESTADO ====================
+
+    @property
+    def datos(self):
+        """Estado del comando guardado junto al punto de control (se confirma con cada bloque)."""
+        return self.progreso.datos
+
+    @property
+    def completada(self):
+        return self.progreso.completada
+
+    @contextmanager
+    def transaccion(self):
+        """Escrituras del bloque actual y su punto de control en una sola transacción."""
+        with transaction.atomic():
+            yield
+            self.progreso.filas_procesadas = self._fin_bloque
+            self.progreso.save(update_fields=['filas_procesadas', 'datos', 'updated_at'])
+
+    def finalizar(self):
+        self.progreso.completada = True
+        self.progreso.save(update_fields=['completada', 'datos', 'updated_at'])
+
+    # ==================== LECTURA ====================
+
+    def _es_xlsx(self):
+        return self.extension in ('.xlsx', '.xlsm')
+
+    def _es_excel(self):
+        return self.extension in ('.xlsx', '.xlsm', '.xls')
+
+    def _hoja(self, libro):
+        if isinstance(self.sheet, int):
+            return libro.worksheets[self.sheet]
+        return libro[self.sheet]
+
+    def columnas(self):
+        """Encabezados del archivo sin leer los datos."""
+        if self._es_xlsx():
+            from openpyxl import load_workbook
+
+            libro = load_workbook(self.ruta, read_only=True, data_only=True)
+            try:
+                filas = self._hoja(libro).iter_rows(values_only=True)
+                for _ in range(self.skiprows):
+                    next(filas, None)
+                return self._encabezado(next(filas, ()))
+            finally:
+                libro.close()
+
+        if self._es_excel():
+            return list(pd.read_excel(self.ruta, sheet_name=self.sheet, skiprows=self.skiprows, nrows=0).columns)
+        return list(pd.read_csv(self.ruta, nrows=0, **self._opciones_read_csv()).columns)
+
+    def total_estimado(self):
+        """Filas de datos según las dimensiones de la hoja (.xlsx); None si no se conoce sin leer el archivo."""
+        if not self._es_xlsx():
+            return None
+
+        from openpyxl import load_workbook
+
+        libro = load_workbook(self.ruta, read_only=True, data_only=True)
+        try:
+            max_row = self._hoja(libro).max_row
+        finally:
+            libro.close()
+        return max(max_row - 1 - self.skiprows, 0) if max_row else None
+
+    def bloques(self):
+        """Genera DataFrames de hasta ``tamano_bloque`` filas, desde la primera fila no confirmada."""
+        if self._es_xlsx():
+            lector = self._bloques_xlsx()
+        elif self._es_excel():
+            lector = self._bloques_excel_completo()
+        else:
+            lector = self._bloques_csv()
+
+        for bloque in lector:
+            if bloque.index[-1] < self.inicio:
+                continue
+            bloque = bloque.loc[self.inicio:] if bloque.index[0] < self.inicio else bloque
+
+            self._fin_bloque = int(bloque.index[-1]) + 1
+            self.filas_leidas += len(bloque)
+            yield bloque
+
+    @staticmethod
+    def _encabezado(fila):
+        return [
+            str(valor) if valor is not None else f'Unnamed: {i}'
+            for i, valor in enumerate(fila)
+        ]
+
+    def _opciones_read_csv(self):
+        opciones = {'sep': ',', 'quotechar': '"', 'on_bad_lines': 'skip', 'skiprows': self.skiprows or None}
+        if self.texto:
+            opciones['dtype'] = str
+        opciones.update(self.opciones_csv)
+        return opciones
+
+    def _bloques_csv(self):
+        with pd.read_csv(self.ruta, engine='c', chunksize=self.tamano_bloque, **self._opciones_read_csv()) as lector:
+            yield from lector
+
+    def _bloques_xlsx(self):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(self.ruta, read_only=True, data_only=True)
+        try:
+            filas = self._hoja(libro).iter_rows(values_only=True)
+            for _ in range(self.skiprows):
+                next(filas, None)
+            columnas = self._encabezado(next(filas, ()))
+            ancho = len(columnas)
+
+            def armar(registros, desde):
+                return pd.DataFrame.from_records(
+                    registros, columns=columnas, index=pd.RangeIndex(desde, desde + len(registros))
+                )
+
+            registros = []
+            vacias = []  # filas vacías pendientes: read_excel descarta las que quedan al final
+            posicion = 0
+            for fila in filas:
+                fila = tuple(fila[:ancho]) + (None,) * (ancho - len(fila))
+                if all(valor is None for valor in fila):
+                    vacias.append(fila)
+                    continue
+
+                for pendiente in vacias + [fila]:
+                    if posicion >= self.inicio:
+                        registros.append(tuple(map(_celda_a_texto if self.texto else _celda_cruda, pendiente)))
+                    posicion += 1
+                vacias = []
+
+                if len(registros) >= self.tamano_bloque:
+                    yield armar(registros, posicion - len(registros))
+                    registros = []
+
+            if registros:
+                yield armar(registros, posicion - len(registros))
+        finally:
+            libro.close()
+
+    def _bloques_excel_completo(self):
+        # .xls (formato binario antiguo): sin lector en streaming, se lee completo y se entrega por bloques
+        df = pd.read_excel(self.ruta, sheet_name=self.sheet, skiprows=self.skiprows,
+                           dtype=str if self.texto else None, na_values=list(VALORES_NULOS) if self.texto else None)
+        for desde in range(0, len(df), self.tamano_bloque):
+            yield df.iloc[desde:desde + self.tamano_bloque]
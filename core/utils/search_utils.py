@@ -1,6 +1,16 @@
 import re
+import unicodedata
 
-from django.db.models import Q
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q, Count
+
+from core.validations import clean_rut
+
+RUT_SEARCH_EXACT = 'exact'
+RUT_SEARCH_PREFIX = 'prefix'
+RUT_SEARCH_CONTAINS = 'contains'
 
 
 def get_rut_q_filter(search_value, field_name='rut'):
@@ -21,6 +31,73 @@ def get_rut_q_filter(search_value, field_name='rut'):
     return q
 
 
+def fold_search_text(value):
+    """
+    Normaliza texto para el índice de nombres: sin tildes y en mayúsculas (ej: 'Muñoz' -> 'MUNOZ').
+    """
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    return ''.join(c for c in value if not unicodedata.combining(c)).upper()
+
+
+def tokenize_search_text(value):
+    """
+    Divide un texto normalizado en palabras alfanuméricas.
+    """
+    return [token for token in re.split(r'[^0-9A-Z]+', fold_search_text(value)) if token]
+
+
+def get_paciente_rut_q_filter(search_value, prefix='', mode=RUT_SEARCH_PREFIX):
+    """
+    Filtra pacientes por RUT usando la columna indexada ``rut_normalizado``.
+    - exact: igualdad sobre el índice.
+    - prefix: "comienza con", recorre solo un rango del índice.
+    - contains: subcadena; recorre toda la tabla, usar solo como respaldo explícito.
+    Si el valor no parece un RUT (sin dígitos) no coincide con ningún paciente.
+    """
+    if not search_value:
+        return Q()
+
+    clean_value = clean_rut(search_value)
+    if not any(c.isdigit() for c in clean_value):
+        return Q(**{f"{prefix}pk__in": []})
+
+    field_name = f"{prefix}rut_normalizado"
+    if mode == RUT_SEARCH_EXACT:
+        return Q(**{field_name: clean_value})
+    if mode == RUT_SEARCH_CONTAINS:
+        return Q(**{f"{field_name}__contains": clean_value})
+    # rut_normalizado ya está en mayúsculas: istartswith usa el índice con la collation de MySQL
+    return Q(**{f"{field_name}__istartswith": clean_value})
+
+
+def get_paciente_rut_prefix(model, field_name):
+    """
+    Si ``field_name`` (ej: 'ficha__paciente__rut') apunta al RUT de un Paciente desde ``model``,
+    devuelve el prefijo de la relación (ej: 'ficha__paciente__'). En otro caso devuelve None.
+    """
+    if model is None:
+        return None
+
+    parts = field_name.split('__')
+    if parts[-1] != 'rut':
+        return None
+
+    current = model
+    for part in parts[:-1]:
+        try:
+            current = current._meta.get_field(part).related_model
+        except FieldDoesNotExist:
+            return None
+        if current is None:
+            return None
+
+    if current._meta.label != 'personas.Paciente':
+        return None
+    return field_name[:-len('rut')]
+
+
 def get_name_q_filter(search_value, prefix=''):
     """
     Implementa la lógica de búsqueda inteligente (fuzzy tokens).
@@ -31,6 +108,9 @@ def get_name_q_filter(search_value, prefix=''):
     if not search_value:
         return Q()
 
+    if getattr(settings, 'PACIENTE_NAME_SEARCH_INDEX', False):
+        return get_name_index_q_filter(search_value, prefix=prefix)
+
     # Limpiar y tokenizar
     tokens = search_value.strip().split()
     if not tokens:
@@ -54,6 +134,43 @@ def get_name_q_filter(search_value, prefix=''):
     return final_q
 
 
+def get_name_index_q_filter(search_value, prefix=''):
+    """
+    Búsqueda por nombre sobre el índice PacienteNombreToken.
+    Cada palabra debe ser prefijo de alguna palabra del nombre o apellidos (AND entre palabras);
+    cada una se resuelve con un rango sobre el índice (token, paciente) y se intersectan.
+    """
+    tokens = tokenize_search_text(search_value)
+    if not tokens:
+        return Q(**{f"{prefix}pk__in": []})
+
+    token_model = apps.get_model('personas', 'PacienteNombreToken')
+    final_q = Q()
+    for token in dict.fromkeys(tokens):
+        paciente_ids = token_model.objects.filter(token__istartswith=token).values('paciente_id')
+        final_q &= Q(**{f"{prefix}pk__in": paciente_ids})
+
+    return final_q
+
+
+def annotate_name_rank(qs, search_value, prefix=''):
+    """
+    Agrega ``name_rank``: cantidad de palabras buscadas que coinciden exactamente con
+    alguna palabra del nombre. Solo tiene sentido con el índice de nombres activo.
+    """
+    tokens = tokenize_search_text(search_value)
+    if not tokens or not getattr(settings, 'PACIENTE_NAME_SEARCH_INDEX', False):
+        return qs
+
+    return qs.annotate(
+        name_rank=Count(
+            f'{prefix}nombre_tokens',
+            filter=Q(**{f'{prefix}nombre_tokens__token__in': tokens}),
+            distinct=True,
+        )
+    )
+
+
 def build_paciente_search_q(search_value, prefix=''):
     """
     Combina búsqueda por RUT y por Nombre.
@@ -62,7 +179,7 @@ def build_paciente_search_q(search_value, prefix=''):
         return Q()
 
     q_name = get_name_q_filter(search_value, prefix=prefix)
-    q_rut = get_rut_q_filter(search_value, field_name=f'{prefix}rut')
+    q_rut = get_paciente_rut_q_filter(search_value, prefix=prefix)
 
     # Combinamos con OR: o coincide el nombre (con todos sus tokens) o coincide el RUT
     return q_name | q_rut
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+
+# =========================================================
+# VERSIONES EN CACHÉ
+# =========================================================
+# Claves sin vencimiento que invalidan grupos de entradas (conteos, widgets, catálogos): al subir la
+# versión, lo guardado con la anterior deja de leerse. Una clave que falta (caché reiniciada o entrada
+# descartada por el cull del backend) se crea con un valor nuevo tomado del reloj, nunca con uno fijo:
+# una versión perdida no puede volver a un valor ya usado y revivir entradas invalidadas.
+
+
+def _nueva_version():
+    return time.time_ns()
+
+
+def leer_versiones(keys):
+    """{clave: versión} de cada clave; las que faltan se crean con una versión nueva."""
+    versiones = cache.get_many(keys)
+    for key in keys:
+        if key not in versiones:
+            nueva = _nueva_version()
+            # add: si otro proceso la creó entre medio, se usa la suya
+            if not cache.add(key, nueva, None):
+                nueva = cache.get(key, nueva)
+            versiones[key] = nueva
+    return versiones
+
+
+def leer_version(key):
+    return leer_versiones([key])[key]
+
+
+def subir_version(key):
+    """Invalida lo guardado con la versión actual de ``key``."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _nueva_version(), None)
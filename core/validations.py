@@ -108,3 +108,24 @@ def format_rut(rut: str) -> str:
     body = f"{int(body):,}".replace(",", ".")  # 21226305 -> 21.226.305
 
     return f"{body}-{dv}"
+
+
+def clean_rut(rut: str) -> str:
+    """Devuelve el RUT canónico para búsquedas: solo dígitos y K en mayúscula (ej: 209300559)."""
+    if not rut:
+        return ""
+
+    return re.sub(r'[^0-9kK]', '', str(rut)).upper()
+
+
+def normalize_rut(rut: str) -> str:
+    """
+    Forma en que se guarda un RUT: sin espacios y en mayúscula; si es válido, además con puntos y guion
+    (XX.XXX.XXX-DV). La versión vectorizada para importadores es core.utils.ruts.normalize_rut_series.
+    """
+    rut = rut.strip().upper()
+    if not validate_rut(rut):
+        return rut
+
+    limpio = clean_rut(rut)
+    return f"{int(limpio[:-1]):,}".replace(",", ".") + f"-{limpio[-1]}"
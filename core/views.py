@@ -1,17 +1,12 @@
-from datetime import timedelta
-
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.cache import cache
-from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import render, redirect
-from django.utils import timezone
 from django.views.generic.base import TemplateView
 
-from clinica.models import Ficha
-from personas.models.pacientes import Paciente
+from core import dashboard
+from users.principal import get_principal
 
 
 @login_required
@@ -23,89 +18,23 @@ def dashboard_view(request):
     # 🔍 BÚSQUEDA RÁPIDA
     # ==========================
     q = request.GET.get('q')
-    if q:
-        qs = Paciente.objects.filter(status=True).filter(
-            Q(rut__iexact=q) |
-            Q(nombre__icontains=q) |
-            Q(apellido_paterno__icontains=q) |
-            Q(apellido_materno__icontains=q)
-        )
-
-        if qs.count() == 1:
-            return redirect('paciente_detail', pk=qs.first().pk)
-        elif qs.count() == 0:
+    if q and q.strip():
+        resultado = dashboard.busqueda_rapida(q, user.establecimiento_id)
+
+        if 'pk' in resultado:
+            return redirect('paciente_detail', pk=resultado['pk'])
+        elif resultado['total'] == 0:
             messages.warning(request, 'No se encontraron pacientes para la búsqueda ingresada.')
         else:
             messages.info(request, 'Se encontraron múltiples pacientes. Por favor refina tu búsqueda.')
 
     # ==========================
-    # 👤 ROL
-    # ==========================
-    first_group = user.groups.first()
-    rol = first_group.name if first_group else getattr(user, 'tipo_perfil', None)
-
-    # ==========================
-    # 🔐 PERMISOS
-    # ==========================
-    permissions = {
-        'comunas': 0,
-        'establecimientos': 0,
-        'fichas': 0,
-        'genero': 0,
-        'movimiento_ficha': 0,
-        'paciente': 0,
-        'pais': 0,
-        'prevision': 0,
-        'colores_sector': 0,
-        'profesion': 0,
-        'profesionales': 0,
-        'sectores': 0,
-        'servicio_clinico': 0,
-        'soporte': 0,
-        'reportes': 0,
-        'usuarios': 0,
-    }
-
-    role = getattr(user, 'rol', None)
-    if role:
-        for module in permissions:
-            permissions[module] = getattr(role, module, 0)
-
-    # ==========================
-    # 🕒 CAMBIOS RECIENTES
+    # 👤 ROL Y 🔐 PERMISOS
     # ==========================
-    last_7 = timezone.now() - timedelta(days=7)
-    cambios_recientes_count = Paciente.history.filter(
-        history_date__gte=last_7
-    ).count()
-
-    history_items = Paciente.history.order_by('-history_date')[:5]
-    cambios = []
-
-    for h in history_items:
-        prev = h.prev_record
-        campo = antes = despues = None
-
-        if prev:
-            for field in Paciente._meta.fields:
-                fname = field.name
-                try:
-                    if getattr(prev, fname) != getattr(h, fname):
-                        campo = fname
-                        antes = getattr(prev, fname)
-                        despues = getattr(h, fname)
-                        break
-                except Exception:
-                    continue
-
-        cambios.append({
-            'paciente_str': str(h.instance) if hasattr(h, 'instance') else h.rut,
-            'campo': campo,
-            'antes': antes,
-            'despues': despues,
-            'fecha': h.history_date,
-            'usuario': getattr(h.history_user, 'username', None),
-        })
+    # Calculados una vez por UserRolesMiddleware (users.principal)
+    principal = getattr(request, 'principal', None) or get_principal(user)
+    rol = principal.rol_nombre(user)
+    permissions = principal.permisos
 
     # ==========================
     # 📦 CONTEXTO FINAL (SEPARADO)
@@ -116,8 +45,6 @@ def dashboard_view(request):
         'user_nombre': user.get_username(),
         'establecimiento': establecimiento,
         'rol': rol,
-        'cambios_recientes_count': cambios_recientes_count,
-        'cambios': cambios,
     }
 
     return render(request, 'core/dashboard.html', context)
@@ -127,43 +54,9 @@ def dashboard_view(request):
 def dashboard_metrics_view(request):
     """
     Vista asíncrona para cargar las métricas pesadas del dashboard.
-    Retorna un JsonResponse con las métricas calculadas.
-    Incluye caché de 5 minutos por establecimiento.
+    Retorna un JsonResponse con las métricas calculadas (caché por establecimiento, ver core.dashboard).
     """
-    user = request.user
-    establecimiento = getattr(user, 'establecimiento', None)
-    est_id = establecimiento.id if establecimiento else 'global'
-
-    cache_key = f'dashboard_metrics_{est_id}'
-    data = cache.get(cache_key)
-
-    if not data:
-        # 1. Total Pacientes: Global y Activos (status=True)
-        total_pacientes = Paciente.objects.filter(status=True).count()
-
-        # 2. Métricas por Establecimiento
-        total_ingresos_est = 0
-        total_fichas_est = 0
-
-        if establecimiento:
-            # Query base filtrando por establecimiento y pacientes activos
-            fichas_qs = Ficha.objects.filter(
-                establecimiento=establecimiento,
-                paciente__status=True
-            )
-
-            # Total de fichas del establecimiento
-            total_fichas_est = fichas_qs.count()
-
-        data = {
-            'total_pacientes': total_pacientes,
-            'total_fichas_est': total_fichas_est,
-        }
-
-        # Cache por 5 minutos (300 segundos)
-        cache.set(cache_key, data, 300)
-
-    return JsonResponse(data)
+    return JsonResponse(dashboard.metricas(request.user.establecimiento_id))
 
 
 @login_required
@@ -171,38 +64,15 @@ def dashboard_pacientes_recientes_view(request):
     """
     Vista asíncrona para cargar la tabla de pacientes recientes.
     """
-    from django.urls import reverse
-    user = request.user
-    establecimiento = getattr(user, 'establecimiento', None)
+    return JsonResponse({'pacientes': dashboard.pacientes_recientes(request.user.establecimiento_id)})
 
-    fichas_qs = Ficha.objects.select_related('paciente', 'establecimiento')
-
-    if establecimiento:
-        fichas_qs = fichas_qs.filter(
-            establecimiento=establecimiento,
-            paciente__status=True
-        )
-    else:
-        fichas_qs = fichas_qs.none()
-
-    fichas_recientes = fichas_qs.order_by('-created_at')[:10]
-    data = []
-
-    for ficha in fichas_recientes:
-        paciente = ficha.paciente
-        # URL para ver la ficha del paciente
-        url_paciente = reverse('paciente_view_param', args=[paciente.id]) if paciente else "#"
-
-        data.append({
-            'nombre_completo': f"{paciente.nombre} {paciente.apellido_paterno} {paciente.apellido_materno}" if paciente else "Desconocido",
-            'rut': paciente.rut if paciente and paciente.rut else "-",
-            'fecha_ingreso': ficha.created_at.strftime('%d-%m-%Y %H:%M'),
-            'numero_ficha': str(ficha.numero_ficha_sistema).zfill(
-                4) if ficha.numero_ficha_sistema is not None else None,
-            'url_paciente': url_paciente
-        })
 
-    return JsonResponse({'pacientes': data})
+@login_required
+def dashboard_cambios_recientes_view(request):
+    """
+    Vista asíncrona para cargar el panel de últimos cambios de pacientes.
+    """
+    return JsonResponse(dashboard.cambios_recientes(request.user.establecimiento_id))
 
 
 @login_required
@@ -3,6 +3,7 @@ from django.db import transaction
 
 from clinica.models.ficha import Ficha
 from clinica.models.movimiento_ficha import MovimientoFicha
+from clinica.services import actualizar_estado_fichas
 from personas.models.pacientes import Paciente
 from respaldos.models.respaldo_ficha import RespaldoFicha
 from respaldos.models.respaldo_paciente import RespaldoPaciente
@@ -93,6 +94,9 @@ def fusionar_pacientes_clinicos(
                                                 ficha_a_conservar.observacion or "") + f"\nFusión realizada por {usuario}. Paciente ficticio {paciente_ficticio.pk} fusionado. Motivo: {motivo_fusion}"
         ficha_a_conservar.save()
 
+        # Los movimientos se traspasaron con update(): recalcular el estado actual de la ficha
+        actualizar_estado_fichas([ficha_a_conservar])
+
         # 4. Eliminar la ficha sobrante
         if ficha_a_eliminar:
             # Crear respaldo de la ficha antes de eliminarla
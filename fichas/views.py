@@ -14,6 +14,7 @@ from django.views.generic import FormView, TemplateView
 
 from clinica.models import Ficha
 from clinica.models.movimiento_ficha import MovimientoFicha
+from core.utils.catalogos import catalogo, resolver
 from core.validations import format_rut, validate_rut
 from geografia.models.comuna import Comuna
 from personas.models.pacientes import Paciente
@@ -588,6 +589,7 @@ def paciente_list_v2(request):
         writer = csv.writer(response)
         writer.writerow(['RUT', 'Nombres', 'Apellidos', 'Comuna', 'Sexo', 'Ficha (Establecimiento)'])
         for p in pacientes_list:
+            resolver([p], 'comuna')
             ficha = p.fichas_pacientes.filter(establecimiento=user_est).first()
             num_ficha = ficha.numero_ficha_sistema if ficha else "S/F"
             writer.writerow([
@@ -603,8 +605,9 @@ def paciente_list_v2(request):
     paginator = Paginator(pacientes_list, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    resolver(page_obj.object_list, 'comuna')
 
-    comunas = Comuna.objects.all()
+    comunas = catalogo(Comuna).values()
     from core.choices import SEXO_CHOICES
 
     context = {
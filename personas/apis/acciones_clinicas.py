@@ -6,6 +6,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
 from clinica.models import Ficha
+from clinica.services import registrar_numeros_ficha
 from core.validations import validate_rut, format_rut
 from personas.models.pacientes import Paciente
 
@@ -98,6 +99,9 @@ def asignar_numero_ficha(request):
 
             ficha.save()
 
+            # La secuencia del establecimiento no debe volver a entregar el número asignado
+            registrar_numeros_ficha([(ficha.establecimiento_id, int(nuevo_numero))])
+
             return JsonResponse({
                 "success": True,
                 "numero_ficha_sistema": ficha.numero_ficha_sistema,
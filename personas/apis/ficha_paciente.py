@@ -2,6 +2,7 @@ from django.db.models import Prefetch
 from django.http import JsonResponse
 
 from clinica.models import Ficha, MovimientoMonologoControlado
+from core.utils.catalogos import resolver
 from personas.models.pacientes import Paciente
 
 
@@ -9,12 +10,13 @@ def get_paciente_ficha(request, rut):
     paciente = (
         Paciente.objects
         .filter(rut=rut)
-        .select_related("comuna", "prevision", "usuario", "usuario_anterior")
+        .select_related("usuario", "usuario_anterior")
         .first()
     )
 
     if not paciente:
         return JsonResponse({"error": "Paciente no encontrado"}, status=404)
+    resolver([paciente], "comuna", "prevision", "genero")
 
     ficha = (
         Ficha.objects
@@ -22,7 +24,7 @@ def get_paciente_ficha(request, rut):
             paciente=paciente,
             establecimiento=request.user.establecimiento
         )
-        .select_related("sector", "establecimiento", "usuario", "usuario_anterior", "created_by")
+        .select_related("establecimiento", "usuario", "usuario_anterior", "created_by")
         .prefetch_related(
             Prefetch(
                 "movimientoficha_set",
@@ -33,6 +35,9 @@ def get_paciente_ficha(request, rut):
         .first()
     )
 
+    if ficha:
+        resolver([ficha], "sector")
+
     # if not ficha:
     #     return JsonResponse(
     #         {"error": "El paciente no tiene ficha en este establecimiento"},
@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import JsonResponse
 
-from core.utils.search_utils import build_paciente_search_q
+from core.utils.search_utils import build_paciente_search_q, get_paciente_rut_q_filter, annotate_name_rank
 from personas.models.pacientes import Paciente
 
 
@@ -24,7 +25,14 @@ def paciente_search_api(request):
     q_filter = build_paciente_search_q(search_value)
 
     # Ejecutar búsqueda con paginación para Select2
-    pacientes_qs = Paciente.objects.filter(q_filter, status=True).distinct().order_by('apellido_paterno', 'nombre')
+    pacientes_qs = Paciente.objects.filter(q_filter, status=True).distinct()
+    if settings.PACIENTE_NAME_SEARCH_INDEX:
+        # Con el índice de nombres: primero los que coinciden con palabras completas
+        pacientes_qs = annotate_name_rank(pacientes_qs, search_value).order_by(
+            '-name_rank', 'apellido_paterno', 'nombre'
+        )
+    else:
+        pacientes_qs = pacientes_qs.order_by('apellido_paterno', 'nombre')
 
     paginator = Paginator(pacientes_qs, page_size)
     page_obj = paginator.get_page(page_number)
@@ -60,15 +68,11 @@ def buscar_pacientes_api(request):
     pacientes_qs = Paciente.objects.filter(status=True)
 
     if query:
-        # Limpiar RUT si es necesario para la búsqueda
-        query_clean = query.replace('.', '').replace('-', '').upper()
-
         pacientes_qs = pacientes_qs.filter(
             Q(nombre__icontains=query) |
             Q(apellido_paterno__icontains=query) |
             Q(apellido_materno__icontains=query) |
-            Q(rut__icontains=query) |
-            Q(rut__icontains=query_clean) |
+            get_paciente_rut_q_filter(query) |
             Q(codigo__icontains=query)
         ).distinct()
 
@@ -2,6 +2,8 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 from tqdm import tqdm
 
+from core.utils.ruts import normalize_rut_series
+from core.validations import clean_rut
 from personas.models.pacientes import Paciente
 
 
@@ -33,28 +35,6 @@ class Command(BaseCommand):
             return None
         return str(valor).strip().upper()
 
-    def normalizar_rut(self, rut):
-        if not rut:
-            return None
-
-        # Quitar cualquier carácter que no sea número o K
-        rut = "".join(c for c in str(rut) if c.isdigit() or c.upper() == "K").upper()
-
-        if len(rut) < 2:
-            return rut
-
-        cuerpo = rut[:-1]
-        dv = rut[-1]
-
-        # Formatear cuerpo con puntos
-        cuerpo_con_puntos = ""
-        for i, char in enumerate(reversed(cuerpo)):
-            if i > 0 and i % 3 == 0:
-                cuerpo_con_puntos = "." + cuerpo_con_puntos
-            cuerpo_con_puntos = char + cuerpo_con_puntos
-
-        return f"{cuerpo_con_puntos}-{dv}"
-
     # ================= MAIN =================
 
     def handle(self, *args, **options):
@@ -75,6 +55,13 @@ class Command(BaseCommand):
         df = df.fillna("")
         df.columns = [str(col).strip() for col in df.columns]
 
+        # RUT de cada fila (cod_rutpac o rut) normalizado en bloque, con las mismas reglas que Paciente.save
+        ruts_excel = pd.Series("", index=df.index, dtype=object)
+        for columna in ("rut", "cod_rutpac"):
+            if columna in df.columns:
+                ruts_excel = df[columna].where(df[columna].str.strip() != "", ruts_excel)
+        ruts_excel = normalize_rut_series(ruts_excel)
+
         total = len(df)
 
         # Contadores
@@ -103,9 +90,9 @@ class Command(BaseCommand):
                 excel_data = {}
                 ruts_a_buscar = []
 
-                for _, row in chunk.iterrows():
+                for idx, row in chunk.iterrows():
                     rut_raw = self.limpiar_texto(row.get("cod_rutpac") or row.get("rut"))
-                    rut = self.normalizar_rut(rut_raw)
+                    rut = ruts_excel[idx] or None
 
                     if not rut:
                         pbar.update(1)
@@ -124,18 +111,17 @@ class Command(BaseCommand):
                     if rut_raw and rut_raw != rut:
                         ruts_a_buscar.append(rut_raw)
 
-                # Buscar todos los pacientes del lote en una sola query
-                pacientes_db = Paciente.objects.filter(rut__in=ruts_a_buscar)
-                # Crear diccionario de pacientes encontrados {rut: objeto_paciente}
-                # Priorizar RUT normalizado si hay duplicados en la búsqueda por alguna razón
-                pacientes_dict = {p.rut: p for p in pacientes_db}
+                # Buscar todos los pacientes del lote en una sola query (por la columna indexada rut_normalizado)
+                pacientes_db = Paciente.objects.filter(
+                    rut_normalizado__in={clean_rut(r) for r in ruts_a_buscar}
+                )
+                # Crear diccionario de pacientes encontrados {rut_normalizado: objeto_paciente}
+                pacientes_dict = {p.rut_normalizado: p for p in pacientes_db}
 
                 # Procesar cada registro del Excel en el lote
                 for rut_excel, data in excel_data.items():
                     # Buscar en el diccionario de la DB
-                    paciente = pacientes_dict.get(rut_excel)
-                    if not paciente and data["rut_raw"]:
-                        paciente = pacientes_dict.get(data["rut_raw"])
+                    paciente = pacientes_dict.get(clean_rut(rut_excel))
 
                     if not paciente:
                         no_encontrados += 1
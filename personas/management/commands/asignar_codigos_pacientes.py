@@ -0,0 +1,45 @@
+# python manage.py asignar_codigos_pacientes --batch-size 5000
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tqdm import tqdm
+
+from personas.models.pacientes import Paciente
+from personas.services import asignar_codigos_paciente
+
+
+class Command(BaseCommand):
+    help = ('Asigna código (PAC-0000123) a los pacientes que quedaron sin él, reservando un bloque '
+            'de la secuencia por lote.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Pacientes por lote (por defecto: 5000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        qs = Paciente.objects.filter(codigo__isnull=True).only('id', 'codigo').order_by('id')
+        total = qs.count()
+
+        self.stdout.write(self.style.SUCCESS(f'Pacientes sin código: {total:,}'))
+
+        asignados = 0
+        ultimo_id = 0
+
+        with tqdm(total=total, desc='Asignando códigos', unit='pac') as pbar:
+            while True:
+                lote = list(qs.filter(id__gt=ultimo_id)[:batch_size])
+                if not lote:
+                    break
+
+                with transaction.atomic():
+                    asignados += asignar_codigos_paciente(lote)
+                    # bulk_update no crea historial: el código es un dato técnico
+                    Paciente.objects.bulk_update(lote, ['codigo'], batch_size=batch_size)
+
+                ultimo_id = lote[-1].id
+                pbar.update(len(lote))
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Códigos asignados: {asignados:,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -4,15 +4,20 @@ import warnings
 from datetime import datetime
 
 import pandas as pd
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 from tqdm import tqdm
 
+from core.utils.importacion import ImportacionPorBloques, agregar_argumentos
 from geografia.models.comuna import Comuna
 from personas.models.pacientes import Paciente
 from personas.models.prevision import Prevision
 from personas.models.usuario_anterior import UsuarioAnterior
+from personas.normalizacion import normalizar_dataframe
+from personas.services import asignar_codigos_paciente, reservar_codigos_paciente
 
 
 class Command(BaseCommand):
@@ -22,6 +27,7 @@ class Command(BaseCommand):
         parser.add_argument('excel_path', type=str, help='Ruta del archivo Excel (.xlsx, .xls).')
         parser.add_argument('--sheet', type=str, default=0, help='Nombre o índice de la hoja (por defecto: 0)')
         parser.add_argument('--skiprows', type=int, default=0, help='Filas a saltar al inicio')
+        agregar_argumentos(parser)
 
     # ================== LIMPIEZAS ==================
 
@@ -177,65 +183,44 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'Hoja: "{sheet}" | Saltar filas: {skiprows}'))
 
         try:
-            # Leer el archivo Excel
-            df = pd.read_excel(
-                excel_path,
-                sheet_name=sheet,
-                skiprows=skiprows,
-                dtype=str,  # Leer all como string para mayor control
-                na_values=['', ' ', 'NaN', 'N/A', 'NULL', 'None'],
-                keep_default_na=True
+            importacion = ImportacionPorBloques(
+                'importar_pacientes', excel_path, tamano_bloque=options['bloque'], reiniciar=options['reiniciar'],
+                sheet=sheet, skiprows=skiprows,
             )
+            # Limpiar nombres de columnas
+            columnas = [str(col).strip().replace('\ufeff', '') for col in importacion.columnas()]
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error leyendo Excel: {e}'))
             return
 
-        # Limpiar nombres de columnas
-        df.columns = [str(col).strip() for col in df.columns]
-        df.columns = [col.replace('\ufeff', '') for col in df.columns]
+        self.stdout.write(self.style.SUCCESS(f'Columnas detectadas: {columnas}'))
+        self.stdout.write(self.style.SUCCESS(f'Total de columnas: {len(columnas)}'))
 
-        # Reemplazar NaN por cadenas vacías para procesamiento consistente
-        df = df.fillna('')
-
-        self.stdout.write(self.style.SUCCESS(f'Columnas detectadas: {list(df.columns)}'))
-        self.stdout.write(self.style.SUCCESS(f'Total de columnas: {len(df.columns)}'))
-
-        total_leidas = len(df)
-        self.stdout.write(self.style.SUCCESS(f'Registros leídos: {total_leidas:,}'))
-
-        # Mostrar primeras filas para verificación
-        self.stdout.write(self.style.SUCCESS('\nPrimeras filas para verificación:'))
-        for i in range(min(3, len(df))):
-            self.stdout.write(f'Fila {i}: {dict(df.iloc[i].head(5))}')
+        total_leidas = importacion.total_estimado()
+        if total_leidas is not None:
+            self.stdout.write(self.style.SUCCESS(f'Registros en Excel (estimado): {total_leidas:,}'))
+        if importacion.completada:
+            self.stdout.write(self.style.WARNING(
+                'El archivo ya se importó por completo; use --reiniciar para procesarlo de nuevo'))
+            return
+        if importacion.inicio:
+            self.stdout.write(self.style.WARNING(f'Reanudando desde la fila {importacion.inicio:,} del Excel'))
 
         # ================== PRECARGA ==================
 
         self.stdout.write(self.style.SUCCESS('\nPrecargando datos...'))
 
         pacientes_existentes_count = Paciente.objects.count()
+        # Se guarda con el punto de control: al reanudar, el índice de nombres cubre también los bloques ya confirmados
+        ultimo_id_previo = importacion.datos.setdefault(
+            'ultimo_id_previo', Paciente.objects.aggregate(Max('id'))['id__max'] or 0
+        )
         self.stdout.write(self.style.SUCCESS(f'Pacientes existentes en BD: {pacientes_existentes_count:,}'))
 
-        # Verificar RUTs únicos en el Excel para detectar duplicados
-        ruts_excel = {}
+        # RUTs del Excel ya vistos (los duplicados se cuentan bloque a bloque)
+        ruts_excel = set()
         duplicados_excel = 0
-        for idx, row in df.iterrows():
-            # Verificar diferentes posibles nombres de columna para RUT
-            rut = None
-            for col_name in ['rut', 'cod_rutpac', 'RUT', 'rut_paciente']:
-                if col_name in df.columns:
-                    rut = self.limpiar_texto(row.get(col_name))
-                    if rut:
-                        break
-
-            if rut:
-                rut = rut.strip().upper()
-                if rut in ruts_excel:
-                    duplicados_excel += 1
-                else:
-                    ruts_excel[rut] = idx
-
-        if duplicados_excel > 0:
-            self.stdout.write(self.style.WARNING(f'RUTs duplicados en Excel: {duplicados_excel:,}'))
+        columnas_rut_excel = [c for c in ['rut', 'cod_rutpac', 'RUT', 'rut_paciente'] if c in columnas]
 
         # Cargar RUTs existentes para evitar duplicados
         ruts_existentes = set(Paciente.objects.values_list('rut', flat=True))
@@ -288,42 +273,42 @@ class Command(BaseCommand):
         # ================== MAPEO DE COLUMNAS ==================
 
         # Función para encontrar el nombre correcto de columna
-        def encontrar_columna(nombres_posibles, df):
+        def encontrar_columna(nombres_posibles, columnas):
             for nombre in nombres_posibles:
-                if nombre in df.columns:
+                if nombre in columnas:
                     return nombre
             return None
 
         # Mapear nombres de columnas posibles
         mapeo_columnas = {
-            'rut': encontrar_columna(['rut', 'cod_rutpac', 'RUT'], df),
-            'id_anterior': encontrar_columna(['id_anterior', 'id', 'ID'], df),
-            'nombre': encontrar_columna(['nombre', 'nom_nombre', 'NOMBRE'], df),
-            'apellido_paterno': encontrar_columna(['apellido_paterno', 'nom_apepat', 'APELLIDO_PATERNO'], df),
-            'apellido_materno': encontrar_columna(['apellido_materno', 'nom_apemat', 'APELLIDO_MATERNO'], df),
-            'fecha_nacimiento': encontrar_columna(['fecha_nacimiento', 'fec_nacimi', 'FECHA_NACIMIENTO'], df),
-            'sexo': encontrar_columna(['sexo', 'ind_tisexo', 'SEXO'], df),
-            'estado_civil': encontrar_columna(['estado_civil', 'ind_estciv', 'ESTADO_CIVIL'], df),
-            'direccion': encontrar_columna(['direccion', 'nom_direcc', 'DIRECCION'], df),
-            'comuna': encontrar_columna(['comuna', 'cod_comuna', 'COMUNA'], df),
-            'prevision': encontrar_columna(['prevision', 'PREVISION'], df),
-            'prevision2': encontrar_columna(['prevision2', 'PREVISION2'], df),
-            'usuario': encontrar_columna(['usuario', 'usuario_anterior', 'USUARIO'], df),
-            'pasaporte': encontrar_columna(['pasaporte', 'PASAPORTE'], df),
-            'rut_madre': encontrar_columna(['rut_madre', 'RUT_MADRE'], df),
-            'recien_nacido': encontrar_columna(['recien_nacido', 'RECIEN_NACIDO'], df),
-            'extranjero': encontrar_columna(['extranjero', 'EXTRANJERO'], df),
-            'fallecido': encontrar_columna(['fallecido', 'FALLECIDO'], df),
+            'rut': encontrar_columna(['rut', 'cod_rutpac', 'RUT'], columnas),
+            'id_anterior': encontrar_columna(['id_anterior', 'id', 'ID'], columnas),
+            'nombre': encontrar_columna(['nombre', 'nom_nombre', 'NOMBRE'], columnas),
+            'apellido_paterno': encontrar_columna(['apellido_paterno', 'nom_apepat', 'APELLIDO_PATERNO'], columnas),
+            'apellido_materno': encontrar_columna(['apellido_materno', 'nom_apemat', 'APELLIDO_MATERNO'], columnas),
+            'fecha_nacimiento': encontrar_columna(['fecha_nacimiento', 'fec_nacimi', 'FECHA_NACIMIENTO'], columnas),
+            'sexo': encontrar_columna(['sexo', 'ind_tisexo', 'SEXO'], columnas),
+            'estado_civil': encontrar_columna(['estado_civil', 'ind_estciv', 'ESTADO_CIVIL'], columnas),
+            'direccion': encontrar_columna(['direccion', 'nom_direcc', 'DIRECCION'], columnas),
+            'comuna': encontrar_columna(['comuna', 'cod_comuna', 'COMUNA'], columnas),
+            'prevision': encontrar_columna(['prevision', 'PREVISION'], columnas),
+            'prevision2': encontrar_columna(['prevision2', 'PREVISION2'], columnas),
+            'usuario': encontrar_columna(['usuario', 'usuario_anterior', 'USUARIO'], columnas),
+            'pasaporte': encontrar_columna(['pasaporte', 'PASAPORTE'], columnas),
+            'rut_madre': encontrar_columna(['rut_madre', 'RUT_MADRE'], columnas),
+            'recien_nacido': encontrar_columna(['recien_nacido', 'RECIEN_NACIDO'], columnas),
+            'extranjero': encontrar_columna(['extranjero', 'EXTRANJERO'], columnas),
+            'fallecido': encontrar_columna(['fallecido', 'FALLECIDO'], columnas),
             'fecha_fallecimiento': encontrar_columna(['fecha_fallecimiento', 'fecha_fallecido', 'FECHA_FALLECIMIENTO'],
-                                                     df),
-            'nombres_padre': encontrar_columna(['nombres_padre', 'nom_npadre', 'NOMBRES_PADRE'], df),
-            'nombres_madre': encontrar_columna(['nombres_madre', 'nom_nmadre', 'NOMBRES_MADRE'], df),
-            'nombre_pareja': encontrar_columna(['nombre_pareja', 'nom_pareja', 'NOMBRE_PAREJA'], df),
-            'numero_telefono1': encontrar_columna(['numero_telefono1', 'num_telefo1', 'TELEFONO1'], df),
-            'numero_telefono2': encontrar_columna(['numero_telefono2', 'num_telefo2', 'TELEFONO2'], df),
-            'ocupacion': encontrar_columna(['ocupacion', 'OCUPACION'], df),
-            'representante_legal': encontrar_columna(['representante_legal', 'REPRESENTANTE_LEGAL'], df),
-            'nombre_social': encontrar_columna(['nombre_social', 'NOMBRE_SOCIAL'], df),
+                                                     columnas),
+            'nombres_padre': encontrar_columna(['nombres_padre', 'nom_npadre', 'NOMBRES_PADRE'], columnas),
+            'nombres_madre': encontrar_columna(['nombres_madre', 'nom_nmadre', 'NOMBRES_MADRE'], columnas),
+            'nombre_pareja': encontrar_columna(['nombre_pareja', 'nom_pareja', 'NOMBRE_PAREJA'], columnas),
+            'numero_telefono1': encontrar_columna(['numero_telefono1', 'num_telefo1', 'TELEFONO1'], columnas),
+            'numero_telefono2': encontrar_columna(['numero_telefono2', 'num_telefo2', 'TELEFONO2'], columnas),
+            'ocupacion': encontrar_columna(['ocupacion', 'OCUPACION'], columnas),
+            'representante_legal': encontrar_columna(['representante_legal', 'REPRESENTANTE_LEGAL'], columnas),
+            'nombre_social': encontrar_columna(['nombre_social', 'NOMBRE_SOCIAL'], columnas),
         }
 
         self.stdout.write(self.style.SUCCESS('\nMapeo de columnas encontradas:'))
@@ -331,6 +316,8 @@ class Command(BaseCommand):
             if value:
                 self.stdout.write(f'  {key}: {value}')
 
+        columnas_normalizadas = {campo: col for campo, col in mapeo_columnas.items() if col}
+
         # ================== CONTADORES ==================
 
         creados = 0
@@ -350,140 +337,214 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS('\nIniciando importación...'))
 
-        with tqdm(total=total_leidas, desc='Importando pacientes', unit='reg') as pbar:
-            for index, row in df.iterrows():
-                try:
-                    # Obtener RUT usando el mapeo de columnas
-                    rut = None
-                    col_rut = mapeo_columnas['rut']
-                    if col_rut:
-                        rut = self.limpiar_texto(row.get(col_rut))
-
-                    if not rut:
-                        sin_rut += 1
-                        pbar.update(1)
-                        continue
-
-                    rut = rut.strip().upper()
-
-                    # Verificar si ya existe en BD
-                    if rut in ruts_existentes:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Paciente con RUT {rut} ya existe en la base de datos. Se ingresará como duplicado.'))
-                        duplicados_insertados += 1
-                        # No omitimos, permitimos que siga y se cree
-
-                    # BUSCAR COMUNA POR CÓDIGO
-                    codigo_comuna = None
-                    col_comuna = mapeo_columnas['comuna']
-                    if col_comuna:
-                        codigo_comuna = self.limpiar_entero(row.get(col_comuna))
-
-                    comuna = self.buscar_comuna_por_codigo(codigo_comuna, comunas_por_codigo)
-
-                    if not comuna:
-                        comuna = COMUNA_DEFAULT
-                        comuna_default_count += 1
-
-                    # BUSCAR PREVISIÓN POR CÓDIGO
-                    # Intentar con 'prevision' y luego con 'prevision2'
-                    codigo_prevision = None
-                    col_prevision = mapeo_columnas['prevision']
-                    if col_prevision:
-                        codigo_prevision = self.limpiar_entero(row.get(col_prevision))
-
-                    if codigo_prevision is None or codigo_prevision == 0:
-                        col_prevision2 = mapeo_columnas['prevision2']
-                        if col_prevision2:
-                            codigo_prevision = self.limpiar_entero(row.get(col_prevision2))
-
-                    prevision = None
-                    if codigo_prevision:
-                        prevision = self.buscar_prevision_por_codigo(codigo_prevision, previsiones_por_codigo)
-
-                    if not prevision:
-                        prevision_no_encontrada += 1
-                        # No asignar previsión si no se encuentra
-
-                    # PROCESAR FECHA DE NACIMIENTO
-                    fecha_nacimiento_raw = None
-                    col_fecha_nac = mapeo_columnas['fecha_nacimiento']
-                    if col_fecha_nac:
-                        fecha_nacimiento_raw = row.get(col_fecha_nac)
-                    fecha_nacimiento = self.limpiar_fecha(fecha_nacimiento_raw)
-
-                    # BUSCAR USUARIO ANTERIOR POR RUT
-                    usuario_rut = None
-                    col_usuario = mapeo_columnas['usuario']
-                    if col_usuario:
-                        usuario_rut = self.limpiar_texto(row.get(col_usuario))
-                    usuario_anterior = usuarios_anteriores.get(usuario_rut) if usuario_rut else None
-
-                    # Obtener otros campos usando el mapeo
-                    def obtener_valor(campo):
-                        col = mapeo_columnas.get(campo)
-                        if col and col in row:
-                            return self.limpiar_texto(row.get(col))
-                        return None
-
-                    # Validar campos requeridos
-                    nombre = obtener_valor('nombre') or "NO INFORMADO"
-                    apellido_paterno = obtener_valor('apellido_paterno') or "NO INFORMADO"
-                    apellido_materno = obtener_valor('apellido_materno') or "NO INFORMADO"
-
-                    # Validar que el RUT no esté vacío
-                    if not rut or rut == '':
-                        errores_validacion += 1
+        total = None if total_leidas is None else max(total_leidas - importacion.inicio, 0)
+        primer_bloque = True
+
+        with tqdm(total=total, desc='Importando pacientes', unit='reg') as pbar:
+            for df in importacion.bloques():
+                df.columns = columnas
+                # Reemplazar NaN por cadenas vacías para procesamiento consistente
+                df = df.fillna('')
+
+                if primer_bloque:
+                    # Mostrar primeras filas para verificación
+                    self.stdout.write(self.style.SUCCESS('\nPrimeras filas para verificación:'))
+                    for i in range(min(3, len(df))):
+                        self.stdout.write(f'Fila {df.index[i]}: {dict(df.iloc[i].head(5))}')
+                    primer_bloque = False
+
+                # RUTs repetidos dentro del Excel (primer valor no vacío de las columnas de RUT)
+                if columnas_rut_excel:
+                    ruts_bloque = df[columnas_rut_excel[0]].astype(str).str.strip()
+                    for col_name in columnas_rut_excel[1:]:
+                        ruts_bloque = ruts_bloque.where(ruts_bloque != '', df[col_name].astype(str).str.strip())
+                    ruts_bloque = ruts_bloque[ruts_bloque != ''].str.upper()
+                    repetidos = ruts_bloque.duplicated() | ruts_bloque.isin(ruts_excel)
+                    duplicados_excel += int(repetidos.sum())
+                    ruts_excel.update(ruts_bloque)
+
+                # Normalización vectorizada de las columnas (mismas reglas que Paciente.save): los RUT quedan con
+                # puntos y guion antes de compararlos con los existentes en BD
+                normalizar_dataframe(df, columnas_normalizadas)
+
+                # Códigos reservados antes de abrir la transacción del bloque, en una transacción corta: la
+                # fila de la secuencia no queda bloqueada mientras se procesa el bloque y los pacientes
+                # creados desde la aplicación no esperan a la importación. Los sobrantes (filas omitidas o
+                # bloque revertido) quedan como huecos.
+                codigos = reservar_codigos_paciente(len(df))
+
+                # Pacientes del bloque y punto de control se confirman juntos
+                with importacion.transaccion():
+                    for index, row in df.iterrows():
+                        try:
+                            # Obtener RUT usando el mapeo de columnas
+                            rut = None
+                            col_rut = mapeo_columnas['rut']
+                            if col_rut:
+                                rut = self.limpiar_texto(row.get(col_rut))
+
+                            if not rut:
+                                sin_rut += 1
+                                pbar.update(1)
+                                continue
+
+                            rut = rut.strip().upper()
+
+                            # Verificar si ya existe en BD
+                            if rut in ruts_existentes:
+                                self.stdout.write(
+                                    self.style.WARNING(
+                                        f'Paciente con RUT {rut} ya existe en la base de datos. Se ingresará como duplicado.'))
+                                duplicados_insertados += 1
+                                # No omitimos, permitimos que siga y se cree
+
+                            # BUSCAR COMUNA POR CÓDIGO
+                            codigo_comuna = None
+                            col_comuna = mapeo_columnas['comuna']
+                            if col_comuna:
+                                codigo_comuna = self.limpiar_entero(row.get(col_comuna))
+
+                            comuna = self.buscar_comuna_por_codigo(codigo_comuna, comunas_por_codigo)
+
+                            if not comuna:
+                                comuna = COMUNA_DEFAULT
+                                comuna_default_count += 1
+
+                            # BUSCAR PREVISIÓN POR CÓDIGO
+                            # Intentar con 'prevision' y luego con 'prevision2'
+                            codigo_prevision = None
+                            col_prevision = mapeo_columnas['prevision']
+                            if col_prevision:
+                                codigo_prevision = self.limpiar_entero(row.get(col_prevision))
+
+                            if codigo_prevision is None or codigo_prevision == 0:
+                                col_prevision2 = mapeo_columnas['prevision2']
+                                if col_prevision2:
+                                    codigo_prevision = self.limpiar_entero(row.get(col_prevision2))
+
+                            prevision = None
+                            if codigo_prevision:
+                                prevision = self.buscar_prevision_por_codigo(codigo_prevision, previsiones_por_codigo)
+
+                            if not prevision:
+                                prevision_no_encontrada += 1
+                                # No asignar previsión si no se encuentra
+
+                            # PROCESAR FECHA DE NACIMIENTO
+                            fecha_nacimiento_raw = None
+                            col_fecha_nac = mapeo_columnas['fecha_nacimiento']
+                            if col_fecha_nac:
+                                fecha_nacimiento_raw = row.get(col_fecha_nac)
+                            fecha_nacimiento = self.limpiar_fecha(fecha_nacimiento_raw)
+
+                            # BUSCAR USUARIO ANTERIOR POR RUT
+                            usuario_rut = None
+                            col_usuario = mapeo_columnas['usuario']
+                            if col_usuario:
+                                usuario_rut = self.limpiar_texto(row.get(col_usuario))
+                            usuario_anterior = usuarios_anteriores.get(usuario_rut) if usuario_rut else None
+
+                            # Obtener otros campos usando el mapeo
+                            def obtener_valor(campo):
+                                col = mapeo_columnas.get(campo)
+                                if col and col in row:
+                                    return self.limpiar_texto(row.get(col))
+                                return None
+
+                            # Validar campos requeridos
+                            nombre = obtener_valor('nombre') or "NO INFORMADO"
+                            apellido_paterno = obtener_valor('apellido_paterno') or "NO INFORMADO"
+                            apellido_materno = obtener_valor('apellido_materno') or "NO INFORMADO"
+
+                            # Validar que el RUT no esté vacío
+                            if not rut or rut == '':
+                                errores_validacion += 1
+                                pbar.update(1)
+                                continue
+
+                            # CREAR PACIENTE
+                            paciente = Paciente(
+                                rut=rut,
+                                id_anterior=self.limpiar_entero(obtener_valor('id_anterior')),
+                                nombre=nombre,
+                                apellido_paterno=apellido_paterno,
+                                apellido_materno=apellido_materno,
+                                rut_madre=obtener_valor('rut_madre'),
+                                pasaporte=obtener_valor('pasaporte'),
+                                nombre_social=obtener_valor('nombre_social'),
+                                fecha_nacimiento=fecha_nacimiento,
+                                sexo=self.limpiar_sexo(obtener_valor('sexo')),
+                                estado_civil=self.limpiar_estado_civil(obtener_valor('estado_civil')),
+                                direccion=obtener_valor('direccion'),
+                                numero_telefono1=obtener_valor('numero_telefono1'),
+                                numero_telefono2=obtener_valor('numero_telefono2'),
+                                comuna=comuna,
+                                prevision=prevision,
+                                recien_nacido=self.limpiar_bool(obtener_valor('recien_nacido')),
+                                extranjero=self.limpiar_bool(obtener_valor('extranjero')),
+                                fallecido=self.limpiar_bool(obtener_valor('fallecido')),
+                                fecha_fallecimiento=self.limpiar_fecha(obtener_valor('fecha_fallecimiento')),
+                                usuario_anterior=usuario_anterior,
+                                nombres_padre=obtener_valor('nombres_padre'),
+                                nombres_madre=obtener_valor('nombres_madre'),
+                                nombre_pareja=obtener_valor('nombre_pareja'),
+                                ocupacion=obtener_valor('ocupacion'),
+                                representante_legal=obtener_valor('representante_legal'),
+                            )
+
+                            if paciente.recien_nacido:
+                                rn_creados += 1
+
+                            buffer.append(paciente)
+                            ruts_existentes.add(rut)  # Agregar a la lista para evitar duplicados en este proceso
+                            creados += 1
+
+                            # Guardar en lotes
+                            if len(buffer) >= BATCH_SIZE:
+                                # Códigos asignados fuera del savepoint del lote: si el lote falla, el
+                                # guardado uno a uno reutiliza los mismos códigos
+                                asignar_codigos_paciente(buffer, codigos)
+                                try:
+                                    with transaction.atomic():
+                                        Paciente.objects.bulk_create(buffer, batch_size=BATCH_SIZE, ignore_conflicts=False)
+                                    buffer.clear()
+                                except Exception as e:
+                                    # Si hay error, guardar uno por uno para identificar el problema
+                                    self.stdout.write(self.style.WARNING(f'\nError en bulk_create: {str(e)[:100]}'))
+                                    exitosos_lote = 0
+                                    fallidos_lote = 0
+                                    for p in buffer:
+                                        try:
+                                            with transaction.atomic():
+                                                p.save()
+                                            exitosos_lote += 1
+                                        except Exception as e2:
+                                            fallidos_lote += 1
+                                            # Solo mostrar algunos errores para no saturar
+                                            if fallidos_lote <= 5:
+                                                self.stdout.write(
+                                                    self.style.WARNING(f'Error guardando {p.rut}: {str(e2)[:100]}'))
+                                    buffer.clear()
+                                    creados -= fallidos_lote  # Ajustar contador
+                                    errores_validacion += fallidos_lote
+
+                        except Exception as e:
+                            errores_validacion += 1
+                            # Solo mostrar algunos errores
+                            if errores_validacion <= 10:
+                                self.stdout.write(self.style.WARNING(f'Error en fila {index}: {str(e)[:100]}'))
+
                         pbar.update(1)
-                        continue
-
-                    # CREAR PACIENTE
-                    paciente = Paciente(
-                        rut=rut,
-                        id_anterior=self.limpiar_entero(obtener_valor('id_anterior')),
-                        nombre=nombre,
-                        apellido_paterno=apellido_paterno,
-                        apellido_materno=apellido_materno,
-                        rut_madre=obtener_valor('rut_madre'),
-                        pasaporte=obtener_valor('pasaporte'),
-                        nombre_social=obtener_valor('nombre_social'),
-                        fecha_nacimiento=fecha_nacimiento,
-                        sexo=self.limpiar_sexo(obtener_valor('sexo')),
-                        estado_civil=self.limpiar_estado_civil(obtener_valor('estado_civil')),
-                        direccion=obtener_valor('direccion'),
-                        numero_telefono1=obtener_valor('numero_telefono1'),
-                        numero_telefono2=obtener_valor('numero_telefono2'),
-                        comuna=comuna,
-                        prevision=prevision,
-                        recien_nacido=self.limpiar_bool(obtener_valor('recien_nacido')),
-                        extranjero=self.limpiar_bool(obtener_valor('extranjero')),
-                        fallecido=self.limpiar_bool(obtener_valor('fallecido')),
-                        fecha_fallecimiento=self.limpiar_fecha(obtener_valor('fecha_fallecimiento')),
-                        usuario_anterior=usuario_anterior,
-                        nombres_padre=obtener_valor('nombres_padre'),
-                        nombres_madre=obtener_valor('nombres_madre'),
-                        nombre_pareja=obtener_valor('nombre_pareja'),
-                        ocupacion=obtener_valor('ocupacion'),
-                        representante_legal=obtener_valor('representante_legal'),
-                    )
-
-                    if paciente.recien_nacido:
-                        rn_creados += 1
-
-                    buffer.append(paciente)
-                    ruts_existentes.add(rut)  # Agregar a la lista para evitar duplicados en este proceso
-                    creados += 1
-
-                    # Guardar en lotes
-                    if len(buffer) >= BATCH_SIZE:
+
+                    # Guardar cualquier registro restante del bloque
+                    if buffer:
+                        asignar_codigos_paciente(buffer, codigos)
                         try:
                             with transaction.atomic():
                                 Paciente.objects.bulk_create(buffer, batch_size=BATCH_SIZE, ignore_conflicts=False)
-                            buffer.clear()
                         except Exception as e:
-                            # Si hay error, guardar uno por uno para identificar el problema
-                            self.stdout.write(self.style.WARNING(f'\nError en bulk_create: {str(e)[:100]}'))
+                            self.stdout.write(
+                                self.style.WARNING(f'\nError en bulk_create al cerrar el bloque: {str(e)[:100]}'))
                             exitosos_lote = 0
                             fallidos_lote = 0
                             for p in buffer:
@@ -493,47 +554,29 @@ class Command(BaseCommand):
                                     exitosos_lote += 1
                                 except Exception as e2:
                                     fallidos_lote += 1
-                                    # Solo mostrar algunos errores para no saturar
-                                    if fallidos_lote <= 5:
-                                        self.stdout.write(
-                                            self.style.WARNING(f'Error guardando {p.rut}: {str(e2)[:100]}'))
-                            buffer.clear()
-                            creados -= fallidos_lote  # Ajustar contador
+                            creados -= fallidos_lote
                             errores_validacion += fallidos_lote
+                        buffer.clear()
 
-                except Exception as e:
-                    errores_validacion += 1
-                    # Solo mostrar algunos errores
-                    if errores_validacion <= 10:
-                        self.stdout.write(self.style.WARNING(f'Error en fila {index}: {str(e)[:100]}'))
+        importacion.finalizar()
 
-                pbar.update(1)
+        if duplicados_excel > 0:
+            self.stdout.write(self.style.WARNING(f'RUTs duplicados en Excel: {duplicados_excel:,}'))
 
-            # Guardar cualquier registro restante
-            if buffer:
-                try:
-                    with transaction.atomic():
-                        Paciente.objects.bulk_create(buffer, batch_size=BATCH_SIZE, ignore_conflicts=False)
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f'\nError en último bulk_create: {str(e)[:100]}'))
-                    exitosos_lote = 0
-                    fallidos_lote = 0
-                    for p in buffer:
-                        try:
-                            with transaction.atomic():
-                                p.save()
-                            exitosos_lote += 1
-                        except Exception as e2:
-                            fallidos_lote += 1
-                    buffer.clear()
-                    creados -= fallidos_lote
-                    errores_validacion += fallidos_lote
+        # ================== ÍNDICE DE NOMBRES ==================
+
+        # bulk_create no pasa por save(): indexar los nombres de los pacientes nuevos
+        self.stdout.write(self.style.SUCCESS('\nIndexando nombres de pacientes nuevos...'))
+        call_command('reconstruir_indice_nombres', desde_id=ultimo_id_previo)
+
+        # Tampoco emite señales: recalcular los contadores del dashboard
+        call_command('reconciliar_contadores')
 
         # ================== RESUMEN ==================
 
         self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
         self.stdout.write(self.style.SUCCESS('RESUMEN FINAL'))
-        self.stdout.write(self.style.SUCCESS(f'Registros en Excel: {total_leidas:,}'))
+        self.stdout.write(self.style.SUCCESS(f'Registros leídos en esta ejecución: {importacion.filas_leidas:,}'))
         self.stdout.write(self.style.WARNING(f'RUTs duplicados en Excel: {duplicados_excel:,}'))
         self.stdout.write(self.style.SUCCESS(f'Procesados exitosamente: {creados:,}'))
         self.stdout.write(self.style.WARNING(f'Duplicados insertados: {duplicados_insertados:,}'))
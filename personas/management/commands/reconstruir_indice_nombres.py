@@ -0,0 +1,44 @@
+# python manage.py reconstruir_indice_nombres --batch-size 5000
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from personas.models.paciente_nombre_token import PacienteNombreToken
+from personas.models.pacientes import Paciente
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda por nombre de pacientes (PacienteNombreToken).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Pacientes por lote (por defecto: 5000)')
+        parser.add_argument('--desde-id', type=int, default=0, help='Reconstruir solo pacientes con ID mayor a este')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        desde_id = options['desde_id']
+
+        qs = Paciente.objects.filter(id__gt=desde_id).only(
+            'id', 'nombre', 'apellido_paterno', 'apellido_materno'
+        ).order_by('id')
+        total = qs.count()
+
+        self.stdout.write(self.style.SUCCESS(f'Pacientes a indexar: {total:,}'))
+
+        tokens_creados = 0
+        ultimo_id = desde_id
+
+        with tqdm(total=total, desc='Indexando nombres', unit='pac') as pbar:
+            while True:
+                lote = list(qs.filter(id__gt=ultimo_id)[:batch_size])
+                if not lote:
+                    break
+
+                tokens_creados += PacienteNombreToken.reconstruir(lote)
+                ultimo_id = lote[-1].id
+                pbar.update(len(lote))
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Pacientes indexados: {total:,}'))
+        self.stdout.write(self.style.SUCCESS(f'Tokens creados: {tokens_creados:,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
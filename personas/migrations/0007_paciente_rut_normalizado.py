@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+from core.validations import clean_rut
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    Paciente = apps.get_model('personas', 'Paciente')
+    batch = []
+    for paciente in Paciente.objects.only('id', 'rut').iterator(chunk_size=2000):
+        paciente.rut_normalizado = clean_rut(paciente.rut) or None
+        batch.append(paciente)
+        if len(batch) >= 2000:
+            Paciente.objects.bulk_update(batch, ['rut_normalizado'])
+            batch = []
+    if batch:
+        Paciente.objects.bulk_update(batch, ['rut_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personas', '0006_alter_historicalpaciente_genero_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpaciente',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True, verbose_name='R.U.T. Normalizado'),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True, verbose_name='R.U.T. Normalizado'),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personas', '0007_paciente_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PacienteNombreToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100, verbose_name='Token')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nombre_tokens', to='personas.paciente', verbose_name='Paciente')),
+            ],
+            options={
+                'verbose_name': 'Token de Nombre de Paciente',
+                'verbose_name_plural': 'Tokens de Nombres de Pacientes',
+                'indexes': [models.Index(fields=['token', 'paciente'], name='paciente_token_idx')],
+                'constraints': [models.UniqueConstraint(fields=('paciente', 'token'), name='unique_token_por_paciente')],
+            },
+        ),
+    ]
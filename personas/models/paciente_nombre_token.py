@@ -0,0 +1,71 @@
+from django.db import models, transaction
+
+from core.utils.search_utils import tokenize_search_text
+
+CAMPOS_NOMBRE = ('nombre', 'apellido_paterno', 'apellido_materno')
+
+
+class PacienteNombreToken(models.Model):
+    """
+    Índice invertido de nombres de paciente: una fila por palabra (sin tildes y en mayúsculas)
+    de nombre, apellido paterno o apellido materno. Lo usa la búsqueda por nombre cuando
+    settings.PACIENTE_NAME_SEARCH_INDEX está activo.
+    """
+    paciente = models.ForeignKey('personas.Paciente', on_delete=models.CASCADE, related_name='nombre_tokens',
+                                 verbose_name='Paciente')
+    token = models.CharField(max_length=100, verbose_name='Token')
+
+    def __str__(self):
+        return f'{self.token} - {self.paciente_id}'
+
+    class Meta:
+        verbose_name = 'Token de Nombre de Paciente'
+        verbose_name_plural = 'Tokens de Nombres de Pacientes'
+        constraints = [
+            models.UniqueConstraint(fields=['paciente', 'token'], name='unique_token_por_paciente'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'paciente'], name='paciente_token_idx'),
+        ]
+
+    @staticmethod
+    def tokens_de(paciente):
+        tokens = set()
+        for campo in CAMPOS_NOMBRE:
+            tokens.update(tokenize_search_text(getattr(paciente, campo, None)))
+        return tokens
+
+    @classmethod
+    def sincronizar(cls, paciente):
+        """Actualiza los tokens de un paciente tocando solo las filas que cambiaron."""
+        nuevos = cls.tokens_de(paciente)
+        actuales = set(cls.objects.filter(paciente_id=paciente.pk).values_list('token', flat=True))
+
+        with transaction.atomic():
+            if actuales - nuevos:
+                cls.objects.filter(paciente_id=paciente.pk, token__in=actuales - nuevos).delete()
+            if nuevos - actuales:
+                cls.objects.bulk_create(
+                    [cls(paciente_id=paciente.pk, token=token) for token in nuevos - actuales],
+                    ignore_conflicts=True,
+                )
+
+    @classmethod
+    def reconstruir(cls, pacientes, batch_size=2000):
+        """
+        Reconstruye los tokens de un lote de pacientes (instancias o queryset) con un DELETE
+        y un INSERT masivo. Devuelve la cantidad de tokens creados.
+        """
+        pacientes = [p for p in pacientes if p.pk]
+        if not pacientes:
+            return 0
+
+        filas = [
+            cls(paciente_id=paciente.pk, token=token)
+            for paciente in pacientes
+            for token in cls.tokens_de(paciente)
+        ]
+        with transaction.atomic():
+            cls.objects.filter(paciente_id__in=[p.pk for p in pacientes]).delete()
+            cls.objects.bulk_create(filas, batch_size=batch_size, ignore_conflicts=True)
+        return len(filas)
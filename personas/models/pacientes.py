@@ -1,17 +1,49 @@
+from django.conf import settings
 from django.db import models
 from simple_history.models import HistoricalRecords
 
 from core.choices import ESTADO_CIVIL, SEXO_CHOICES
 from core.models import StandardModel
-from core.validations import validate_rut, format_rut
+from core.utils.catalogos import buscar
 from personas.models.genero import Genero
+from personas.models.paciente_nombre_token import PacienteNombreToken, CAMPOS_NOMBRE
+from personas.normalizacion import normalizar_pacientes
 
 
 def get_genero_no_informado():
-    try:
-        return Genero.objects.get(nombre='NO INFORMADO').id
-    except Genero.DoesNotExist:
-        return None
+    # Desde el catálogo en memoria: se evalúa en cada Paciente() sin género
+    genero = buscar(Genero, nombre='NO INFORMADO')
+    return genero.id if genero else None
+
+
+class PacienteQuerySet(models.QuerySet):
+    """
+    Mantiene ``codigo``, la normalización de campos (personas.normalizacion), ``rut_normalizado`` y el
+    índice de nombres sincronizados en las rutas masivas que no pasan por ``save()`` (importadores con
+    bulk_create / bulk_update).
+    bulk_create no devuelve PKs en MySQL: los importadores reconstruyen el índice de nombres
+    de los pacientes nuevos con PacienteNombreToken.reconstruir().
+    El índice de nombres solo se mantiene con settings.PACIENTE_NAME_SEARCH_INDEX activo; al activarlo se
+    llena con reconstruir_indice_nombres.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from personas.services import asignar_codigos_paciente
+
+        objs = normalizar_pacientes(objs)
+        # Códigos reservados en bloque (una sola consulta a la secuencia por lote)
+        asignar_codigos_paciente(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        objs = normalizar_pacientes(objs, fields)
+        if 'rut' in fields and 'rut_normalizado' not in fields:
+            fields.append('rut_normalizado')
+        updated = super().bulk_update(objs, fields, *args, **kwargs)
+        if settings.PACIENTE_NAME_SEARCH_INDEX and any(campo in fields for campo in CAMPOS_NOMBRE):
+            PacienteNombreToken.reconstruir(objs)
+        return updated
 
 
 class Paciente(StandardModel):
@@ -19,6 +51,9 @@ class Paciente(StandardModel):
     codigo = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='Código')
     id_anterior = models.IntegerField(null=True, blank=True, verbose_name='ID Anterior')
     rut = models.CharField(max_length=100, null=True, blank=True, verbose_name='R.U.T.')
+    # RUT sin puntos ni guion (ej: 209300559), indexado para búsquedas exactas y por prefijo
+    rut_normalizado = models.CharField(max_length=20, null=True, blank=True, db_index=True, editable=False,
+                                       verbose_name='R.U.T. Normalizado')
     nip = models.CharField(max_length=100, null=True, blank=True, verbose_name='NIP')
     nombre = models.CharField(max_length=100, null=False, verbose_name='Nombre')
     rut_madre = models.CharField(max_length=100, null=True, blank=True, verbose_name='R.U.T. Madre')
@@ -81,6 +116,8 @@ class Paciente(StandardModel):
 
     history = HistoricalRecords()
 
+    objects = PacienteQuerySet.as_manager()
+
     @property
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido_paterno} {self.apellido_materno}".strip()
@@ -93,71 +130,23 @@ class Paciente(StandardModel):
         verbose_name_plural = 'Pacientes'
 
     def save(self, *args, **kwargs):
-        # Normalizar campos texto
-        # El usuario indica que el RUT debe guardarse con puntos y guion (ej: 20.930.055-9)
-        if self.rut:
-            self.rut = self.rut.strip().upper()
-            if validate_rut(self.rut):
-                self.rut = format_rut(self.rut)
-
-        if self.rut_madre:
-            self.rut_madre = self.rut_madre.strip().upper()
-            if validate_rut(self.rut_madre):
-                self.rut_madre = format_rut(self.rut_madre)
-
-        if self.rut_responsable_temporal:
-            self.rut_responsable_temporal = self.rut_responsable_temporal.strip().upper()
-            if validate_rut(self.rut_responsable_temporal):
-                self.rut_responsable_temporal = format_rut(self.rut_responsable_temporal)
-
-        if self.nip:
-            self.nip = self.nip.strip().upper()
-        if self.nombre:
-            self.nombre = self.nombre.strip().upper()
-        if self.apellido_paterno:
-            self.apellido_paterno = self.apellido_paterno.strip().upper()
-        if self.apellido_materno:
-            self.apellido_materno = self.apellido_materno.strip().upper()
-        if self.pasaporte:
-            self.pasaporte = self.pasaporte.strip().upper()
-        if self.nombre_social:
-            self.nombre_social = self.nombre_social.strip().upper()
-        if self.estado_civil:
-            self.estado_civil = self.estado_civil.strip().upper()
-        if self.nombres_padre:
-            self.nombres_padre = self.nombres_padre.strip().upper()
-        if self.nombres_madre:
-            self.nombres_madre = self.nombres_madre.strip().upper()
-        if self.nombre_pareja:
-            self.nombre_pareja = self.nombre_pareja.strip().upper()
-        if self.representante_legal:
-            self.representante_legal = self.representante_legal.strip().upper()
-        if self.direccion:
-            self.direccion = self.direccion.strip().upper()
-        if self.numero_telefono1:
-            self.numero_telefono1 = self.numero_telefono1.strip()
-        if self.numero_telefono2:
-            self.numero_telefono2 = self.numero_telefono2.strip()
-        if self.ocupacion:
-            self.ocupacion = self.ocupacion.strip().upper()
-        if self.alergico_a:
-            self.alergico_a = self.alergico_a.strip().upper()
-
-        # Si es creación y no tiene código, hacer primer save sin historial para obtener el ID
-        is_creating = self.pk is None
-        if is_creating and not self.codigo:
-            # deshabilitar historial para este primer guardado
-            setattr(self, '_disable_history', True)
-            super().save(*args, **kwargs)
-            # limpiar flag para que el próximo guardado sí cree historial
-            if hasattr(self, '_disable_history'):
-                delattr(self, '_disable_history')
-
-            # generar y asignar código basado en el ID
-            self.codigo = f"PAC-{self.pk:07d}"
-            # ahora guardar normalmente (esto creará un único registro en el historial con el código)
-            super().save(update_fields=["codigo"])  # no usar signals, ni crear segundo historial previo
-            return
-
-        # Comportamiento normal para updates o creaciones con código previamente definido
+        # Normalizar campos texto (mismas reglas que los bulk_create / bulk_update e importadores)
+        normalizar_pacientes([self])
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rut' in update_fields and 'rut_normalizado' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'rut_normalizado']
+
+        # Si es creación y no tiene código, se reserva de la secuencia antes del INSERT:
+        # una sola escritura y un único registro en el historial (ya con el código)
+        if self.pk is None and not self.codigo:
+            from personas.services import asignar_codigos_paciente
+            asignar_codigos_paciente([self])
+
         super().save(*args, **kwargs)
+
+        # Sin el índice activo no se escriben tokens (se llenan con reconstruir_indice_nombres al activarlo)
+        update_fields = kwargs.get('update_fields')
+        if settings.PACIENTE_NAME_SEARCH_INDEX and (
+                update_fields is None or any(campo in update_fields for campo in CAMPOS_NOMBRE)):
+            PacienteNombreToken.sincronizar(self)
@@ -0,0 +1,94 @@
+from core.validations import clean_rut, normalize_rut
+
+# =========================================================
+# NORMALIZACIÓN DE PACIENTES
+# =========================================================
+# Reglas únicas para Paciente.save(), los bulk_create / bulk_update de PacienteQuerySet y los
+# importadores. Se aplican columna por columna: con pocos registros en Python puro y, desde
+# UMBRAL_VECTORIZADO registros (o sobre un DataFrame), con operaciones vectorizadas de pandas.
+
+# El RUT se guarda con puntos y guion (ej: 20.930.055-9) cuando es válido
+CAMPOS_RUT = ('rut', 'rut_madre', 'rut_responsable_temporal')
+
+CAMPOS_MAYUSCULA = (
+    'nip', 'nombre', 'apellido_paterno', 'apellido_materno', 'pasaporte', 'nombre_social', 'estado_civil',
+    'nombres_padre', 'nombres_madre', 'nombre_pareja', 'representante_legal', 'direccion', 'ocupacion',
+    'alergico_a',
+)
+
+CAMPOS_RECORTAR = ('numero_telefono1', 'numero_telefono2')
+
+CAMPOS_NORMALIZADOS = CAMPOS_RUT + CAMPOS_MAYUSCULA + CAMPOS_RECORTAR
+
+UMBRAL_VECTORIZADO = 200
+
+
+def _regla(campo):
+    if campo in CAMPOS_RUT:
+        return 'rut'
+    if campo in CAMPOS_MAYUSCULA:
+        return 'mayuscula'
+    return 'recortar'
+
+
+def _normalizar_valor(regla, valor):
+    if not valor:
+        return valor
+    if regla == 'rut':
+        return normalize_rut(valor)
+    if regla == 'mayuscula':
+        return valor.strip().upper()
+    return valor.strip()
+
+
+def _normalizar_serie(regla, serie):
+    from core.utils.ruts import normalize_rut_series
+
+    if regla == 'rut':
+        return normalize_rut_series(serie)
+
+    resultado = serie.copy()
+    presentes = serie.notna() & (serie.astype(str) != '')
+    texto = serie[presentes].astype(str).str.strip()
+    resultado[presentes] = texto.str.upper() if regla == 'mayuscula' else texto
+    return resultado
+
+
+def normalizar_dataframe(df, columnas=None):
+    """
+    Normaliza en el lugar las columnas de un DataFrame. ``columnas`` mapea campo de Paciente → nombre
+    de la columna (por defecto, las columnas que se llaman como el campo).
+    """
+    if columnas is None:
+        columnas = {campo: campo for campo in CAMPOS_NORMALIZADOS}
+
+    for campo, columna in columnas.items():
+        if campo in CAMPOS_NORMALIZADOS and columna in df.columns:
+            df[columna] = _normalizar_serie(_regla(campo), df[columna])
+    return df
+
+
+def normalizar_pacientes(pacientes, campos=None):
+    """
+    Normaliza los pacientes dados (solo ``campos`` si se indica) y recalcula ``rut_normalizado``
+    cuando corresponde. Devuelve la lista de pacientes.
+    """
+    pacientes = list(pacientes)
+    campos = CAMPOS_NORMALIZADOS if campos is None else [c for c in campos if c in CAMPOS_NORMALIZADOS]
+    vectorizado = len(pacientes) >= UMBRAL_VECTORIZADO
+
+    for campo in campos:
+        regla = _regla(campo)
+        valores = [getattr(p, campo) for p in pacientes]
+        if vectorizado:
+            import pandas as pd
+            valores = _normalizar_serie(regla, pd.Series(valores, dtype=object)).tolist()
+        else:
+            valores = [_normalizar_valor(regla, v) for v in valores]
+        for paciente, valor in zip(pacientes, valores):
+            setattr(paciente, campo, valor)
+
+    if 'rut' in campos:
+        for paciente in pacientes:
+            paciente.rut_normalizado = clean_rut(paciente.rut) or None
+    return pacientes
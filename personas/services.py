@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Max
+
+from core import secuencias
+from personas.models.pacientes import Paciente
+
+SECUENCIA_CODIGO_PACIENTE = 'codigo_paciente'
+PREFIJO_CODIGO_PACIENTE = 'PAC-'
+
+
+# =========================================================
+# CÓDIGO DE PACIENTE (PAC-0000123)
+# =========================================================
+# El código se toma de una secuencia antes del INSERT, así crear un paciente es una sola escritura
+# (y un solo registro de historial) y los bulk_create también reciben código.
+
+
+def formatear_codigo_paciente(numero):
+    return f'{PREFIJO_CODIGO_PACIENTE}{numero:07d}'
+
+
+def _ultimo_codigo_paciente():
+    """Mayor número de código ya usado. Los códigos anteriores a la secuencia se derivaban del PK."""
+    ultimo_pk = Paciente.objects.aggregate(m=Max('pk'))['m'] or 0
+    ultimo_codigo = Paciente.objects.filter(
+        codigo__startswith=PREFIJO_CODIGO_PACIENTE
+    ).aggregate(m=Max('codigo'))['m']
+
+    try:
+        numero = int(ultimo_codigo[len(PREFIJO_CODIGO_PACIENTE):]) if ultimo_codigo else 0
+    except ValueError:
+        numero = 0
+    return max(ultimo_pk, numero)
+
+
+def reservar_codigos_paciente(cantidad):
+    """
+    Reserva ``cantidad`` códigos en una transacción propia y corta, y los devuelve como iterador para
+    ``asignar_codigos_paciente(..., codigos=...)``. Para importaciones: llamar antes de abrir la
+    transacción del bloque, así la fila de la secuencia no queda bloqueada mientras se procesa; los
+    códigos que no se usen quedan como huecos.
+    """
+    if cantidad < 1:
+        return iter(())
+    with transaction.atomic():
+        numeros = secuencias.reservar(SECUENCIA_CODIGO_PACIENTE, cantidad, inicial=_ultimo_codigo_paciente)
+    return map(formatear_codigo_paciente, numeros)
+
+
+def asignar_codigos_paciente(pacientes, codigos=None):
+    """
+    Asigna código a los pacientes que no lo tienen. Los toma de ``codigos`` (ver
+    ``reservar_codigos_paciente``) y, si no hay o se agotan, de una sola reserva de bloque. Devuelve cuántos.
+    """
+    sin_codigo = [p for p in pacientes if not p.codigo]
+    if not sin_codigo:
+        return 0
+
+    pendientes = sin_codigo
+    if codigos is not None:
+        pendientes = []
+        for paciente in sin_codigo:
+            paciente.codigo = next(codigos, None)
+            if paciente.codigo is None:
+                pendientes.append(paciente)
+
+    if pendientes:
+        numeros = secuencias.reservar(
+            SECUENCIA_CODIGO_PACIENTE, len(pendientes), inicial=_ultimo_codigo_paciente
+        )
+        for paciente, numero in zip(pendientes, numeros):
+            paciente.codigo = formatear_codigo_paciente(numero)
+    return len(sin_codigo)
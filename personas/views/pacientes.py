@@ -297,6 +297,8 @@ def paciente_view(request, paciente_id=None):
 class PacienteListView(DataTableMixin, TemplateView):
     template_name = 'paciente/list.html'
     model = Paciente
+    datatable_keyset = True
+    datatable_compact_rows = True
     datatable_columns = ['ID', 'N° Ficha', 'RUT', 'Nombre', 'Sexo', 'Estado Civil', 'Comuna', 'Observación']
     datatable_order_fields = [
         'id',
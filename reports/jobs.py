@@ -0,0 +1,256 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from clinica.models import Ficha, MovimientoFicha
+from personas.models.pacientes import Paciente
+from .fields_export_csv import fields_ficha_csv, fields_movimiento_ficha_csv, fields_paciente_csv
+from .models import TrabajoExportacion
+from .utils import iter_queryset_csv, iter_queryset_xlsx
+
+# =========================================================
+# CATÁLOGO DE EXPORTACIONES
+# =========================================================
+# queryset(establecimiento_id) arma los datos; por_establecimiento indica si el resultado depende
+# del establecimiento del usuario (y por lo tanto forma parte de la clave de deduplicación).
+
+EXPORTACIONES = {
+    'ficha_csv': {
+        'formato': 'csv', 'archivo': 'fichas', 'campos': fields_ficha_csv, 'por_establecimiento': True,
+        'queryset': lambda est: Ficha.objects.filter(establecimiento_id=est),
+    },
+    'ficha_pasivada_csv': {
+        'formato': 'csv', 'archivo': 'fichas_pasivadas', 'campos': fields_ficha_csv, 'por_establecimiento': True,
+        'queryset': lambda est: Ficha.objects.filter(establecimiento_id=est, pasivado=True),
+    },
+    'movimiento_ficha_csv': {
+        'formato': 'csv', 'archivo': 'movimientos_ficha', 'campos': fields_movimiento_ficha_csv,
+        'por_establecimiento': True,
+        'queryset': lambda est: MovimientoFicha.objects.filter(
+            ficha__establecimiento_id=est
+        ).order_by('-updated_at'),
+    },
+    'movimiento_ficha_envio_csv': {
+        'formato': 'csv', 'archivo': 'movimientos_ficha_enviadas', 'campos': fields_movimiento_ficha_csv,
+        'por_establecimiento': True,
+        'queryset': lambda est: MovimientoFicha.objects.filter(
+            ficha__establecimiento_id=est, estado_envio='ENVIADO'
+        ).order_by('-updated_at'),
+    },
+    'movimiento_ficha_recepcion_csv': {
+        'formato': 'csv', 'archivo': 'movimientos_ficha_recepcionadas', 'campos': fields_movimiento_ficha_csv,
+        'por_establecimiento': True,
+        'queryset': lambda est: MovimientoFicha.objects.filter(
+            ficha__establecimiento_id=est, estado_recepcion='RECIBIDO'
+        ).order_by('-updated_at'),
+    },
+    'movimiento_ficha_traspaso_csv': {
+        'formato': 'csv', 'archivo': 'movimientos_ficha_traspasadas', 'campos': fields_movimiento_ficha_csv,
+        'por_establecimiento': True,
+        'queryset': lambda est: MovimientoFicha.objects.filter(
+            ficha__establecimiento_id=est, estado_traspaso='TRASPASADO'
+        ).order_by('-updated_at'),
+    },
+    'paciente_csv': {
+        'formato': 'csv', 'archivo': 'pacientes', 'campos': fields_paciente_csv, 'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.all(),
+    },
+    'paciente_recien_nacido_csv': {
+        'formato': 'csv', 'archivo': 'pacientes_recien_nacidos_csv', 'campos': fields_paciente_csv,
+        'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.filter(recien_nacido=True),
+    },
+    'paciente_extranjero_csv': {
+        'formato': 'csv', 'archivo': 'pacientes_extranjeros_csv', 'campos': fields_paciente_csv,
+        'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.filter(extranjero=True),
+    },
+    'paciente_fallecido_csv': {
+        'formato': 'csv', 'archivo': 'pacientes_fallecids_csv', 'campos': fields_paciente_csv,
+        'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.filter(fallecido=True),
+    },
+    'paciente_pueblo_indigena_csv': {
+        'formato': 'csv', 'archivo': 'pacientes_pueblo_indigena_csv', 'campos': fields_paciente_csv,
+        'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.filter(pueblo_indigena=True),
+    },
+    'paciente_excel': {
+        'formato': 'xlsx', 'archivo': 'pacientes', 'campos': fields_paciente_csv, 'por_establecimiento': False,
+        'queryset': lambda est: Paciente.objects.all(),
+    },
+}
+
+EN_CURSO = ['PENDIENTE', 'PROCESANDO']
+
+# Un trabajo en curso más antiguo que esto se considera abandonado (ej: reinicio del servidor)
+TRABAJO_ABANDONADO = timedelta(hours=2)
+
+# Cada cuántas filas se guarda el progreso
+PROGRESO_CADA = 5000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_JOBS_WORKERS,
+                                           thread_name_prefix='exportaciones')
+    return _executor
+
+
+def export_dir():
+    path = Path(settings.EXPORT_JOBS_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def nombre_descarga(trabajo):
+    definicion = EXPORTACIONES[trabajo.tipo]
+    return f"{definicion['archivo']}.{definicion['formato']}"
+
+
+class ExportacionOcupada(Exception):
+    """Otra solicitud idéntica mantiene el bloqueo y todavía no registra su trabajo."""
+
+
+@contextmanager
+def _bloqueo(clave, timeout=10):
+    """
+    Exclusión mutua (best effort) entre solicitudes concurrentes con la misma clave. Entrega True si se
+    obtuvo el bloqueo; si otra solicitud lo mantiene más de ``timeout`` entrega False, sin tomarlo ni
+    liberarlo.
+    """
+    lock_key = f'reports:export_lock:{clave}'
+    limite = time.monotonic() + timeout
+    obtenido = cache.add(lock_key, 1, timeout)
+    while not obtenido and time.monotonic() < limite:
+        time.sleep(0.05)
+        obtenido = cache.add(lock_key, 1, timeout)
+    try:
+        yield obtenido
+    finally:
+        if obtenido:
+            cache.delete(lock_key)
+
+
+def calcular_clave(tipo, establecimiento_id):
+    return hashlib.sha1(f'{tipo}:{establecimiento_id}'.encode()).hexdigest()
+
+
+def solicitar_exportacion(tipo, usuario):
+    """
+    Encola una exportación y devuelve (trabajo, creado). Si ya hay un trabajo idéntico en curso, o uno
+    completado hace menos de EXPORT_JOBS_REUSE segundos cuyo archivo sigue en disco, devuelve ese en lugar
+    de crear otro. Lanza ExportacionOcupada si otra solicitud idéntica mantiene
+    el bloqueo sin llegar a registrar su trabajo.
+    """
+    definicion = EXPORTACIONES[tipo]
+    establecimiento_id = getattr(usuario, 'establecimiento_id', None) if definicion['por_establecimiento'] else None
+    clave = calcular_clave(tipo, establecimiento_id)
+
+    purgar_vencidos()
+
+    with _bloqueo(clave) as obtenido:
+        ahora = timezone.now()
+        trabajo = TrabajoExportacion.objects.filter(
+            Q(estado__in=EN_CURSO, created_at__gte=ahora - TRABAJO_ABANDONADO)
+            | Q(estado='COMPLETADO', finished_at__gte=ahora - timedelta(seconds=settings.EXPORT_JOBS_REUSE),
+                expires_at__gt=ahora),
+            clave=clave,
+        ).order_by('-id').first()
+        if trabajo and (trabajo.estado != 'COMPLETADO' or (export_dir() / trabajo.archivo).exists()):
+            return trabajo, False
+        if not obtenido:
+            raise ExportacionOcupada('Ya hay una solicitud de esta exportación en curso, intente nuevamente')
+
+        trabajo = TrabajoExportacion.objects.create(
+            tipo=tipo,
+            clave=clave,
+            usuario=usuario if getattr(usuario, 'pk', None) else None,
+            establecimiento_id=establecimiento_id,
+        )
+
+    transaction.on_commit(lambda: _get_executor().submit(ejecutar_trabajo, trabajo.pk))
+    return trabajo, True
+
+
+def ejecutar_trabajo(trabajo_id):
+    """Genera el archivo de un trabajo PENDIENTE. Seguro ante ejecuciones duplicadas."""
+    try:
+        tomado = TrabajoExportacion.objects.filter(pk=trabajo_id, estado='PENDIENTE').update(
+            estado='PROCESANDO', started_at=timezone.now()
+        )
+        if not tomado:
+            return
+
+        trabajo = TrabajoExportacion.objects.get(pk=trabajo_id)
+        definicion = EXPORTACIONES[trabajo.tipo]
+        queryset = definicion['queryset'](trabajo.establecimiento_id)
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(total=queryset.count())
+
+        def progreso(filas):
+            TrabajoExportacion.objects.filter(pk=trabajo_id).update(progreso=filas)
+
+        if definicion['formato'] == 'xlsx':
+            partes = iter_queryset_xlsx(queryset, fields=definicion['campos'], chunk_size=PROGRESO_CADA,
+                                        progress=progreso)
+        else:
+            partes = iter_queryset_csv(queryset, fields=definicion['campos'], chunk_size=PROGRESO_CADA,
+                                       progress=progreso)
+
+        nombre = f"{trabajo_id}_{definicion['archivo']}.{definicion['formato']}"
+        destino = export_dir() / nombre
+        temporal = destino.with_name(nombre + '.part')
+        try:
+            with open(temporal, 'wb') as fh:
+                for parte in partes:
+                    fh.write(parte.encode('utf-8') if isinstance(parte, str) else parte)
+            os.replace(temporal, destino)
+        finally:
+            if temporal.exists():
+                temporal.unlink()
+
+        ahora = timezone.now()
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            estado='COMPLETADO',
+            archivo=nombre,
+            finished_at=ahora,
+            expires_at=ahora + timedelta(seconds=settings.EXPORT_JOBS_TTL),
+        )
+    except Exception as e:
+        ahora = timezone.now()
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            estado='ERROR',
+            error=str(e),
+            finished_at=ahora,
+            expires_at=ahora + timedelta(seconds=settings.EXPORT_JOBS_TTL),
+        )
+    finally:
+        # La conexión es propia del hilo del pool
+        connection.close()
+
+
+def purgar_vencidos(forzar=False):
+    """Elimina archivos y registros de trabajos vencidos (como máximo una vez por minuto)."""
+    if not forzar and not cache.add('reports:export_purge', 1, 60):
+        return 0
+
+    vencidos = TrabajoExportacion.objects.filter(expires_at__lt=timezone.now())
+    for archivo in vencidos.exclude(archivo__isnull=True).values_list('archivo', flat=True):
+        (Path(settings.EXPORT_JOBS_DIR) / archivo).unlink(missing_ok=True)
+    return vencidos.delete()[0]
@@ -0,0 +1,36 @@
+# python manage.py procesar_exportaciones
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tqdm import tqdm
+
+from reports.jobs import EN_CURSO, TRABAJO_ABANDONADO, ejecutar_trabajo, purgar_vencidos
+from reports.models import TrabajoExportacion
+
+
+class Command(BaseCommand):
+    help = ('Procesa las exportaciones pendientes (ej: tras un reinicio del servidor), marca como error las '
+            'abandonadas y elimina los archivos vencidos.')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        abandonados = TrabajoExportacion.objects.filter(
+            estado__in=EN_CURSO,
+            created_at__lt=ahora - TRABAJO_ABANDONADO,
+        ).update(estado='ERROR', error='Trabajo abandonado', finished_at=ahora,
+                 expires_at=ahora + timedelta(seconds=settings.EXPORT_JOBS_TTL))
+
+        pendientes = list(TrabajoExportacion.objects.filter(estado='PENDIENTE').order_by('id').values_list('id', flat=True))
+        for trabajo_id in tqdm(pendientes, desc='Procesando exportaciones', unit='trabajo'):
+            ejecutar_trabajo(trabajo_id)
+
+        eliminados = purgar_vencidos(forzar=True)
+
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Exportaciones procesadas: {len(pendientes):,}'))
+        self.stdout.write(self.style.SUCCESS(f'Exportaciones abandonadas: {abandonados:,}'))
+        self.stdout.write(self.style.SUCCESS(f'Exportaciones vencidas eliminadas: {eliminados:,}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('establecimientos', '0003_alter_servicioclinico_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo de Exportación')),
+                ('clave', models.CharField(max_length=40, verbose_name='Clave')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('COMPLETADO', 'Completado'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('progreso', models.PositiveIntegerField(default=0, verbose_name='Filas Escritas')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de Filas')),
+                ('archivo', models.CharField(blank=True, max_length=255, null=True, verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha Solicitud')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Término')),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Fecha Expiración')),
+                ('establecimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_exportacion', to='establecimientos.establecimiento', verbose_name='Establecimiento')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_exportacion', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado Por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'indexes': [models.Index(fields=['clave', 'estado'], name='trabajo_export_clave_idx')],
+            },
+        ),
+    ]
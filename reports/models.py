@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación ejecutada en segundo plano (reports.jobs). El archivo generado queda en
+    EXPORT_JOBS_DIR hasta ``expires_at``.
+    """
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=50, verbose_name='Tipo de Exportación')
+    # Identifica solicitudes idénticas (tipo + alcance) para no duplicar trabajos en curso
+    clave = models.CharField(max_length=40, verbose_name='Clave')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado')
+
+    progreso = models.PositiveIntegerField(default=0, verbose_name='Filas Escritas')
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name='Total de Filas')
+    archivo = models.CharField(max_length=255, null=True, blank=True, verbose_name='Archivo')
+    error = models.TextField(null=True, blank=True, verbose_name='Error')
+
+    usuario = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True,
+                                verbose_name='Solicitado Por', related_name='trabajos_exportacion')
+    # Alcance de los datos: None para exportaciones globales (ej: pacientes)
+    establecimiento = models.ForeignKey('establecimientos.Establecimiento', on_delete=models.CASCADE, null=True,
+                                        blank=True, verbose_name='Establecimiento',
+                                        related_name='trabajos_exportacion')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha Solicitud')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha Inicio')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha Término')
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Fecha Expiración')
+
+    def __str__(self):
+        return f'{self.tipo} #{self.pk} - {self.estado}'
+
+    class Meta:
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+        indexes = [
+            models.Index(fields=['clave', 'estado'], name='trabajo_export_clave_idx'),
+        ]
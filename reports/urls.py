@@ -28,6 +28,7 @@ urlpatterns = [
 
     # === PACIENTES (EXPORTACIÓN CSV) ===
     path('export/paciente-csv/', views.export_paciente_csv, name='export_paciente_csv'),
+    path('export/paciente-excel/', views.export_paciente_excel, name='export_paciente_excel'),
     path('export/paciente_recien_nacido-csv/', views.export_paciente_recien_nacido_csv,
          name='export_paciente_recien_nacido_csv'),
     path('export/paciente_extranjero-csv/', views.export_paciente_extranjero_csv,
@@ -37,4 +38,8 @@ urlpatterns = [
     path('export/paciente_pueblo_indigena-csv/', views.export_paciente_pueblo_indigena_csv,
          name='export_paciente_pueblo_indigena_csv'),
 
+    # === EXPORTACIONES EN SEGUNDO PLANO ===
+    path('export/trabajos/<str:tipo>/solicitar/', views.solicitar_exportacion_view, name='export_trabajo_solicitar'),
+    path('export/trabajos/<int:pk>/', views.estado_exportacion_view, name='export_trabajo_status'),
+    path('export/trabajos/<int:pk>/descargar/', views.descargar_exportacion_view, name='export_trabajo_descargar'),
 ]
@@ -1,12 +1,20 @@
-import io
-from time import timezone
+import csv
+import decimal
+import itertools
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape as xml_escape
 
 import openpyxl
-from django.http import HttpResponse
-from openpyxl import Workbook
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from openpyxl.styles import Font, Alignment
 from openpyxl.utils import get_column_letter
 
+from core.utils.catalogos import es_catalogo, etiquetas
+from core.utils.history_diff import build_history_diffs
+
 
 def export_queryset_to_excel(queryset, filename='reporte', excluded_fields=None):
     wb = openpyxl.Workbook()
@@ -94,23 +102,37 @@ def export_generic_history_to_excel(queryset, filename='historial', sheet_title=
     example_entry = queryset.first()
     json_data_keys = list(example_entry.data.keys()) if hasattr(example_entry, 'data') else []
 
+    # Registros de django-simple-history: se agrega la columna de cambios (CambioHistorico)
+    history_base_model = getattr(model, 'instance_type', None)
+
     # Combinar encabezados
-    headers = base_fields + json_data_keys
+    headers = base_fields + json_data_keys + (['cambios'] if history_base_model else [])
     ws.append(headers)
 
-    # Escribir filas
-    for entry in queryset:
-        base_values = []
-        for field in base_fields:
-            value = getattr(entry, field)
-            base_values.append(str(value) if value is not None else '')
+    # Escribir filas por lotes (los cambios de cada lote se leen en una sola consulta)
+    entries = queryset.iterator(chunk_size=2000)
+    while True:
+        batch = list(itertools.islice(entries, 2000))
+        if not batch:
+            break
+        diffs = build_history_diffs(history_base_model, batch) if history_base_model else {}
+
+        for entry in batch:
+            base_values = []
+            for field in base_fields:
+                value = getattr(entry, field)
+                base_values.append(str(value) if value is not None else '')
 
-        data_values = []
-        for key in json_data_keys:
-            value = entry.data.get(key, '')
-            data_values.append(str(value))
+            data_values = []
+            for key in json_data_keys:
+                value = entry.data.get(key, '')
+                data_values.append(str(value))
 
-        ws.append(base_values + data_values)
+            if history_base_model:
+                changes = diffs.get(entry.history_id) or []
+                data_values.append('; '.join(f'{label}: {old} → {new}' for label, old, new in changes))
+
+            ws.append(base_values + data_values)
 
     # Preparar respuesta
     response = HttpResponse(
@@ -172,76 +194,304 @@ def export_extended_queryset_to_excel(queryset, fields, filename='reporte', shee
 
 def export_queryset_to_excel_advance(queryset, filename='reporte', excluded_fields=None):
     """
-    Exporta un queryset grande a Excel (.xlsx) de forma eficiente usando openpyxl en modo write_only.
-    - Evita sobrecargar la RAM.
-    - Normaliza datetimes timezone-aware a timezone-naive.
+    Exporta un queryset grande a Excel (.xlsx). Se mantiene por compatibilidad:
+    delega en stream_queryset_to_excel.
+    """
+    return stream_queryset_to_excel(queryset, filename=filename, excluded_fields=excluded_fields)
+
+
+# =========================================================
+# XLSX EN STREAMING (memoria constante)
+# =========================================================
+# El .xlsx es un zip: la hoja se escribe fila a fila dentro de una entrada del zip y los bytes
+# comprimidos se envían al cliente a medida que se producen. Se usan inlineStr (sin tabla de
+# strings compartidos) para no acumular nada en memoria.
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Campos del modelo relacionado que se usan como etiqueta de una FK (en orden de preferencia)
+FK_LABEL_FIELDS = ['nombre', 'nombres', 'username', 'descripcion', 'codigo', 'rut']
+
+XLSX_ILLEGAL_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos: 0 normal, 1 título (negrita 14 centrado), 2 encabezado (negrita)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="3"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="14"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1">'
+        '<alignment horizontal="center" vertical="center"/></xf>'
+        '<xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+class _ZipStreamBuffer:
+    """Destino no posicionable para ZipFile: acumula los bytes hasta que el generador los envía."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _fk_label_field(field):
+    related_fields = {f.name for f in field.related_model._meta.concrete_fields}
+    return next((name for name in FK_LABEL_FIELDS if name in related_fields), None)
+
+
+def _fk_label_lookup(field):
+    name = _fk_label_field(field)
+    return f'{field.name}__{name}' if name else f'{field.name}_id'
+
+
+def _catalog_labels(field, name):
+    """Etiquetas {id: valor} de una FK a un catálogo en memoria: se exporta el id, sin JOIN."""
+    return etiquetas(field.related_model, name, vacio='')
+
+
+def _resolve_export_columns(model, fields=None, excluded_fields=None):
+    """
+    Devuelve [(lookup, encabezado, mapa_choices)] para values_list().
+    - Sin ``fields``: campos concretos del modelo; las FK se exportan con la etiqueta del relacionado.
+    - Con ``fields``: rutas tipo values() ('rut', 'comuna__nombre', ...).
     """
-    model = queryset.model
-    opts = model._meta
     excluded_fields = excluded_fields or []
+    columns = []
 
-    # === Crear workbook optimizado ===
-    wb = Workbook(write_only=True)
-    ws = wb.create_sheet(title="Reporte")
-
-    # === Título ===
-    title = opts.verbose_name_plural.title()
-    ws.append([title])
-    ws.append([])  # fila vacía
-
-    # === Encabezados ===
-    fields = [f for f in opts.concrete_fields if f.name not in excluded_fields]
-    headers = [f.verbose_name.title() for f in fields]
-    ws.append(headers)
-
-    # === Escribir filas (sin cargar all en memoria) ===
-    for obj in queryset.iterator(chunk_size=10000):
-        row = []
-        for field in fields:
-            # Si el campo tiene choices → usar display
-            if field.choices:
-                value = getattr(obj, f"get_{field.name}_display")()
-            else:
-                value = getattr(obj, field.name)
-
-            # Normalizar valores
-            if value is None:
-                row.append('')
-            elif isinstance(value, (str, int, float, bool)):
-                row.append(value)
-            elif isinstance(value, datetime):
-                # Convertir timezone-aware a naive de forma segura
-                if value.tzinfo is not None:
-                    try:
-                        value = value.astimezone(timezone.utc).replace(tzinfo=None)
-                    except Exception:
-                        # fallback seguro: ignorar tzinfo
-                        value = value.replace(tzinfo=None)
-                row.append(value.strftime("%d-%m-%Y %H:%M"))
-            elif isinstance(value, date):
-                row.append(value.strftime("%d-%m-%Y"))
-            else:
-                row.append(str(value))
-
-        ws.append(row)
+    if fields is None:
+        for f in model._meta.concrete_fields:
+            if f.name in excluded_fields:
+                continue
+            if f.is_relation and es_catalogo(f.related_model) and _fk_label_field(f):
+                columns.append((f.attname, str(f.verbose_name).title(), _catalog_labels(f, _fk_label_field(f))))
+                continue
+            lookup = _fk_label_lookup(f) if f.is_relation else f.name
+            choices = dict(f.flatchoices) if f.choices else None
+            columns.append((lookup, str(f.verbose_name).title(), choices))
+        return columns
+
+    for path in fields:
+        current_model = model
+        first_field = field = None
+        parts = path.split('__')
+        for part in parts:
+            field = current_model._meta.get_field(part)
+            first_field = first_field or field
+            if field.is_relation:
+                current_model = field.related_model
+
+        # FK directa a un catálogo ('comuna' o 'comuna__nombre'): id + etiqueta desde el catálogo
+        if first_field.is_relation and first_field.many_to_one and es_catalogo(first_field.related_model):
+            name = _fk_label_field(first_field) if len(parts) == 1 else parts[1]
+            if len(parts) <= 2 and name and not first_field.related_model._meta.get_field(name).is_relation:
+                columns.append((first_field.attname, str(first_field.verbose_name).title(),
+                                _catalog_labels(first_field, name)))
+                continue
+
+        lookup = _fk_label_lookup(field) if field.is_relation and parts[-1] == field.name else path
+        choices = dict(field.flatchoices) if getattr(field, 'choices', None) else None
+        columns.append((lookup, str(first_field.verbose_name).title(), choices))
+    return columns
+
+
+def _excel_value(value, choices=None):
+    if choices is not None and value in choices:
+        return str(choices[value])
+    if value is None:
+        return ''
+    if isinstance(value, (bool, int, float, decimal.Decimal, str)):
+        return value
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime("%d-%m-%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d-%m-%Y")
+    return str(value)
+
+
+def _xlsx_cell(ref, value, style=0):
+    s = f' s="{style}"' if style else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{s}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+    text = xml_escape(XLSX_ILLEGAL_CHARS_RE.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values, letters, style=0):
+    cells = ''.join(
+        _xlsx_cell(f'{letter}{number}', value, style)
+        for letter, value in zip(letters, values) if value != ''
+    )
+    return f'<row r="{number}">{cells}</row>'
 
-    # === Guardar en memoria y enviar ===
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
 
-    response = StreamingHttpResponse(
-        output,
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+def _iter_export_rows(queryset, lookups, chunk_size):
+    """
+    Recorre el queryset en lotes. Sin orden explícito (o por pk) se pagina por pk, porque
+    con MySQL .iterator() carga igualmente todo el resultado en el cliente.
+    """
+    ordering = list(queryset.query.order_by)
+    if ordering and ordering not in (['pk'], ['id']):
+        yield from queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+        return
+
+    qs = queryset.order_by('pk').values_list('pk', *lookups)
+    last_pk = None
+    while True:
+        batch = list((qs.filter(pk__gt=last_pk) if last_pk is not None else qs)[:chunk_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        for row in batch:
+            yield row[1:]
+
+
+def iter_queryset_xlsx(queryset, fields=None, excluded_fields=None, sheet_title='Reporte', chunk_size=2000,
+                       sample_size=500, progress=None):
+    """
+    Genera el .xlsx de un queryset por partes (bytes), con memoria constante:
+    - Filas vía values_list (choices con mapas precalculados; FK a catálogos con la etiqueta desde
+      core.utils.catalogos y el resto de las FK con la etiqueta vía JOIN).
+    - Ancho de columnas calculado con las primeras ``sample_size`` filas.
+    - ``progress(filas_escritas)`` se llama después de cada lote.
+    """
+    model = queryset.model
+    columns = _resolve_export_columns(model, fields, excluded_fields)
+    lookups = [c[0] for c in columns]
+    choices = [c[2] for c in columns]
+    headers = [c[1] for c in columns]
+    letters = [get_column_letter(i) for i in range(1, len(columns) + 1)]
+    title = str(model._meta.verbose_name_plural).title()
+
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{xml_escape(sheet_title[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield buffer.drain()
+
+        rows = _iter_export_rows(queryset, lookups, chunk_size)
+
+        # Muestra para el ancho de columnas (los encabezados también cuentan)
+        sample = []
+        for row in rows:
+            sample.append([_excel_value(v, c) for v, c in zip(row, choices)])
+            if len(sample) >= sample_size:
+                break
+        widths = [len(h) for h in headers]
+        for row in sample:
+            for i, value in enumerate(row):
+                widths[i] = max(widths[i], len(str(value)))
+
+        with zf.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            cols = ''.join(
+                f'<col min="{i}" max="{i}" width="{min(w + 2, 60)}" customWidth="1"/>'
+                for i, w in enumerate(widths, 1)
+            )
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<cols>{cols}</cols><sheetData>'
+                + _xlsx_row(1, [title], letters, style=1)
+                + _xlsx_row(3, headers, letters, style=2)
+            ).encode('utf-8'))
+
+            written = 0
+            pending = []
+            for values in itertools.chain(sample, ([_excel_value(v, c) for v, c in zip(row, choices)]
+                                                   for row in rows)):
+                written += 1
+                pending.append(_xlsx_row(written + 3, values, letters))
+                if len(pending) >= chunk_size:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    if progress:
+                        progress(written)
+                    yield buffer.drain()
+
+            merge = f'<mergeCells count="1"><mergeCell ref="A1:{letters[-1]}1"/></mergeCells>' \
+                if len(letters) > 1 else ''
+            sheet.write((''.join(pending) + f'</sheetData>{merge}</worksheet>').encode('utf-8'))
+
+    if progress:
+        progress(written)
+    yield buffer.drain()
+
+
+def stream_queryset_to_excel(queryset, filename='reporte', fields=None, excluded_fields=None,
+                             sheet_title='Reporte', chunk_size=2000, sample_size=500):
+    """
+    Exporta un queryset a .xlsx en streaming: el zip se envía por partes a medida que se escriben las filas.
+    """
+    chunks = iter_queryset_xlsx(queryset, fields=fields, excluded_fields=excluded_fields, sheet_title=sheet_title,
+                                chunk_size=chunk_size, sample_size=sample_size)
+    response = StreamingHttpResponse(chunks, content_type=XLSX_CONTENT_TYPE)
     response['Content-Disposition'] = f'attachment; filename={filename}.xlsx'
     return response
 
 
-import csv
-from datetime import date, datetime
-from django.http import StreamingHttpResponse
-
 
 class Echo:
     """Helper class para streaming del CSV"""
@@ -250,19 +500,16 @@ class Echo:
         return value
 
 
-def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delimiter=','):
+def iter_queryset_csv(queryset, fields=None, delimiter=',', chunk_size=20000, progress=None):
     """
-    Exporta cualquier queryset a CSV de forma ultrarrápida usando values().
-    Soporta caracteres especiales (UTF-8 con BOM para Excel).
+    Genera el CSV de un queryset línea a línea (str, con BOM UTF-8 para Excel).
+    ``progress(filas_escritas)`` se llama después de cada lote.
     """
     if fields is None:
         # Si no se especifican campos, tomar todos los del modelo
         model = queryset.model
         fields = [f.name for f in model._meta.concrete_fields]
 
-    # Obtener datos planos
-    qs = queryset.values(*fields)
-
     def normalize_value(value):
         if value is None:
             return ''
@@ -272,17 +519,29 @@ def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delim
             return value.strftime("%Y-%m-%d")
         return str(value)
 
-    def csv_generator():
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer, delimiter=delimiter)
-        # Agregar BOM UTF-8 (para Excel)
-        yield '\ufeff'
-        yield writer.writerow(fields)
-        for row in qs.iterator(chunk_size=20000):
-            yield writer.writerow([normalize_value(v) for v in row.values()])
+    pseudo_buffer = Echo()
+    writer = csv.writer(pseudo_buffer, delimiter=delimiter)
+    # Agregar BOM UTF-8 (para Excel)
+    yield '\ufeff'
+    yield writer.writerow(fields)
+
+    written = 0
+    for row in _iter_export_rows(queryset, fields, chunk_size):
+        yield writer.writerow([normalize_value(v) for v in row])
+        written += 1
+        if progress and written % chunk_size == 0:
+            progress(written)
+    if progress:
+        progress(written)
 
+
+def export_queryset_to_csv_fast(queryset, filename='reporte', fields=None, delimiter=','):
+    """
+    Exporta cualquier queryset a CSV de forma ultrarrápida usando values_list().
+    Soporta caracteres especiales (UTF-8 con BOM para Excel).
+    """
     response = StreamingHttpResponse(
-        csv_generator(),
+        iter_queryset_csv(queryset, fields=fields, delimiter=delimiter),
         content_type='text/csv; charset=utf-8'
     )
     response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
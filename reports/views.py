@@ -1,40 +1,50 @@
-from clinica.models import Ficha, MovimientoFicha
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
 from establecimientos.models.establecimiento import Establecimiento
 from establecimientos.models.sectores import Sector
 from establecimientos.models.servicio_clinico import ServicioClinico
 from geografia.models.comuna import Comuna
 from geografia.models.pais import Pais
-from personas.models.pacientes import Paciente
 from personas.models.prevision import Prevision
 from personas.models.profesion import Profesion
 from personas.models.profesionales import Profesional
-from .fields_export_csv import *
-from .utils import export_queryset_to_excel, export_queryset_to_csv_fast
+from .jobs import EXPORTACIONES, ExportacionOcupada, export_dir, nombre_descarga, solicitar_exportacion
+from .models import TrabajoExportacion
+from .utils import stream_queryset_to_excel, export_queryset_to_csv_fast
+
+
+@login_required
+def _exportar_directo(request, tipo):
+    """Exportación síncrona (dentro de la petición) de una entrada de EXPORTACIONES."""
+    definicion = EXPORTACIONES[tipo]
+    establecimiento_id = request.user.establecimiento_id if definicion['por_establecimiento'] else None
+    queryset = definicion['queryset'](establecimiento_id)
+    if definicion['formato'] == 'xlsx':
+        return stream_queryset_to_excel(queryset, filename=definicion['archivo'], fields=definicion['campos'])
+    return export_queryset_to_csv_fast(queryset, filename=definicion['archivo'], fields=definicion['campos'])
 
 
 def export_comuna(request):
     queryset = Comuna.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='comunas')
+    return stream_queryset_to_excel(queryset, filename='comunas')
 
 
 def export_establecimiento(request):
     queryset = Establecimiento.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='establecimientos')
+    return stream_queryset_to_excel(queryset, filename='establecimientos')
 
 
 ## CSV FICHAS
 def export_ficha_csv(request):
-    queryset = Ficha.objects.filter(
-        establecimiento=request.user.establecimiento
-    )
-    return export_queryset_to_csv_fast(queryset, filename='fichas', fields=fields_ficha_csv)
+    return _exportar_directo(request, 'ficha_csv')
 
 
 def export_ficha_pasivadas_csv(request):
-    queryset = Ficha.objects.filter(
-        establecimiento=request.user.establecimiento, pasivado=True
-    )
-    return export_queryset_to_csv_fast(queryset, filename='fichas_pasivadas', fields=fields_ficha_csv)
+    return _exportar_directo(request, 'ficha_pasivada_csv')
 
 
 ## TERMINO FICHAS
@@ -42,50 +52,19 @@ def export_ficha_pasivadas_csv(request):
 ## CSV MOVIMIENTOS FICHAS
 
 def export_movimiento_ficha_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _exportar_directo(request, 'movimiento_ficha_csv')
 
 
 def export_movimiento_ficha_envio_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_envio='ENVIADO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_enviadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _exportar_directo(request, 'movimiento_ficha_envio_csv')
 
 
 def export_movimiento_ficha_recepcion_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_recepcion='RECIBIDO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_recepcionadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _exportar_directo(request, 'movimiento_ficha_recepcion_csv')
 
 
 def export_movimiento_ficha_traspaso_csv(request):
-    queryset = MovimientoFicha.objects.filter(
-        ficha__establecimiento=request.user.establecimiento,
-        estado_traspaso='TRASPASADO'
-    ).order_by('-updated_at')
-    return export_queryset_to_csv_fast(
-        queryset,
-        filename='movimientos_ficha_traspasadas',
-        fields=fields_movimiento_ficha_csv
-    )
+    return _exportar_directo(request, 'movimiento_ficha_traspaso_csv')
 
 
 ## TERMINO MOVIMIENTOS FICHAS
@@ -93,57 +72,118 @@ def export_movimiento_ficha_traspaso_csv(request):
 
 ## CSV PACIENTE
 def export_paciente_csv(request):
-    queryset = Paciente.objects.all()
-    return export_queryset_to_csv_fast(queryset, filename='pacientes', fields=fields_paciente_csv)
+    return _exportar_directo(request, 'paciente_csv')
+
+
+def export_paciente_excel(request):
+    return _exportar_directo(request, 'paciente_excel')
 
 
 def export_paciente_recien_nacido_csv(request):
-    queryset = Paciente.objects.filter(recien_nacido=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_recien_nacidos_csv', fields=fields_paciente_csv)
+    return _exportar_directo(request, 'paciente_recien_nacido_csv')
 
 
 def export_paciente_extranjero_csv(request):
-    queryset = Paciente.objects.filter(extranjero=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_extranjeros_csv', fields=fields_paciente_csv)
+    return _exportar_directo(request, 'paciente_extranjero_csv')
 
 
 def export_paciente_fallecido_csv(request):
-    queryset = Paciente.objects.filter(fallecido=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_fallecids_csv', fields=fields_paciente_csv)
+    return _exportar_directo(request, 'paciente_fallecido_csv')
 
 
 def export_paciente_pueblo_indigena_csv(request):
-    queryset = Paciente.objects.filter(pueblo_indigena=True)
-    return export_queryset_to_csv_fast(queryset, filename='pacientes_pueblo_indigena_csv', fields=fields_paciente_csv)
+    return _exportar_directo(request, 'paciente_pueblo_indigena_csv')
 
 
 ## TERMINO PACIENTE
 
 def export_pais(request):
     queryset = Pais.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='paises')
+    return stream_queryset_to_excel(queryset, filename='paises')
 
 
 def export_prevision(request):
     queryset = Prevision.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='previsiones')
+    return stream_queryset_to_excel(queryset, filename='previsiones')
 
 
 def export_profesion(request):
     queryset = Profesion.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='profesiones')
+    return stream_queryset_to_excel(queryset, filename='profesiones')
 
 
 def export_profesional(request):
     queryset = Profesional.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='profesionales')
+    return stream_queryset_to_excel(queryset, filename='profesionales')
 
 
 def export_sector(request):
     queryset = Sector.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='sectores')
+    return stream_queryset_to_excel(queryset, filename='sectores')
 
 
 def export_servicio_clinico(request):
     queryset = ServicioClinico.objects.all().order_by('-updated_at')
-    return export_queryset_to_excel(queryset, filename='servicios_clinicos')
+    return stream_queryset_to_excel(queryset, filename='servicios_clinicos')
+
+
+## EXPORTACIONES EN SEGUNDO PLANO
+
+def _trabajo_json(trabajo):
+    data = {
+        'id': trabajo.pk,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'total': trabajo.total,
+        'porcentaje': round(trabajo.progreso * 100 / trabajo.total) if trabajo.total else None,
+        'error': trabajo.error,
+        'status_url': reverse('export_trabajo_status', args=[trabajo.pk]),
+        'download_url': None,
+    }
+    if trabajo.estado == 'COMPLETADO':
+        data['download_url'] = reverse('export_trabajo_descargar', args=[trabajo.pk])
+    return data
+
+
+def _get_trabajo(request, pk):
+    """Solo se puede consultar un trabajo global o del mismo establecimiento del usuario."""
+    trabajo = get_object_or_404(TrabajoExportacion, pk=pk)
+    if trabajo.establecimiento_id and trabajo.establecimiento_id != request.user.establecimiento_id:
+        raise Http404
+    return trabajo
+
+
+@login_required
+@require_POST
+def solicitar_exportacion_view(request, tipo):
+    if tipo not in EXPORTACIONES:
+        return JsonResponse({'error': f'Tipo de exportación desconocido: {tipo}'}, status=400)
+
+    try:
+        trabajo, creado = solicitar_exportacion(tipo, request.user)
+    except ExportacionOcupada as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    data = _trabajo_json(trabajo)
+    data['creado'] = creado
+    return JsonResponse(data, status=202)
+
+
+@login_required
+@require_GET
+def estado_exportacion_view(request, pk):
+    return JsonResponse(_trabajo_json(_get_trabajo(request, pk)))
+
+
+@login_required
+@require_GET
+def descargar_exportacion_view(request, pk):
+    trabajo = _get_trabajo(request, pk)
+    if trabajo.estado != 'COMPLETADO' or not trabajo.archivo:
+        raise Http404('La exportación no está disponible')
+
+    path = export_dir() / trabajo.archivo
+    if not path.exists():
+        raise Http404('El archivo de la exportación ya no existe')
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=nombre_descarga(trabajo))
@@ -0,0 +1,62 @@
+// static/js/exportaciones.js
+//
+// Botones de exportación en segundo plano: <a href="(exportación directa)" class="js-exportacion"
+// data-export-url="{% url 'export_trabajo_solicitar' 'tipo' %}">. Al hacer clic se encola el trabajo,
+// se consulta su estado cada INTERVALO_MS mostrando el avance en el botón y al terminar se descarga
+// el archivo. Sin JavaScript el enlace mantiene la exportación directa.
+
+$(function () {
+
+    const INTERVALO_MS = 2000;
+
+    function csrfToken() {
+        return $('meta[name="csrf-token"]').attr('content') || $('[name=csrfmiddlewaretoken]').val();
+    }
+
+    function restaurar($btn) {
+        $btn.removeClass('disabled').removeAttr('aria-disabled').html($btn.data('texto-original'));
+    }
+
+    function mostrarError($btn, mensaje) {
+        restaurar($btn);
+        Swal.fire('Error', mensaje || 'No se pudo generar la exportación', 'error');
+    }
+
+    function mostrarAvance($btn, trabajo) {
+        const avance = trabajo.porcentaje !== null ? ` ${trabajo.porcentaje}%` : '';
+        $btn.html(`<span class="spinner-border spinner-border-sm"></span> Generando${avance}`);
+    }
+
+    function consultar($btn, statusUrl) {
+        $.getJSON(statusUrl)
+            .done(function (trabajo) {
+                if (trabajo.estado === 'COMPLETADO') {
+                    restaurar($btn);
+                    window.location.href = trabajo.download_url;
+                } else if (trabajo.estado === 'ERROR') {
+                    mostrarError($btn, trabajo.error);
+                } else {
+                    mostrarAvance($btn, trabajo);
+                    setTimeout(() => consultar($btn, statusUrl), INTERVALO_MS);
+                }
+            })
+            .fail(() => mostrarError($btn, 'No se pudo consultar el estado de la exportación'));
+    }
+
+    $(document).on('click', '.js-exportacion', function (e) {
+        e.preventDefault();
+        const $btn = $(this);
+        if ($btn.hasClass('disabled')) return;
+
+        $btn.data('texto-original', $btn.html()).addClass('disabled').attr('aria-disabled', 'true');
+        mostrarAvance($btn, {porcentaje: null});
+
+        $.ajax({
+            url: $btn.data('export-url'),
+            method: 'POST',
+            headers: {'X-CSRFToken': csrfToken()},
+        })
+            .done(trabajo => consultar($btn, trabajo.status_url))
+            .fail(xhr => mostrarError($btn, xhr.responseJSON && xhr.responseJSON.error));
+    });
+});
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_historicaluser_is_creator_system_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalrole',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última Actualización'),
+        ),
+        migrations.AddField(
+            model_name='role',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True, verbose_name='Última Actualización'),
+        ),
+    ]
@@ -96,6 +96,9 @@ class Role(models.Model):
 
     establecimiento = models.ForeignKey(Establecimiento, on_delete=models.PROTECT, null=True, blank=True)
 
+    # Versión del rol para users.principal: cada guardado la cambia y deja vencidos los principales cacheados
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True, verbose_name='Última Actualización')
+
     history = HistoricalRecords()
 
     class Meta:
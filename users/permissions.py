@@ -1,5 +1,12 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
-from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+User = get_user_model()
 
 # campo del modelo Role -> app.model
 ROLE_FIELD_TO_MODEL = {
@@ -28,72 +35,109 @@ PERMISSION_LEVELS = {
 }
 
 
-def get_permissions_for_role(role):
-    """
-    Retorna lista de objetos Permission según el Role
-    """
-    permissions = []
+# Segundos que se cachea la resolución rol → permisos (la clave incluye la versión del rol)
+ROLE_PERMISSIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
 
+def get_role_version(role):
+    """Huella de los niveles de permiso del rol: cambia cada vez que se edita algún módulo."""
+    niveles = '|'.join(f'{field}={getattr(role, field, 0)}' for field in ROLE_FIELD_TO_MODEL)
+    return hashlib.md5(niveles.encode()).hexdigest()
+
+
+def _resolve_permission_ids(role):
+    condiciones = Q()
     for field, model_path in ROLE_FIELD_TO_MODEL.items():
         if not model_path:
             continue
 
         level = getattr(role, field, 0)
-        if level == 0:
+        actions = PERMISSION_LEVELS.get(level, [])
+        if not actions:
             continue
 
         app_label, model = model_path.split('.')
-        actions = PERMISSION_LEVELS.get(level, [])
+        condiciones |= Q(
+            content_type__app_label=app_label,
+            content_type__model=model,
+            codename__in=[f'{a}_{model}' for a in actions],
+        )
 
-        try:
-            content_type = ContentType.objects.get(
-                app_label=app_label,
-                model=model
-            )
-        except ContentType.DoesNotExist:
-            continue
+    if not condiciones:
+        return frozenset()
+    return frozenset(Permission.objects.filter(condiciones).values_list('id', flat=True))
 
-        perms = Permission.objects.filter(
-            content_type=content_type,
-            codename__in=[f'{a}_{model}' for a in actions]
-        )
 
-        permissions.extend(perms)
+def get_permission_ids_for_role(role):
+    """
+    IDs de Permission que otorga el rol, resueltos en una sola consulta y cacheados por versión del rol.
+    """
+    if not role:
+        return frozenset()
 
-    return permissions
+    cache_key = f'role_perms:{role.pk}:{get_role_version(role)}'
+    ids = cache.get(cache_key)
+    if ids is None:
+        ids = _resolve_permission_ids(role)
+        cache.set(cache_key, ids, ROLE_PERMISSIONS_CACHE_TIMEOUT)
+    return ids
 
 
-from django.core.cache import cache
-from django.db import transaction
+def get_permissions_for_role(role):
+    """
+    Retorna lista de objetos Permission según el Role
+    """
+    return list(Permission.objects.filter(pk__in=get_permission_ids_for_role(role)))
+
+
+def _synced_key(user_id):
+    return f"user_perms_synced_{user_id}"
+
+
+def _apply_permission_diff(user_ids, desired_ids):
+    """
+    Deja a cada usuario exactamente con ``desired_ids``: borra solo las filas sobrantes e inserta solo
+    las faltantes (sin clear(), que bloqueaba todas las filas del usuario).
+    """
+    UserPermission = User.user_permissions.through
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0, 0
+
+    eliminados, _ = UserPermission.objects.filter(user_id__in=user_ids).exclude(
+        permission_id__in=desired_ids
+    ).delete()
+
+    existentes = set(UserPermission.objects.filter(
+        user_id__in=user_ids, permission_id__in=desired_ids
+    ).values_list('user_id', 'permission_id'))
+    faltantes = [
+        UserPermission(user_id=user_id, permission_id=permission_id)
+        for user_id in user_ids
+        for permission_id in desired_ids
+        if (user_id, permission_id) not in existentes
+    ]
+    UserPermission.objects.bulk_create(faltantes, ignore_conflicts=True)
+    return eliminados, len(faltantes)
 
 
 def sync_user_permissions(user):
     """
-    Limpia y vuelve a asignar permisos según los roles del usuario.
-    Se utiliza caché para evitar deadlocks y repeticiones innecesarias.
+    Sincroniza los permisos del usuario con los de su rol aplicando solo las diferencias.
+    La caché guarda la versión del rol ya sincronizada para no repetir el trabajo en cada petición.
     """
     if not user.is_authenticated:
         return
 
-    cache_key = f"user_perms_synced_{user.pk}"
-    if cache.get(cache_key):
+    role = user.rol
+    version = get_role_version(role) if role else 'sin_rol'
+    cache_key = _synced_key(user.pk)
+    if cache.get(cache_key) == version:
         return
 
     try:
         with transaction.atomic():
-            # Obtener permisos ANTES de limpiar, por si falla algo
-            role = user.rol
-            all_perms = []
-            if role:
-                all_perms.extend(get_permissions_for_role(role))
-
-            # Solo limpiar y añadir si los permisos han cambiado o no están sincronizados
-            # Pero para simplificar y asegurar, usamos el clear/add dentro de la transacción
-            # La clave es minimizar el tiempo de bloqueo.
-            user.user_permissions.clear()
-            if all_perms:
-                # Usar set para evitar duplicados si varios roles tienen el mismo permiso
-                user.user_permissions.add(*set(all_perms))
+            _apply_permission_diff([user.pk], get_permission_ids_for_role(role))
     except Exception:
         # Si hay un error (como un deadlock), simplemente no marcamos la caché
         # y dejamos que la siguiente petición intente de nuevo.
@@ -101,4 +145,18 @@ def sync_user_permissions(user):
         return
 
     # Marcar como sincronizado por 5 minutos
-    cache.set(cache_key, True, 300)
+    cache.set(cache_key, version, 300)
+
+
+def sync_role_permissions(role):
+    """
+    Recalcula en bloque los permisos de todos los usuarios que tienen el rol (tras editarlo).
+    Devuelve (filas eliminadas, filas insertadas).
+    """
+    user_ids = list(User.objects.filter(rol=role).values_list('pk', flat=True))
+    with transaction.atomic():
+        resultado = _apply_permission_diff(user_ids, get_permission_ids_for_role(role))
+
+    version = get_role_version(role)
+    cache.set_many({_synced_key(user_id): version for user_id in user_ids}, 300)
+    return resultado
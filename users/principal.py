@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core.utils.versiones import leer_version, subir_version
+from users.models import User
+
+PRINCIPAL_CACHE_PREFIX = 'principal'
+
+# Módulos del Role que se exponen como mapa de permisos (0 sin acceso, 1 lectura, 2 escritura)
+MODULOS_PERMISO = [
+    "usuarios",
+    "comunas",
+    "establecimientos",
+    "fichas",
+    "genero",
+    "movimiento_ficha",
+    "movimiento_ficha_controlado",
+    "paciente",
+    "pais",
+    "prevision",
+    "profesion",
+    "colores_sector",
+    "profesionales",
+    "sectores",
+    "servicio_clinico",
+    "reportes",
+    "soporte",
+]
+
+
+class Principal:
+    """
+    Datos de autorización del usuario (establecimiento, rol, grupo y mapa de permisos), cargados
+    una vez con select_related y compartidos por middleware, context processor y vistas.
+    """
+
+    def __init__(self, user_id, establecimiento, rol, grupo, permisos, rol_version=None):
+        self.user_id = user_id
+        self.establecimiento = establecimiento
+        self.rol = rol
+        self.grupo = grupo
+        self.permisos = permisos
+        self.rol_version = rol_version
+
+    @property
+    def establecimiento_id(self):
+        return self.establecimiento.pk if self.establecimiento else None
+
+    @property
+    def rol_id(self):
+        return self.rol.pk if self.rol else None
+
+    def rol_nombre(self, user):
+        return self.grupo or getattr(user, 'tipo_perfil', None)
+
+    def vigente_para(self, user, rol_version):
+        """
+        El usuario cargado en la petición no cambió de establecimiento ni de rol, y el rol no se modificó
+        desde que se cargó el principal (``rol_version``: versión actual del rol en la caché).
+        """
+        return (self.establecimiento_id == user.establecimiento_id and self.rol_id == user.rol_id
+                and self.rol_version == rol_version)
+
+
+def _cache_key(user_id):
+    return f'{PRINCIPAL_CACHE_PREFIX}:{user_id}'
+
+
+def _rol_version_key(rol_id):
+    return f'{PRINCIPAL_CACHE_PREFIX}:rol:{rol_id}'
+
+
+def version_rol(rol_id):
+    """Versión actual del rol en la caché (sin consultar la BD); None si el usuario no tiene rol."""
+    if rol_id is None:
+        return None
+    return leer_version(_rol_version_key(rol_id))
+
+
+def subir_version_rol(rol_id):
+    """Deja obsoletos los principales cacheados de todos los usuarios del rol."""
+    subir_version(_rol_version_key(rol_id))
+
+
+def cargar_principal(user_id, rol_version=None):
+    user = User.objects.select_related('establecimiento', 'rol').get(pk=user_id)
+    grupo = user.groups.values_list('name', flat=True).first()
+
+    permisos = {modulo: 0 for modulo in MODULOS_PERMISO}
+    if user.rol:
+        for modulo in permisos:
+            permisos[modulo] = getattr(user.rol, modulo, 0)
+
+    return Principal(user.pk, user.establecimiento, user.rol, grupo, permisos, rol_version)
+
+
+def get_principal(user):
+    """
+    Principal del usuario autenticado, desde la caché si sigue vigente: sin consultas mientras la versión
+    del rol (que suben las señales al editarlo) no cambie. La versión se lee antes de cargar, así un cambio
+    del rol durante la carga deja el principal ya obsoleto. Con varios procesos requiere una caché
+    compartida (ver core.W001).
+    """
+    principal = cache.get(_cache_key(user.pk))
+    rol_version = version_rol(user.rol_id)
+    if principal is None or not principal.vigente_para(user, rol_version):
+        principal = cargar_principal(user.pk, rol_version)
+        cache.set(_cache_key(user.pk), principal, settings.PRINCIPAL_CACHE_TIMEOUT)
+    return principal
+
+
+def adjuntar_a_usuario(user, principal):
+    """Deja establecimiento y rol en la caché de FKs del usuario: ``user.establecimiento`` no consulta."""
+    User._meta.get_field('establecimiento').set_cached_value(user, principal.establecimiento)
+    User._meta.get_field('rol').set_cached_value(user, principal.rol)
+
+
+def invalidar_principal(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidar_principal_de(**filtros):
+    """Invalida los principales de los usuarios que cumplen ``filtros`` (ej: rol=role)."""
+    invalidar_principal(*User.objects.filter(**filtros).values_list('pk', flat=True))
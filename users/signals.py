@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password, identify_hasher
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from .permissions import sync_user_permissions
+from .models import Role
+from .permissions import sync_role_permissions
+from .principal import invalidar_principal, invalidar_principal_de, subir_version_rol
 
 User = get_user_model()
 
@@ -19,5 +22,56 @@ def hash_user_password(sender, instance, **kwargs):
             instance.password = make_password(password)
 
 
+@receiver(post_save, sender=Role)
 def update_permissions_on_role_change(sender, instance, **kwargs):
-    sync_user_permissions(instance.user_id)
+    """
+    Al editar un rol se recalculan en bloque los permisos de todos sus usuarios; al terminar se sube otra
+    vez la versión del rol por los principales cargados mientras se sincronizaba.
+    """
+    def sincronizar():
+        sync_role_permissions(instance)
+        subir_version_rol(instance.pk)
+
+    transaction.on_commit(sincronizar)
+
+
+# ==============================================================
+# PRINCIPAL (users.principal)
+# ==============================================================
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_principal_usuario(sender, instance, **kwargs):
+    invalidar_principal(instance.pk)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidar_principal_rol(sender, instance, **kwargs):
+    # Tras el commit: si se subiera antes, otro proceso podría recargar el rol aún sin cambios con la
+    # versión nueva
+    rol_id = instance.pk
+    transaction.on_commit(lambda: subir_version_rol(rol_id))
+
+
+@receiver(post_save, sender='establecimientos.Establecimiento')
+def invalidar_principal_establecimiento(sender, instance, **kwargs):
+    invalidar_principal_de(establecimiento=instance)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_principal_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidar_principal(instance.pk)
+        return
+
+    # Cambios desde el grupo: pk_set son usuarios, salvo en clear (None). En post_clear el grupo ya no
+    # tiene usuarios, así que se anotan en pre_clear
+    if action == 'pre_clear':
+        instance._usuarios_a_invalidar = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidar_principal(*getattr(instance, '_usuarios_a_invalidar', []))
+        instance._usuarios_a_invalidar = []
+    elif action.startswith('post_') and pk_set:
+        invalidar_principal(*pk_set)